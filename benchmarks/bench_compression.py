@@ -0,0 +1,174 @@
+"""Benchmark of the gzip layer of `csinsights.data.compression` on a synthetic S2 shard. The shard
+is written once as plain gzip, like the shards S2 serves, and once as BGZF, like the shards and
+exports this package writes, and read line by line as the pipeline does.
+
+Plain gzip is a single deflate stream, so `open_gzip` inflates it on its one background thread
+whatever the number of threads is. Only BGZF files are inflated on multiple threads.
+
+Usage: poetry run python benchmarks/bench_compression.py --size 200 --threads 4
+"""
+import gzip
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import IO, Callable, Dict, Iterator, Union
+
+import click
+
+from csinsights.data import compression
+from csinsights.data.compression import open_gzip, open_writer
+
+
+def create_lines(size: int, seed: int) -> Iterator[bytes]:
+    """Create synthetic json lines of S2 papers.
+
+    Args:
+        size (int): The number of uncompressed bytes to create.
+        seed (int): The seed of the random lines.
+
+    Returns:
+        Iterator[bytes]: The lines.
+    """
+    rng = random.Random(seed)
+    written = 0
+    corpusid = 0
+    while written < size:
+        corpusid += rng.randint(1, 10)
+        dblp = f'"conf/acl/{corpusid}"' if rng.random() < 0.1 else "null"
+        authors = ", ".join(
+            f'{{"authorId": "{rng.randint(1, 10**9)}", "name": "Firstname Lastname"}}'
+            for _ in range(rng.randint(1, 8))
+        )
+        line = (
+            f'{{"corpusid": {corpusid}, "externalids": {{"DBLP": {dblp}, "MAG": '
+            f'"{corpusid * 7}", "CorpusId": "{corpusid}"}}, "title": "A title about '
+            f'{rng.choice(["parsing", "retrieval", "transformers", "graphs"])}", "authors": '
+            f'[{authors}], "year": {rng.randint(1990, 2022)}, "citationcount": '
+            f"{rng.randint(0, 1000)}}}\n"
+        ).encode()
+        written += len(line)
+        yield line
+
+
+def read_lines(open_fn: Callable[[], Union[IO[bytes], gzip.GzipFile]]) -> int:
+    """Read a file line by line.
+
+    Args:
+        open_fn (Callable[[], Union[IO[bytes], gzip.GzipFile]]): A function that opens the file.
+
+    Returns:
+        int: The number of bytes read.
+    """
+    size = 0
+    with open_fn() as f:
+        for line in f:
+            size += len(line)
+    return size
+
+
+def best_time(fn: Callable[[], int], repeat: int) -> float:
+    """Measure the best wall time of a function.
+
+    Args:
+        fn (Callable[[], int]): The function.
+        repeat (int): The number of measurements.
+
+    Returns:
+        float: The best wall time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def get_zlib_backends() -> Dict[str, ModuleType]:
+    """Get the installed zlib implementations.
+
+    Returns:
+        Dict[str, ModuleType]: The implementations by name.
+    """
+    backends = {"zlib": compression.zlib}
+    if compression.zlib_ng is not None:
+        backends["zlib-ng"] = compression.zlib_ng
+    if compression.isal_zlib is not None:
+        backends["isal"] = compression.isal_zlib
+    return backends
+
+
+def write(f: Union[IO[bytes], gzip.GzipFile], data: bytes) -> int:
+    """Write data to a file and close it.
+
+    Args:
+        f (Union[IO[bytes], gzip.GzipFile]): The file.
+        data (bytes): The data.
+
+    Returns:
+        int: The number of bytes written.
+    """
+    with f:
+        return f.write(data)
+
+
+@click.command()
+@click.option("--size", type=int, default=200, help="The uncompressed size of the shard in MB.")
+@click.option("--threads", type=int, default=os.cpu_count() or 1, help="The BGZF threads.")
+@click.option("--seed", type=int, default=0, help="The seed of the random lines.")
+@click.option("--repeat", type=int, default=3, help="The number of measurements per reader.")
+def main(size: int, threads: int, seed: int, repeat: int) -> None:
+    """Measure the throughput of writing and reading a shard in MB of uncompressed data per second.
+
+    Args:
+        size (int): The uncompressed size of the shard in MB.
+        threads (int): The number of threads to inflate and deflate BGZF files with.
+        seed (int): The seed of the random lines.
+        repeat (int): The number of measurements, of which the best is reported.
+    """
+    data = b"".join(create_lines(size * 10**6, seed))
+    megabytes = len(data) / 10**6
+    click.echo(f"{megabytes:.0f} MB of json lines on {os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as tmp:
+        plain, bgzf = Path(tmp) / "plain.jsonl.gz", Path(tmp) / "bgzf.jsonl.gz"
+        writers: Dict[str, Callable[[], int]] = {
+            "gzip.open, plain gzip": lambda: write(gzip.open(plain, "wb", 6), data),
+            "open_writer, BGZF, 1 thread": lambda: write(open_writer(bgzf, threads=1), data),
+            f"open_writer, BGZF, {threads} threads": lambda: write(
+                open_writer(bgzf, threads=threads), data
+            ),
+        }
+        click.echo(f"{'writer':40s}   MB/s")
+        for name, writer in writers.items():
+            click.echo(f"{name:40s} {megabytes / best_time(writer, repeat):6.0f}")
+        click.echo(
+            f"Compressed to {plain.stat().st_size / 10**6:.0f} MB as plain gzip and "
+            f"{bgzf.stat().st_size / 10**6:.0f} MB as BGZF"
+        )
+
+        click.echo(f"{'reader':40s}   MB/s")
+        read_gzip: Callable[[], int] = lambda: read_lines(lambda: gzip.open(plain, "rb"))
+        click.echo(f"{'gzip.open, plain gzip':40s} {megabytes / best_time(read_gzip, repeat):6.0f}")
+        default_backend = compression.zlib_backend
+        for backend_name, backend in get_zlib_backends().items():
+            compression.zlib_backend = backend
+            readers: Dict[str, Callable[[], int]] = {
+                # Plain gzip is a single stream that only the background thread inflates
+                "open_gzip, plain gzip": lambda: read_lines(lambda: open_gzip(plain, threads)),
+                "open_gzip, BGZF, 1 thread": lambda: read_lines(lambda: open_gzip(bgzf, 1)),
+                f"open_gzip, BGZF, {threads} threads": lambda: read_lines(
+                    lambda: open_gzip(bgzf, threads)
+                ),
+            }
+            for name, read in readers.items():
+                assert read() == len(data)
+                name = f"{name} ({backend_name})"
+                click.echo(f"{name:40s} {megabytes / best_time(read, repeat):6.0f}")
+        compression.zlib_backend = default_backend
+
+
+if __name__ == "__main__":
+    main()
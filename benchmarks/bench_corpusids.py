@@ -0,0 +1,128 @@
+"""Benchmark of `CorpusIdSet` against a Python set of corpus ids. Both are built from the same
+random ids and answer the same membership queries, one id at a time for the set and in one batch
+for `CorpusIdSet`.
+
+Usage: poetry run python benchmarks/bench_corpusids.py --ids 50000000 --queries 1000000
+"""
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Set, Tuple, TypeVar
+
+import click
+import numpy as np
+
+from csinsights.data import CorpusIdSet
+
+# The range the random corpus ids are drawn from, similar to the corpus ids of S2
+MAX_CORPUSID = 260_000_000
+
+# Number of ids that are added at once, like the corpus ids of the papers of a shard
+CHUNK_SIZE = 1_000_000
+
+R = TypeVar("R")
+
+
+def measure(fn: Callable[[], R]) -> Tuple[R, float, int]:
+    """Run a function and measure its wall time and the memory it retains.
+
+    Args:
+        fn (Callable[[], R]): The function to run.
+
+    Returns:
+        Tuple[R, float, int]: The result, the wall time in seconds, and the traced memory in bytes
+        that is still allocated when the function returns.
+    """
+    # Time the function without tracing, as tracing slows down allocations
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, memory
+
+
+def build_python_set(ids: np.ndarray) -> Set[int]:
+    """Build a Python set from lists of ids the way the processor did.
+
+    Args:
+        ids (np.ndarray): The ids.
+
+    Returns:
+        Set[int]: The set.
+    """
+    python_set: Set[int] = set()
+    for chunk in np.split(ids, range(CHUNK_SIZE, len(ids), CHUNK_SIZE)):
+        python_set.update(chunk.tolist())
+    return python_set
+
+
+def build_corpusid_set(ids: np.ndarray) -> CorpusIdSet:
+    """Build a `CorpusIdSet` from lists of ids the way the processor does and merge the pending
+    ids.
+
+    Args:
+        ids (np.ndarray): The ids.
+
+    Returns:
+        CorpusIdSet: The set with all ids in its sorted array.
+    """
+    corpusid_set = CorpusIdSet()
+    for chunk in np.split(ids, range(CHUNK_SIZE, len(ids), CHUNK_SIZE)):
+        corpusid_set.update(chunk.tolist())
+    len(corpusid_set)
+    return corpusid_set
+
+
+@click.command()
+@click.option("--ids", type=int, default=50_000_000, help="The number of ids in the set.")
+@click.option("--queries", type=int, default=1_000_000, help="The number of membership queries.")
+@click.option("--seed", type=int, default=0, help="The seed of the random ids.")
+@click.option(
+    "--baseline/--no-baseline",
+    default=True,
+    help="Whether to also measure the Python set, which needs ~4 GiB for 50M ids.",
+)
+def main(ids: int, queries: int, seed: int, baseline: bool) -> None:
+    """Compare the build time, memory, and lookup time of both sets.
+
+    Args:
+        ids (int): The number of ids in the set.
+        queries (int): The number of membership queries.
+        seed (int): The seed of the random ids.
+        baseline (bool): Whether to also measure the Python set.
+    """
+    rng = np.random.default_rng(seed)
+    corpusids = rng.choice(MAX_CORPUSID, ids, replace=False)
+    lookups = rng.integers(0, MAX_CORPUSID, queries)
+    click.echo(f"{ids:,} ids, {queries:,} queries")
+
+    expected: Optional[List[bool]] = None
+    if baseline:
+        # The Python set owns one int object per id besides its hash table
+        python_set, build, memory = measure(lambda: build_python_set(corpusids))
+        lookup_list = lookups.tolist()
+        start = time.perf_counter()
+        expected = [corpusid in python_set for corpusid in lookup_list]
+        lookup = time.perf_counter() - start
+        click.echo(
+            f"set          build {build:6.2f}s  memory {memory / 2**20:7.0f} MiB"
+            f"  lookups {lookup:5.2f}s"
+        )
+        del python_set
+
+    corpusid_set, build, memory = measure(lambda: build_corpusid_set(corpusids))
+    start = time.perf_counter()
+    found = corpusid_set.contains_many(lookups)
+    lookup = time.perf_counter() - start
+    click.echo(
+        f"CorpusIdSet  build {build:6.2f}s  memory {memory / 2**20:7.0f} MiB"
+        f"  lookups {lookup:5.2f}s"
+    )
+    assert expected is None or found.tolist() == expected
+
+
+if __name__ == "__main__":
+    main()
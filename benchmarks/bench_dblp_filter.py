@@ -0,0 +1,186 @@
+"""Benchmark of the DBLP filters. The previous path loaded the whole release from a json cache and
+applied the timestamp and the access filter one after another, each building a filtered copy of
+the tree. The current path evaluates both filters on the columns of the SQLite tree cache at once
+and only decodes the records that are kept. Both read the same synthetic release.
+
+The previous access filter expects every electronic edition (`ee`) to be a dict, so the synthetic
+records only have one edition each. Untyped editions are closed access on both paths.
+
+Usage: poetry run python benchmarks/bench_dblp_filter.py --records 1000000
+"""
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Set, Tuple, TypeVar
+
+import click
+
+from csinsights.client.dblpclient import (
+    create_record_mask,
+    load_tree_columns,
+    read_tree_rows,
+    write_tree_cache,
+)
+from csinsights.types import AccessType, DatasetJsonDict
+
+R = TypeVar("R")
+
+
+def create_records(records: int, seed: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Create synthetic DBLP records as `iter_xml_records` yields them.
+
+    Args:
+        records (int): The number of records.
+        seed (int): The seed of the random records.
+
+    Returns:
+        Iterator[Tuple[str, Dict[str, Any]]]: The type (e.g., article) and the record.
+    """
+    rng = random.Random(seed)
+    for index in range(records):
+        tag = rng.choices(["article", "inproceedings", "phdthesis"], [60, 35, 5])[0]
+        record: Dict[str, Any] = {
+            "@key": f"{tag}/x/{index}",
+            "@mdate": str(date(2000, 1, 1) + timedelta(days=rng.randrange(8000))),
+            "author": [f"Author {rng.randrange(10**6)}" for _ in range(rng.randint(1, 6))],
+            "title": f"A title about {rng.choice(['parsing', 'retrieval', 'graphs'])}.",
+            "year": str(rng.randint(1990, 2022)),
+        }
+        edition = rng.random()
+        if edition < 0.4:
+            record["ee"] = {"@type": "oa", "#text": f"https://doi.org/10.1/{index}"}
+        elif edition < 0.8:
+            # An untyped edition, as a dict for the previous access filter
+            record["ee"] = {"#text": f"https://doi.org/10.1/{index}"}
+        yield tag, record
+
+
+def filter_by_timestamp_fn(tree: DatasetJsonDict, from_timestamp: datetime) -> DatasetJsonDict:
+    """The previous timestamp filter, which copies the tree.
+
+    Args:
+        tree (DatasetJsonDict): The tree to filter.
+        from_timestamp (datetime): The timestamp to filter by.
+
+    Returns:
+        DatasetJsonDict: The filtered tree.
+    """
+    return {
+        element_list_key: [
+            el
+            for el in element_list
+            if datetime.strptime(str(el.get("@mdate")), "%Y-%m-%d") > from_timestamp
+        ]
+        for element_list_key, element_list in tree.items()
+    }
+
+
+def filter_by_access_fn(tree: DatasetJsonDict, access_types: Set[AccessType]) -> DatasetJsonDict:
+    """The previous access filter, which copies the tree again.
+
+    Args:
+        tree (DatasetJsonDict): The tree to filter.
+        access_types (Set[AccessType]): A set of valid access types.
+
+    Returns:
+        DatasetJsonDict: The filtered tree.
+    """
+    return {
+        element_list_key: [
+            el
+            for el in element_list
+            if el.get("ee", {"@type": AccessType.CLOSED}).get("@type") in access_types
+        ]
+        for element_list_key, element_list in tree.items()
+    }
+
+
+def measure(fn: Callable[[], R]) -> Tuple[R, float, int]:
+    """Run a function and measure its wall time and its peak memory.
+
+    Args:
+        fn (Callable[[], R]): The function to run.
+
+    Returns:
+        Tuple[R, float, int]: The result, the wall time in seconds, and the peak of the traced
+        memory in bytes while the function ran.
+    """
+    # Time the function without tracing, as tracing slows down allocations
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+@click.command()
+@click.option("--records", type=int, default=1_000_000, help="The number of records.")
+@click.option("--from-date", default="2015-01-01", help="The timestamp to filter by.")
+@click.option("--seed", type=int, default=0, help="The seed of the random records.")
+def main(records: int, from_date: str, seed: int) -> None:
+    """Measure the time and the peak memory of filtering the open access records modified after a
+    date on both paths.
+
+    Args:
+        records (int): The number of records.
+        from_date (str): The timestamp to filter by.
+        seed (int): The seed of the random records.
+    """
+    from_timestamp = datetime.fromisoformat(from_date)
+    access_types = {AccessType.OPEN}
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "dblp.json"
+        cache_path = Path(tmp) / "dblp.xml.sqlite"
+        # Write the caches of both paths from the same records
+        tree: DatasetJsonDict = {}
+        for tag, record in create_records(records, seed):
+            tree.setdefault(tag, []).append(record)
+        json_path.write_text(json.dumps(tree))
+        write_tree_cache(cache_path, create_records(records, seed))
+        del tree
+
+        def previous() -> DatasetJsonDict:
+            tree = json.loads(json_path.read_text())
+            tree = filter_by_timestamp_fn(tree, from_timestamp)
+            return filter_by_access_fn(tree, access_types)
+
+        def current() -> DatasetJsonDict:
+            rowids = {
+                tag: type_columns.rowid[
+                    create_record_mask(type_columns, access_types, from_timestamp)
+                ]
+                for tag, type_columns in load_tree_columns(cache_path).items()
+            }
+            return read_tree_rows(cache_path, rowids)
+
+        # The columns are built once per cache and saved next to it
+        start = time.perf_counter()
+        load_tree_columns(cache_path)
+        click.echo(
+            f"Built the columns of {records:,} records in {time.perf_counter() - start:.2f}s"
+        )
+
+        previous_tree, previous_time, previous_peak = measure(previous)
+        current_tree, current_time, current_peak = measure(current)
+        # Both paths have to keep the same records in the same order
+        assert previous_tree == current_tree
+        kept = sum(map(len, current_tree.values()))
+        click.echo(f"Kept {kept:,} records modified after {from_date} with open access")
+        click.echo("path                          time   peak memory")
+        for name, elapsed, peak in (
+            ("json cache, two filters", previous_time, previous_peak),
+            ("tree cache, column mask", current_time, current_peak),
+        ):
+            click.echo(f"{name:28s} {elapsed:5.2f}s   {peak / 2**20:7.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark of the JSON backends of `csinsights.data.jsonbackend`. Every installed backend
+decodes and encodes the same synthetic S2 paper records, one json line each.
+
+Usage: poetry run python benchmarks/bench_json.py --records 200000
+"""
+import json
+import random
+import time
+from typing import Callable, Iterable
+
+import click
+
+from csinsights.data.jsonbackend import get_available_backends
+
+
+def create_paper(corpusid: int, rng: random.Random) -> dict:
+    """Create a synthetic paper with the fields of the S2 papers dataset (about 1 KB per line).
+
+    Args:
+        corpusid (int): The corpus id.
+        rng (random.Random): The random number generator.
+
+    Returns:
+        dict: The paper.
+    """
+    return {
+        "corpusid": corpusid,
+        "externalids": {
+            "DBLP": f"conf/acl/{corpusid}" if rng.random() < 0.1 else None,
+            "ArXiv": None,
+            "MAG": str(corpusid * 7),
+            "DOI": f"10.18653/v1/{corpusid}",
+            "CorpusId": str(corpusid),
+            "PubMed": None,
+        },
+        "url": f"https://www.semanticscholar.org/paper/{corpusid:040x}",
+        "title": "A rather long title about transformers and language models é " * 2,
+        "authors": [
+            {"authorId": str(rng.randint(1, 10**9)), "name": "Firstname Lastname"}
+            for _ in range(rng.randint(1, 8))
+        ],
+        "venue": "Annual Meeting of the Association for Computational Linguistics",
+        "publicationvenueid": None,
+        "year": 2021,
+        "referencecount": rng.randint(0, 100),
+        "citationcount": rng.randint(0, 1000),
+        "influentialcitationcount": rng.randint(0, 10),
+        "isopenaccess": True,
+        "s2fieldsofstudy": [{"category": "Computer Science", "source": "s2-fos-model"}],
+        "publicationtypes": ["JournalArticle"],
+        "publicationdate": "2021-01-01",
+        "journal": {"name": "ACL", "pages": "1-10", "volume": "1"},
+        "updated": "2022-01-01T00:00:00",
+    }
+
+
+def best_time(fn: Callable, items: Iterable, repeat: int) -> float:
+    """Measure the best wall time of calling a function on all items. The results are dropped
+    right away, as the pipeline does after filtering or writing a record.
+
+    Args:
+        fn (Callable): The function.
+        items (Iterable): The items to call it on.
+        repeat (int): The number of measurements.
+
+    Returns:
+        float: The best wall time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@click.command()
+@click.option("--records", type=int, default=200_000, help="The number of records.")
+@click.option("--seed", type=int, default=0, help="The seed of the random records.")
+@click.option("--repeat", type=int, default=3, help="The number of measurements per backend.")
+def main(records: int, seed: int, repeat: int) -> None:
+    """Measure the records per second every backend decodes and encodes.
+
+    Args:
+        records (int): The number of records.
+        seed (int): The seed of the random records.
+        repeat (int): The number of measurements per backend, of which the best is reported.
+    """
+    rng = random.Random(seed)
+    lines = [json.dumps(create_paper(corpusid, rng)).encode() for corpusid in range(records)]
+    docs = [json.loads(line) for line in lines]
+    click.echo(f"{records:,} records, {sum(map(len, lines)) / records:.0f} bytes per line")
+    click.echo("backend   loads/s    dumps/s")
+    for name, backend in get_available_backends().items():
+        loads = best_time(backend.loads, lines, repeat)
+        dumps = best_time(backend.dumps, docs, repeat)
+        # Every backend has to read and write the same records
+        assert [backend.loads(line) for line in lines] == docs
+        assert [json.loads(backend.dumps(doc)) for doc in docs] == docs
+        click.echo(f"{name:8s} {records / loads:8.0f}   {records / dumps:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
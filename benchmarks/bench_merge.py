@@ -0,0 +1,117 @@
+"""Benchmark of the hash join of `SemanticScholarDataProcessor._merge_datasets` against the
+previous sort-then-dict merge. Both merge the same synthetic papers and abstracts and have to
+produce the same papers.
+
+Usage: poetry run python benchmarks/bench_merge.py --papers 500000
+"""
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import click
+
+from csinsights.data import SemanticScholarDataProcessor
+
+
+def create_datasets(papers: int, seed: int) -> Dict[str, List[dict]]:
+    """Create papers and abstracts for some of them, plus abstracts without a paper.
+
+    Args:
+        papers (int): The number of papers.
+        seed (int): The seed of the random corpus ids.
+
+    Returns:
+        Dict[str, List[dict]]: The datasets by name.
+    """
+    rng = random.Random(seed)
+    corpusids = rng.sample(range(250_000_000), papers * 2)
+    paper_ids, orphan_ids = corpusids[:papers], corpusids[papers:]
+    # Nine out of ten papers have an abstract and there are as many abstracts without a paper
+    abstracts = papers * 9 // 10
+    abstract_ids = rng.sample(paper_ids, abstracts) + orphan_ids[:abstracts]
+    rng.shuffle(abstract_ids)
+    return {
+        "papers": [
+            {"corpusid": corpusid, "title": "title", "authors": [], "externalids": {}}
+            for corpusid in paper_ids
+        ],
+        "abstracts": [
+            {"corpusid": corpusid, "abstract": "abstract", "openaccessinfo": None}
+            for corpusid in abstract_ids
+        ],
+    }
+
+
+def merge_sorted_dicts(processor: SemanticScholarDataProcessor) -> None:
+    """The previous merge, which sorted every dataset and rebuilt the papers per dataset. Unlike
+    the hash join, it kept abstracts without a paper.
+
+    Args:
+        processor (SemanticScholarDataProcessor): The processor with the datasets to merge.
+    """
+    datasets = processor.datasets
+    for dataset in datasets:
+        datasets[dataset] = sorted(
+            datasets[dataset], key=lambda x: ("corpusid" in x, x.get("corpusid", None))
+        )
+    for dataset in list(datasets):
+        if dataset not in ("authors", "papers"):
+            merged: Dict[int, dict] = defaultdict(dict)
+            for docs in (datasets[dataset], datasets["papers"]):
+                for doc in docs:
+                    merged[doc["corpusid"]].update(doc)
+            datasets["papers"] = list(merged.values())
+
+
+def measure(
+    merge: Callable[[SemanticScholarDataProcessor], None], papers: int, seed: int
+) -> Tuple[List[dict], float, int]:
+    """Merge fresh datasets and measure the wall time and the peak memory of the merge.
+
+    Args:
+        merge (Callable[[SemanticScholarDataProcessor], None]): The merge function.
+        papers (int): The number of papers.
+        seed (int): The seed of the random corpus ids.
+
+    Returns:
+        Tuple[List[dict], float, int]: The merged papers, the wall time in seconds, and the peak
+        traced memory in bytes on top of the datasets.
+    """
+    processor = SemanticScholarDataProcessor(cache_dir=Path("."))
+    processor.datasets.update(create_datasets(papers, seed))
+    tracemalloc.start()
+    start = time.perf_counter()
+    merge(processor)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return processor.datasets["papers"], elapsed, peak
+
+
+@click.command()
+@click.option("--papers", type=int, default=500_000, help="The number of papers.")
+@click.option("--seed", type=int, default=0, help="The seed of the random corpus ids.")
+def main(papers: int, seed: int) -> None:
+    """Compare the wall time and the peak memory of both merges.
+
+    Args:
+        papers (int): The number of papers.
+        seed (int): The seed of the random corpus ids.
+    """
+    click.echo(f"{papers:,} papers")
+    old_papers, elapsed, peak = measure(merge_sorted_dicts, papers, seed)
+    click.echo(f"sort-then-dict  {elapsed:6.2f}s  peak {peak / 2**20:6.0f} MiB")
+    new_papers, elapsed, peak = measure(SemanticScholarDataProcessor._merge_datasets, papers, seed)
+    click.echo(f"hash join       {elapsed:6.2f}s  peak {peak / 2**20:6.0f} MiB")
+    # The previous merge also emitted the abstracts without a paper, which the join drops
+    paper_ids = {paper["corpusid"] for paper in new_papers}
+    expected = {paper["corpusid"]: paper for paper in old_papers if "title" in paper}
+    assert paper_ids == set(expected)
+    assert all(paper == expected[paper["corpusid"]] for paper in new_papers)
+
+
+if __name__ == "__main__":
+    main()
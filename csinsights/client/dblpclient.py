@@ -1,23 +1,80 @@
 """This module implements a client to communicate with DBLP."""
-import gzip
 import hashlib
-import json
 import os
 import shutil
+import sqlite3
 import time
+from array import array
+from collections import defaultdict
 from datetime import datetime
-from gzip import GzipFile
 from pathlib import Path
-from typing import Any, BinaryIO, Dict, List, Optional, Set, Tuple, TypeVar, Union
-
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import numpy as np
 import requests  # type: ignore
-import xmltodict  # type: ignore
 from bs4 import BeautifulSoup  # type: ignore
 from lxml import etree
-from tqdm import tqdm  # type: ignore
 
+from csinsights.client.download import (
+    download_in_chunks as resumable_download_in_chunks,
+)
+from csinsights.client.download import load_checksum, save_checksum
+from csinsights.data import jsonbackend
+from csinsights.data.compression import open_gzip, open_writer
 from csinsights.log import LogMixin
-from csinsights.types import AccessType, DatasetJsonDict, FilterFunction, Url
+from csinsights.types import AccessType, ChangeType, DatasetJsonDict, Url
+
+# Version of the tree cache. Increment it when the records or the layout of the cache change, so
+# that stale caches are rebuilt.
+TREE_CACHE_VERSION = 2
+
+# The bits of the access types in the access codes of the tree columns
+ACCESS_CODES = {
+    access_type.value: 1 << bit
+    for bit, access_type in enumerate(AccessType)
+    if access_type is not AccessType.ALL
+}
+
+# Number of records read from the tree cache by their rowids at once
+ROWID_BATCH_SIZE = 500
+
+
+class RecordColumns(NamedTuple):
+    """The filter columns of the records of a type in the tree cache.
+
+    Args:
+        NamedTuple (Any): A named tuple.
+    """
+
+    rowid: np.ndarray
+    mdate: np.ndarray
+    access: np.ndarray
+
+
+class DBLPDelta(NamedTuple):
+    """The changes of a release since the previous release.
+
+    Args:
+        NamedTuple (Any): A named tuple.
+    """
+
+    added: DatasetJsonDict
+    changed: DatasetJsonDict
+    deleted: List[str]
+
 
 # region helpers
 
@@ -35,17 +92,19 @@ def local_md5(filepath: Path) -> str:
         return md5_in_chunks(f)
 
 
-def remote_md5(file_url: Url) -> str:
+def remote_md5(file_url: Url, session: Optional[requests.Session] = None) -> str:
     """Retrieve the MD5 hash of a remote file.
 
     Args:
         file_url (Url): The url of a remote md5 file.
+        session (Optional[requests.Session], optional): A session to reuse pooled connections
+        from. Defaults to None.
 
     Returns:
         str: The MD5 hash of the remote file in hex format.
     """
     md5_url = file_url + ".md5"
-    page = requests.get(md5_url).text
+    page = (session or requests).get(md5_url).text
     md5 = str(page.partition(" ")[0])
     return md5
 
@@ -69,23 +128,26 @@ def md5_in_chunks(file: BinaryIO, block_size: int = 2 ** 20) -> str:  # noqa: BL
     return md5.hexdigest()
 
 
-def download_in_chunks(url: str, file_path: Path, chunk_size: int = 1024) -> None:
-    """Download a file in chunks.
+def download_in_chunks(
+    url: str,
+    file_path: Path,
+    chunk_size: int = 1024**2,  # noqa: BLK100
+    session: Optional[requests.Session] = None,
+) -> Tuple[int, str]:
+    """Download a file in chunks. Interrupted downloads are resumed.
 
     Args:
         url (str): The url of the file to download.
         file_path (Path): The path to the file to download to.
-        chunk_size (int, optional): The chunk size in bytes. Defaults to 1024.
-    """
-    response = requests.get(url, stream=True)
-    total_size_in_bytes = int(response.headers.get("content-length", 0))
+        chunk_size (int, optional): The chunk size in bytes. Defaults to 1024 ** 2.
+        session (Optional[requests.Session], optional): A session to reuse pooled connections
+        from. Defaults to None.
 
-    progress_bar = tqdm(unit="B", total=total_size_in_bytes)  # type: ignore
-    with open(file_path, "wb") as file:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                progress_bar.update(len(chunk))
-                file.write(chunk)
+    Returns:
+        Tuple[int, str]: The size of the file in bytes and its MD5 hash in hex format, which is
+        computed while the file is downloaded.
+    """
+    return resumable_download_in_chunks(url, file_path, chunk_size=chunk_size, session=session)
 
 
 def compare_md5(md5_1: str, md5_2: str) -> bool:
@@ -101,83 +163,541 @@ def compare_md5(md5_1: str, md5_2: str) -> bool:
     return md5_1 == md5_2
 
 
-def filter_by_timestamp_fn(tree: DatasetJsonDict, from_timestamp: datetime) -> DatasetJsonDict:
-    """A filter function to filter out all elements that have not been modified
-    before a given timestamp.
+def get_access_types(ee: Any) -> List[Optional[str]]:  # noqa: ANN401
+    """Get the access types of the electronic editions (`ee`) of a record as `xmltodict` converts
+    them: a url, a dict with the url and its type, or a list of both.
 
     Args:
-        tree (DatasetJsonDict): The tree to filter.
-        from_timestamp (datetime): The timestamp to filter by.
+        ee (Any): The electronic editions of the record.
 
     Returns:
-        DatasetJsonDict: The filtered tree.
+        List[Optional[str]]: The access type of every edition or None if it has no type.
     """
-    filtered = {
-        element_list_key: [
-            el
-            for el in element_list
-            if datetime.strptime(str(el.get("@mdate")), "%Y-%m-%d") > from_timestamp
-        ]
-        for element_list_key, element_list in tree.items()
+    editions = ee if isinstance(ee, list) else [ee]
+    return [
+        edition.get("@type") if isinstance(edition, dict) else None
+        for edition in editions
+        if edition is not None
+    ]
+
+
+def element_to_dict(element: etree._Element) -> Union[Dict[str, Any], str, None]:
+    """Convert an xml element to the same structure as `xmltodict`. Attributes are prefixed with
+    `@`, repeated children become lists, and the text of elements with attributes or children is
+    stored as `#text`.
+
+    Args:
+        element (etree._Element): The element.
+
+    Returns:
+        Union[Dict[str, Any], str, None]: The element as dict, its text if it has neither
+        attributes nor children, or None if it is empty.
+    """
+    result: Dict[str, Any] = {
+        f"@{name}": value for name, value in element.attrib.items()  # type: ignore
     }
-    return filtered
+    texts = [element.text or ""]
+    for child in element:
+        texts.append(child.tail or "")
+        # Skip comments and processing instructions
+        if not isinstance(child.tag, str):
+            continue
+        value = element_to_dict(child)
+        if child.tag not in result:
+            result[child.tag] = value
+        elif isinstance(result[child.tag], list):
+            result[child.tag].append(value)
+        else:
+            result[child.tag] = [result[child.tag], value]
+    text = "".join(texts).strip()
+    if text:
+        if not result:
+            return text
+        result["#text"] = text
+    return result or None
+
+
+def iter_xml_records(
+    file: BinaryIO,
+    dtd_path: Optional[Path] = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lazily parse the records (e.g., articles) of a DBLP xml file one at a time. Every record is
+    cleared after it was converted, so the tree is never held in memory.
 
+    Args:
+        file (BinaryIO): The xml file.
+        dtd_path (Optional[Path], optional): The path to the DTD to resolve the entities (e.g.,
+        umlauts) of the xml with. Defaults to None which resolves the DTD relative to the file.
 
-def filter_by_access_fn(tree: DatasetJsonDict, access_types: Set[AccessType]) -> DatasetJsonDict:
-    """A filter function to filter out all elements that are no having a certain access type
+    Returns:
+        Iterator[Tuple[str, Dict[str, Any]]]: The type (e.g., article) and the record as dict
+        like `xmltodict` converts it.
+    """
+    context = etree.iterparse(
+        file,
+        events=("start", "end"),
+        load_dtd=True,
+        resolve_entities=True,
+        huge_tree=True,
+        no_network=True,
+    )
+    if dtd_path is not None:
+        context.resolvers.add(DTDResolver(dtd_path))
+    root = None
+    for event, element in context:
+        if root is None:
+            root = element
+        # Records are the children of the root element
+        elif event == "end" and element.getparent() is root:
+            if isinstance(element.tag, str):
+                yield element.tag, element_to_dict(element)  # type: ignore
+            # Drop the record and all records before it
+            element.clear(keep_tail=True)
+            while element.getprevious() is not None:
+                del root[0]
+
+
+def encode_access_types(access_types: List[Optional[str]]) -> Optional[str]:
+    """Encode the access types of a record for the tree cache.
 
     Args:
-        tree (DatasetJsonDict): The tree to filter.
-        access_types (Set[AccessType]): A set of valid access types. All other access types will be
-        filtered out.
+        access_types (List[Optional[str]]): The access types from `get_access_types`.
 
     Returns:
-        DatasetJsonDict: The filtered tree.
+        Optional[str]: The access types joined by commas with empty strings for editions without a
+        type, or None if the record has no electronic edition.
     """
-    filtered = {
-        element_list_key: [
-            el
-            for el in element_list
-            if el.get("ee", {"@type": AccessType.CLOSED}).get("@type") in access_types
-        ]
-        for element_list_key, element_list in tree.items()
+    if not access_types:
+        return None
+    return ",".join(access_type or "" for access_type in access_types)
+
+
+def decode_access_types(access: Optional[str]) -> List[Optional[str]]:
+    """Decode the access types of a record from the tree cache.
+
+    Args:
+        access (Optional[str]): The access types from `encode_access_types`.
+
+    Returns:
+        List[Optional[str]]: The access types as returned by `get_access_types`.
+    """
+    if access is None:
+        return []
+    return [access_type or None for access_type in access.split(",")]
+
+
+def write_tree_cache(file_path: Path, records: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+    """Write records to a SQLite tree cache with one row per record. The modification date and the
+    access types of a record are stored next to it, so that records can be filtered without
+    decoding them. The cache is written to a temporary file and stamped with `TREE_CACHE_VERSION`
+    before it replaces the previous cache, so it is never left half written.
+
+    Args:
+        file_path (Path): The path to the cache.
+        records (Iterable[Tuple[str, Dict[str, Any]]]): The type (e.g., article) and the record,
+        e.g., from `iter_xml_records`.
+    """
+    tmp_path = Path(f"{file_path}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    # The columns are built from the cache, so they are stale once the cache is rebuilt
+    get_tree_columns_path(file_path).unlink(missing_ok=True)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        # The cache is rebuilt from the release if writing fails, so it doesn't need a journal
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute(
+            "CREATE TABLE records"
+            " (type TEXT NOT NULL, key TEXT, mdate TEXT, access TEXT, data BLOB NOT NULL)"
+        )
+        # Records are streamed into the cache, so the tree is never held in memory
+        connection.executemany(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    tag,
+                    record.get("@key"),
+                    record.get("@mdate"),
+                    encode_access_types(get_access_types(record.get("ee"))),
+                    jsonbackend.dumps(record),
+                )
+                for tag, record in records
+            ),
+        )
+        # Records of a type are read in the order of the release from the index
+        connection.execute("CREATE INDEX records_type ON records (type)")
+        connection.execute(f"PRAGMA user_version = {TREE_CACHE_VERSION}")
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, file_path)
+
+
+def get_tree_cache_version(file_path: Path) -> Optional[int]:
+    """Get the version of a tree cache.
+
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Optional[int]: The version or None if the file is not a SQLite database.
+    """
+    try:
+        connection = sqlite3.connect(f"{file_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            version: int = connection.execute("PRAGMA user_version").fetchone()[0]
+            return version
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError:
+        return None
+
+
+def read_tree_cache(file_path: Path, record_types: Optional[Set[str]] = None) -> DatasetJsonDict:
+    """Read records from a tree cache.
+
+    Args:
+        file_path (Path): The path to the cache.
+        record_types (Optional[Set[str]], optional): The types of records to read (e.g., article).
+        Defaults to None which reads all types.
+
+    Returns:
+        DatasetJsonDict: The records grouped by their type.
+    """
+    query = "SELECT type, data FROM records"
+    params: List[str] = []
+    if record_types is not None:
+        params = sorted(record_types)
+        query += f" WHERE type IN ({', '.join('?' * len(params))})"
+    tree: DatasetJsonDict = defaultdict(list)
+    connection = sqlite3.connect(f"{file_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        for tag, data in connection.execute(query, params):
+            tree[tag].append(jsonbackend.loads(data))
+    finally:
+        connection.close()
+    return dict(tree)
+
+
+def get_access_code(access: Optional[str]) -> int:
+    """Get the access code of a record from its access types in the tree cache.
+
+    Args:
+        access (Optional[str]): The access types from `encode_access_types`.
+
+    Returns:
+        int: The bits of `ACCESS_CODES` of all access types of the record. Editions without a type
+        and records without an edition are closed access.
+    """
+    code = 0
+    for access_type in decode_access_types(access) or [None]:
+        code |= ACCESS_CODES.get(access_type or AccessType.CLOSED.value, 0)
+    return code
+
+
+def get_tree_columns_path(file_path: Path) -> Path:
+    """Get the path to the columns of a tree cache.
+
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Path: The path to the columns, e.g., dblp-2022-01-01.xml.columns.npz.
+    """
+    return file_path.with_suffix(".columns.npz")
+
+
+def build_tree_columns(file_path: Path) -> Dict[str, RecordColumns]:
+    """Extract the rowids, modification dates, and access codes of all records of a tree cache
+    into arrays per type.
+
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Dict[str, RecordColumns]: The columns of the records by their type. Modification dates are
+        days (`datetime64[D]`) and NaT if a record has none.
+    """
+    rows: Dict[str, Tuple[List[int], List[Optional[str]], List[int]]] = defaultdict(
+        lambda: ([], [], [])
+    )
+    # There are only a few distinct combinations of access types
+    codes: Dict[Optional[str], int] = {}
+    connection = sqlite3.connect(f"{file_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        for tag, rowid, mdate, access in connection.execute(
+            "SELECT type, rowid, mdate, access FROM records"
+        ):
+            if access not in codes:
+                codes[access] = get_access_code(access)
+            rowids, mdates, access_codes = rows[tag]
+            rowids.append(rowid)
+            mdates.append(mdate)
+            access_codes.append(codes[access])
+    finally:
+        connection.close()
+    return {
+        tag: RecordColumns(
+            np.array(rowids, dtype=np.int64),
+            np.array(mdates, dtype="datetime64[D]"),
+            np.array(access_codes, dtype=np.uint8),
+        )
+        for tag, (rowids, mdates, access_codes) in rows.items()
+    }
+
+
+def save_tree_columns(file_path: Path, columns: Dict[str, RecordColumns]) -> None:
+    """Save the columns of a tree cache next to it. The columns are stamped with
+    `TREE_CACHE_VERSION`.
+
+    Args:
+        file_path (Path): The path to the cache.
+        columns (Dict[str, RecordColumns]): The columns from `build_tree_columns`.
+    """
+    columns_path = get_tree_columns_path(file_path)
+    tmp_path = Path(f"{columns_path}.tmp")
+    arrays = {
+        f"{tag}.{name}": array
+        for tag, type_columns in columns.items()
+        for name, array in type_columns._asdict().items()
     }
-    return filtered
+    with open(tmp_path, "wb") as f:
+        np.savez(f, version=np.array(TREE_CACHE_VERSION), **arrays)
+    os.replace(tmp_path, columns_path)
+
 
+def load_tree_columns(file_path: Path) -> Dict[str, RecordColumns]:
+    """Load the columns of a tree cache. They are built and saved if they don't exist or are
+    stale.
 
-def create_timestamp_filter(
-    from_timestamp: datetime,
-) -> FilterFunction:
-    """A helper function that transforms the filter iterator to a list.
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Dict[str, RecordColumns]: The columns of the records by their type.
+    """
+    columns_path = get_tree_columns_path(file_path)
+    if columns_path.exists():
+        with np.load(columns_path, allow_pickle=False) as arrays:
+            if int(arrays["version"]) == TREE_CACHE_VERSION:
+                # Keep the order of the types in the release
+                tags = dict.fromkeys(
+                    name.rpartition(".")[0] for name in arrays.files if name != "version"
+                )
+                return {
+                    tag: RecordColumns(*(arrays[f"{tag}.{name}"] for name in RecordColumns._fields))
+                    for tag in tags
+                }
+    columns = build_tree_columns(file_path)
+    save_tree_columns(file_path, columns)
+    return columns
+
+
+def create_record_mask(
+    columns: RecordColumns, access_types: Set[AccessType], from_timestamp: datetime
+) -> np.ndarray:
+    """Evaluate the timestamp and the access filter on the columns of records at once. Records
+    without a typed electronic edition are closed access.
 
     Args:
-        from_timestamp (datetime): The timestamp to filter by.
+        columns (RecordColumns): The columns of the records.
+        access_types (Set[AccessType]): A set of valid access types. Records of other access types
+        are filtered out unless the set contains `AccessType.ALL`.
+        from_timestamp (datetime): The timestamp to filter by. Records that have not been
+        modified after the timestamp are filtered out.
 
     Returns:
-        FilterFunction: A function to be called that returns a filtered of elements.
+        np.ndarray: A boolean mask of the records to keep.
     """
-    return lambda x: filter_by_timestamp_fn(x, from_timestamp)
+    # Records without a modification date are NaT, which is never greater
+    mask = columns.mdate > np.datetime64(from_timestamp.date(), "D")
+    if AccessType.ALL not in access_types:
+        valid_codes = 0
+        for access_type in access_types:
+            valid_codes |= ACCESS_CODES[AccessType(access_type).value]
+        mask &= (columns.access & valid_codes) != 0
+    return mask
 
 
-def create_open_access_filter(
-    access_types: Set[AccessType],
-) -> FilterFunction:
-    """A helper function that transforms the filter iterator to a list.
+def read_tree_rows(file_path: Path, rowids: Dict[str, np.ndarray]) -> DatasetJsonDict:
+    """Read records from a tree cache by their rowids.
 
     Args:
-        access_types (Set[AccessType]): The access types to filter by.
+        file_path (Path): The path to the cache.
+        rowids (Dict[str, np.ndarray]): The sorted rowids of the records to read by their type.
 
     Returns:
-        FilterFunction: A function to be called that returns a filtered elements.
+        DatasetJsonDict: The records grouped by their type in the order of the release.
     """
-    return lambda x: filter_by_access_fn(x, access_types)
+    tree: DatasetJsonDict = {}
+    connection = sqlite3.connect(f"{file_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        for tag, type_rowids in rowids.items():
+            tree[tag] = []
+            for start in range(0, len(type_rowids), ROWID_BATCH_SIZE):
+                end = start + ROWID_BATCH_SIZE
+                batch = type_rowids[start:end].tolist()
+                tree[tag].extend(
+                    jsonbackend.loads(data)
+                    for (data,) in connection.execute(
+                        f"SELECT data FROM records WHERE rowid IN ({', '.join('?' * len(batch))})"
+                        " ORDER BY rowid",
+                        batch,
+                    )
+                )
+    finally:
+        connection.close()
+    return tree
+
+
+def get_fingerprint_path(file_path: Path) -> Path:
+    """Get the path to the fingerprint of a tree cache.
+
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Path: The path to the fingerprint, e.g., dblp-2022-01-01.xml.fingerprint.tsv.gz.
+    """
+    return file_path.with_suffix(".fingerprint.tsv.gz")
+
+
+def iter_cache_keys(file_path: Path) -> Iterator[Tuple[str, str, int]]:
+    """Iterate over the keys and the modification dates of the records of a tree cache.
+
+    Args:
+        file_path (Path): The path to the cache.
+
+    Returns:
+        Iterator[Tuple[str, str, int]]: The key, the modification date (empty if a record has
+        none), and the rowid of every record sorted by key.
+    """
+    connection = sqlite3.connect(f"{file_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        yield from connection.execute(
+            "SELECT key, coalesce(mdate, ''), rowid FROM records WHERE key IS NOT NULL"
+            " ORDER BY key"
+        )
+    finally:
+        connection.close()
+
+
+def write_fingerprint(
+    fingerprint_path: Path, entries: Iterable[Tuple[str, str, int]]
+) -> Iterator[Tuple[str, str, int]]:
+    """Write the fingerprint of a release while passing its entries through. The fingerprint is a
+    gzip file with a tab separated key and modification date per line, sorted by key. It is
+    written to a temporary file and only replaces the previous fingerprint once all entries have
+    been consumed.
+
+    Args:
+        fingerprint_path (Path): The path to the fingerprint.
+        entries (Iterable[Tuple[str, str, int]]): The entries from `iter_cache_keys`.
+
+    Returns:
+        Iterator[Tuple[str, str, int]]: The entries.
+    """
+    tmp_path = Path(f"{fingerprint_path}.tmp")
+    with open_writer(tmp_path) as f:
+        for key, mdate, rowid in entries:
+            f.write(f"{key}\t{mdate}\n".encode())
+            yield key, mdate, rowid
+    os.replace(tmp_path, fingerprint_path)
+
+
+def iter_fingerprint(fingerprint_path: Path) -> Iterator[Tuple[str, str]]:
+    """Iterate over the fingerprint of a release.
+
+    Args:
+        fingerprint_path (Path): The path to the fingerprint.
+
+    Returns:
+        Iterator[Tuple[str, str]]: The key and the modification date of every record sorted by
+        key.
+    """
+    with open_gzip(fingerprint_path) as f:
+        for line in f:
+            key, _, mdate = line.decode().rstrip("\n").partition("\t")
+            yield key, mdate
+
+
+def diff_fingerprints(
+    previous: Iterable[Tuple[str, str]], current: Iterable[Tuple[str, str, int]]
+) -> Iterator[Tuple[ChangeType, str, Optional[int]]]:
+    """Compare the records of two releases by merging their entries sorted by key. A record
+    changed if its modification date changed.
+
+    Args:
+        previous (Iterable[Tuple[str, str]]): The entries of the previous release, e.g., from
+        `iter_fingerprint`.
+        current (Iterable[Tuple[str, str, int]]): The entries of the current release, e.g., from
+        `iter_cache_keys`.
+
+    Returns:
+        Iterator[Tuple[ChangeType, str, Optional[int]]]: The change, the key, and the rowid in the
+        current release (None for deleted records) of every record that was added, changed, or
+        deleted.
+    """
+    previous_iter, current_iter = iter(previous), iter(current)
+    previous_entry, current_entry = next(previous_iter, None), next(current_iter, None)
+    while previous_entry is not None or current_entry is not None:
+        if current_entry is None or (
+            previous_entry is not None and previous_entry[0] < current_entry[0]
+        ):
+            assert previous_entry is not None
+            yield ChangeType.DELETED, previous_entry[0], None
+            previous_entry = next(previous_iter, None)
+        elif previous_entry is None or current_entry[0] < previous_entry[0]:
+            yield ChangeType.ADDED, current_entry[0], current_entry[2]
+            current_entry = next(current_iter, None)
+        else:
+            if previous_entry[1] != current_entry[1]:
+                yield ChangeType.CHANGED, current_entry[0], current_entry[2]
+            previous_entry, current_entry = next(previous_iter, None), next(current_iter, None)
 
 
 # endregion
 
+R = TypeVar("R", bound="DTDResolver")
 T = TypeVar("T", bound="DBLPClient")
 
 
+class DTDResolver(etree.Resolver):
+    """Resolves the DTD that a DBLP xml file references to a downloaded DTD.
+
+    Args:
+        etree.Resolver (Any): The base class of lxml resolvers.
+    """
+
+    def __init__(self: R, dtd_path: Path) -> None:
+        """Constructor of the DTDResolver.
+
+        Args:
+            self (R): This object.
+            dtd_path (Path): The path to the downloaded DTD.
+        """
+        super().__init__()
+        self.dtd_path = dtd_path
+
+    def resolve(  # type: ignore
+        self: R, system_url: str, public_id: str, context: Any  # noqa: ANN401
+    ) -> Any:  # noqa: ANN401
+        """Resolve the url of a DTD to the downloaded DTD.
+
+        Args:
+            self (R): This object.
+            system_url (str): The url of the referenced file.
+            public_id (str): The public id of the referenced file.
+            context (Any): The context of the resolver.
+
+        Returns:
+            Any: The resolved DTD or None to resolve other files as usual.
+        """
+        if system_url.endswith(".dtd"):
+            return self.resolve_filename(str(self.dtd_path), context)  # type: ignore
+        return None
+
+
 class DBLPClient(LogMixin):
     """A client for the DBLP XML releases.
 
@@ -203,6 +723,8 @@ class DBLPClient(LogMixin):
         self.base_url = base_url
         self.cache_dir = cache_dir
         self.filename_suffixes = filename_suffixes
+        # Share one connection pool between the requests of the release page, md5, dtd, and xml
+        self.session = requests.Session()
         self.releases = []
 
     @property
@@ -254,6 +776,7 @@ class DBLPClient(LogMixin):
         dblp_use_filters: bool,
         dblp_access_type: Set[AccessType],
         dblp_from_timestamp: datetime = datetime(1980, 1, 1),
+        dblp_record_types: Optional[Iterable[str]] = None,
         **kwargs: Union[str, int, bool, AccessType, datetime],
     ) -> DatasetJsonDict:
         """Downloads and filters the latest release according to the given parameters.
@@ -264,47 +787,143 @@ class DBLPClient(LogMixin):
             modified before.
             dblp_access_type (AccessType, optional): [description]. Filter parameter. Ignore all
             objects which are not having the given access type. Defaults to AccessType.OPEN.
+            dblp_record_types (Optional[Iterable[str]], optional): The types of records to load
+            (e.g., article, inproceedings). Defaults to None which loads all types.
 
         Returns:
             DatasetJsonDict: Returns a tree of elements from the release after filtering.
         """
         # time the opertaion for debugging purposes
         start = time.perf_counter()
-        # Get serialized cache file if it exists
-        serialized_path = self._get_serialized_cache_hit()
-        # If there is a cache hit for the current release, load it from there and skip other steps
-        if serialized_path:
-            # Load the serialized file
-            tree = self._deserialize_tree(file_path=serialized_path)
-        # Otherwise download the latest release, compare md5 hashes, extract, and serialize it
-        else:
-            # download latest xml, dtd, and check md5 hash
-            file_path_xml_gz = self._download_latest_xml()
-            # load main tree
-            tree = self._load_xml_as_dict(file_path_xml_gz)
-            # serialize the tree to a file
-            self._serialize_tree(tree)
-        # Init filters
-        filters = []
+        # Get the cache of the latest release
+        serialized_path, cache_hit = self._get_or_build_cache()
+        record_types = set(dblp_record_types) if dblp_record_types else None
         # Use filters only if flag is set
         if dblp_use_filters:
-            # create filters (strongest filters first for performance reasons)
-            timestmap_filter = create_timestamp_filter(dblp_from_timestamp)
-            if dblp_access_type is not AccessType.ALL:
-                access_filter = create_open_access_filter(dblp_access_type)
-            filters.extend([timestmap_filter, access_filter])
-        # filter release according to `filters`
-        filtered_tree = self._filter_elements(tree, *filters)
+            # Filter the columns of the cache and load only the records that are kept
+            filtered_tree = self._filter_columns(
+                serialized_path, dblp_access_type, dblp_from_timestamp, record_types
+            )
+        else:
+            # Load all records of the requested types from the cache
+            filtered_tree = self._deserialize_tree(
+                file_path=serialized_path, record_types=record_types
+            )
         # time the operation for debugging purposes
         end = time.perf_counter()
         # in debug mode, log the time it took to download and filter the xml
         self.logger.debug(
-            f"Downloaded and filtered release {'with' if serialized_path else 'without'} cache"
+            f"Downloaded and filtered release {'with' if cache_hit else 'without'} cache"
             f" in {end - start:.2f} seconds."
         )
         # Return filtered children
         return filtered_tree
 
+    def download_and_diff_release(
+        self: T,
+        dblp_use_filters: bool,
+        dblp_access_type: Set[AccessType],
+        dblp_from_timestamp: datetime = datetime(1980, 1, 1),
+        dblp_record_types: Optional[Iterable[str]] = None,
+        **kwargs: Union[str, int, bool, AccessType, datetime],
+    ) -> DBLPDelta:
+        """Downloads the latest release and compares it with the previous release by the keys and
+        the modification dates of the records. The previous release is compared by its
+        fingerprint, so its cache is not needed once the fingerprint was written. If there is
+        neither, all records are added.
+
+        Args:
+            self (T): This object.
+            dblp_use_filters (bool): Whether to filter the added and changed records.
+            dblp_access_type (Set[AccessType]): Filter parameter. Ignore all objects which are not
+            having the given access type.
+            dblp_from_timestamp (datetime, optional): Filter parameter. Ignore all objects which
+            have been modified before. Defaults to datetime(1980, 1, 1).
+            dblp_record_types (Optional[Iterable[str]], optional): The types of records to load
+            (e.g., article, inproceedings). Defaults to None which loads all types.
+
+        Returns:
+            DBLPDelta: The added and changed records of the latest release and the keys of the
+            deleted records.
+        """
+        # time the opertaion for debugging purposes
+        start = time.perf_counter()
+        # Get the cache of the latest release
+        serialized_path, _ = self._get_or_build_cache()
+        # Get the fingerprint of the previous release
+        previous_fingerprint_path = self._get_previous_fingerprint()
+        self.logger.debug(
+            f"Comparing {str(serialized_path)} with {str(previous_fingerprint_path)}"
+            f" {self.long_opertaion_log}"
+        )
+        previous = iter_fingerprint(previous_fingerprint_path) if previous_fingerprint_path else []
+        # Write the fingerprint of the latest release for the next comparison while comparing
+        current = write_fingerprint(
+            get_fingerprint_path(serialized_path), iter_cache_keys(serialized_path)
+        )
+        added_rowids, changed_rowids = array("q"), array("q")
+        deleted: List[str] = []
+        for change, key, rowid in diff_fingerprints(previous, current):
+            if change is ChangeType.ADDED:
+                added_rowids.append(rowid)  # type: ignore
+            elif change is ChangeType.CHANGED:
+                changed_rowids.append(rowid)  # type: ignore
+            else:
+                deleted.append(key)
+        # Select the added and changed records of the requested types that are kept
+        record_types = set(dblp_record_types) if dblp_record_types else None
+        added: Dict[str, np.ndarray] = {}
+        changed: Dict[str, np.ndarray] = {}
+        for tag, type_columns in load_tree_columns(serialized_path).items():
+            if record_types is not None and tag not in record_types:
+                continue
+            kept = type_columns.rowid
+            if dblp_use_filters:
+                kept = kept[create_record_mask(type_columns, dblp_access_type, dblp_from_timestamp)]
+            added[tag] = kept[np.isin(kept, np.frombuffer(added_rowids, dtype=np.int64))]
+            changed[tag] = kept[np.isin(kept, np.frombuffer(changed_rowids, dtype=np.int64))]
+        delta = DBLPDelta(
+            read_tree_rows(serialized_path, added),
+            read_tree_rows(serialized_path, changed),
+            deleted,
+        )
+        # time the operation for debugging purposes
+        end = time.perf_counter()
+        # in debug mode, log the size of the delta and the time it took
+        self.logger.debug(
+            f"Found {sum(map(len, delta.added.values()))} added,"
+            f" {sum(map(len, delta.changed.values()))} changed, and {len(deleted)} deleted"
+            f" records in {end - start:.2f} seconds."
+        )
+        return delta
+
+    def _get_or_build_cache(self: T) -> Tuple[Path, bool]:
+        # Get serialized cache file if it exists
+        serialized_path = self._get_serialized_cache_hit()
+        if serialized_path is not None:
+            return serialized_path, True
+        # Otherwise download the latest release, compare md5 hashes, and stream it into the cache
+        file_path_xml_gz = self._download_latest_xml()
+        # serialize the records to the cache without loading the tree
+        return self._serialize_tree(self._iter_xml_records(file_path_xml_gz)), False
+
+    def _get_previous_fingerprint(self: T) -> Optional[Path]:
+        # The previous release is the second latest release
+        try:
+            previous_path = self._get_serialized_path(skip=2)
+        except StopIteration:
+            return None
+        fingerprint_path = get_fingerprint_path(previous_path)
+        if fingerprint_path.is_file():
+            return fingerprint_path
+        # Write the fingerprint from the cache of the previous release if it is still there
+        if get_tree_cache_version(previous_path) == TREE_CACHE_VERSION:
+            for _ in write_fingerprint(fingerprint_path, iter_cache_keys(previous_path)):
+                pass
+            return fingerprint_path
+        self.logger.debug(f"There is no fingerprint of the previous release {str(previous_path)}")
+        return None
+
     def _get_filename_from_url(self: T, url: Url) -> Path:
         """Get the filename from the url.
 
@@ -316,75 +935,80 @@ class DBLPClient(LogMixin):
         """
         return Path(os.path.join(self.cache_dir, url.rpartition("/")[-1]))
 
-    def _deserialize_tree(self: T, file_path: Path) -> DatasetJsonDict:
+    def _deserialize_tree(
+        self: T, file_path: Path, record_types: Optional[Set[str]] = None
+    ) -> DatasetJsonDict:
         self.logger.debug(
             f"Deserializing tree from file {str(file_path)} {self.long_opertaion_log}"
         )
-        # Open filepath and read json (this can take up to three minutes)
-        with open(file_path, "r") as f:
-            tree: DatasetJsonDict = json.load(f)
-            return tree
+        # Read only the records of the requested types from the cache
+        return read_tree_cache(file_path, record_types=record_types)
 
-    def _serialize_tree(self: T, tree: DatasetJsonDict) -> None:
-        # Get the latest release url
-        xml_gz_url = self._get_latest_release_file(extension=".xml.gz")
+    def _serialize_tree(self: T, records: Iterable[Tuple[str, Dict[str, Any]]]) -> Path:
         # get the serialized path
-        serialized_path = self._get_filename_from_url(url=xml_gz_url).with_suffix(".json")
+        serialized_path = self._get_serialized_path()
         self.logger.debug(
             f"Serializing tree to file {str(serialized_path)} {self.long_opertaion_log}"
         )
-        # serialize the tree to a file
-        with open(serialized_path, "w") as f:
-            json.dump(tree, f)
+        # serialize the records to a file
+        write_tree_cache(serialized_path, records)
+        return serialized_path
 
-    def _get_serialized_cache_hit(self: T) -> Optional[Path]:
+    def _get_serialized_path(self: T, skip: int = 1) -> Path:
         # Get the latest release url
-        xml_gz_url = self._get_latest_release_file(extension=".xml.gz")
+        xml_gz_url = self._get_latest_release_file(extension=".xml.gz", skip=skip)
+        # The cache is named like the release, e.g., dblp-2022-01-01.xml.sqlite
+        return self._get_filename_from_url(url=xml_gz_url).with_suffix(".sqlite")
+
+    def _get_serialized_cache_hit(self: T) -> Optional[Path]:
         # Get the serialized cache path
-        serialized_path = self._get_filename_from_url(url=xml_gz_url).with_suffix(".json")
+        serialized_path = self._get_serialized_path()
         # Check if there exists a serialized cache hit for the current release
-        if serialized_path.exists() and serialized_path.is_file():
-            # If there is a cache hit, load it from there and skip other steps
-            return serialized_path
-        # If there is no cache hit, return None
-        return None
-
-    def _filter_elements(
+        if not (serialized_path.exists() and serialized_path.is_file()):
+            # If there is no cache hit, return None
+            return None
+        # Caches of other versions are stale and rebuilt
+        if get_tree_cache_version(serialized_path) != TREE_CACHE_VERSION:
+            self.logger.debug(f"Rebuilding stale cache {str(serialized_path)}")
+            return None
+        # If there is a cache hit, load it from there and skip other steps
+        return serialized_path
+
+    def _filter_columns(
         self: T,
-        tree: DatasetJsonDict,
-        *filters: FilterFunction,
-        **kwargs: Dict[str, Any],
+        file_path: Path,
+        access_types: Set[AccessType],
+        from_timestamp: datetime,
+        record_types: Optional[Set[str]] = None,
     ) -> DatasetJsonDict:
-        """Filtering elements from a JSON dict.
+        """Filtering the records of a tree cache on its columns and loading the kept records.
 
         Args:
             self (T): This object.
-            children (DatasetJsonDict): Elements to filter.
+            file_path (Path): The path to the cache.
+            access_types (Set[AccessType]): A set of valid access types.
+            from_timestamp (datetime): The timestamp to filter by.
+            record_types (Optional[Set[str]], optional): The types of records to load. Defaults to
+            None which loads all types.
 
         Returns:
-            DatasetJsonDict: A filtered JSON dict.
+            DatasetJsonDict: The kept records grouped by their type.
         """
-        # Get the arg whether to filter or not
-        dblp_use_filters = kwargs.pop("dblp_use_filters", True)
-        # Set the results to the input children
-        res = tree
-        # Check whether to filter or not. The filters would not have been created if the flag is
-        # not set but this is a safe check.
-        if dblp_use_filters:
-            # In debug mode, log the operation
-            self.logger.debug(
-                f"Filtering elements according to `filters` {self.long_opertaion_log}"
-            )
-            # Apply filters sequentially
-            for filter_ in filters:
-                res = filter_(res)
-        # Return filtered children
-        return res
+        # The columns are extracted once per cache and saved next to it
+        columns = load_tree_columns(file_path)
+        # In debug mode, log the operation
+        self.logger.debug(f"Filtering columns of {str(file_path)} {self.long_opertaion_log}")
+        rowids = {
+            tag: type_columns.rowid[create_record_mask(type_columns, access_types, from_timestamp)]
+            for tag, type_columns in columns.items()
+            if record_types is None or tag in record_types
+        }
+        return read_tree_rows(file_path, rowids)
 
     def _fetch_releases(self: T, desc: bool = True) -> List[str]:
         # Get release url
         url = f"{self.base_url}/release"
-        page = requests.get(url).text
+        page = self.session.get(url).text
         # Parse the page
         soup = BeautifulSoup(page, "html.parser")
         # Filter all hyperlinks (these are the release links)
@@ -431,23 +1055,31 @@ class DBLPClient(LogMixin):
             self.logger.debug(f"Using cached {file_path}")
         # If not, download it
         else:
-            download_in_chunks(dtd_url, file_path)
+            download_in_chunks(dtd_url, file_path, session=self.session)
             self.logger.debug(f"Saved file {file_path}")
 
     def _download_xml(self: T, file_url: Url) -> Path:
         # Get filename, path, and remote md5 hash
         file_path = self._get_filename_from_url(url=file_url)
-        md5_remote = remote_md5(file_url)
+        md5_remote = remote_md5(file_url, session=self.session)
+        # Trust the md5 of the sidecar if the file didn't change since it was verified
+        md5_local = load_checksum(file_path)
+        # Hash files that were cached without a sidecar once
+        if md5_local is None and os.path.isfile(file_path):
+            md5_local = local_md5(file_path)
+            if compare_md5(md5_local, md5_remote):
+                save_checksum(file_path, file_path.stat().st_size, md5_local)
         # If cached file is already there and has correct md5, skip
-        if os.path.isfile(file_path) and compare_md5(local_md5(file_path), md5_remote):
+        if md5_local is not None and compare_md5(md5_local, md5_remote):
             self.logger.debug(f"Using cached {file_path}")
-        # Else, download the dataset
+        # Else, download the dataset and hash it while it is downloaded
         else:
-            download_in_chunks(file_url, file_path)
+            size, md5_local = download_in_chunks(file_url, file_path, session=self.session)
             self.logger.debug(f"Saved file {file_path}")
-            if not compare_md5(local_md5(file_path), md5_remote):
+            if not compare_md5(md5_local, md5_remote):
                 # If the md5 doesn't match, raise an error
                 raise ValueError("Md5 of downloaded file does not match with remote md5")
+            save_checksum(file_path, size, md5_local)
         return file_path
 
     def _unzip_xml_gz(self: T, file_path_in: Path) -> Path:
@@ -463,7 +1095,7 @@ class DBLPClient(LogMixin):
             self.logger.debug(f"Unzipping {file_path_in} to {file_path_out}")
             # Always unzip. Only then it is guranteed that the md5 was matched
             # Otherwise when the process is canceled we can not guarantee the file is not corrupted
-            with gzip.open(file_path_in, "rb") as f_in, open(file_path_out, "wb") as f_out:
+            with open_gzip(file_path_in) as f_in, open(file_path_out, "wb") as f_out:
                 shutil.copyfileobj(f_in, f_out)
             self.logger.debug(f"Saved file {file_path_out}")
             return file_path_out
@@ -478,11 +1110,8 @@ class DBLPClient(LogMixin):
         # dtd needs to be in the same directory as the xml
         return etree.parse(path, parser=parser)
 
-    def _load_xml_as_dict(self: T, file_path_gz: Path) -> DatasetJsonDict:
-        self.logger.debug(
-            f"Loading {file_path_gz} in streaming mode as dict {self.long_opertaion_log}"
-        )
-        # This operation is very slow. However, it only has to be executed once per release
-        # (i.e., once per month). After that everything is cached to JSON.
-        parsed_dict: Dict[str, DatasetJsonDict] = xmltodict.parse(GzipFile(file_path_gz))
-        return parsed_dict["dblp"]
+    def _iter_xml_records(self: T, file_path_gz: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # The entities of the xml are declared in the dtd of the same release
+        dtd_path = self._get_filename_from_url(self._get_latest_release_file(extension=".dtd"))
+        with open_gzip(file_path_gz) as f:
+            yield from iter_xml_records(f, dtd_path)  # type: ignore
@@ -0,0 +1,378 @@
+"""This module implements resumable and verified downloads shared by all clients."""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import requests  # type: ignore
+from tqdm import tqdm
+
+from csinsights.data import jsonbackend
+from csinsights.data.compression import open_gzip
+from csinsights.data.release import HashingWriter
+
+# region helpers
+
+
+def update_progress(progress_bar: tqdm, downloaded: int = 0, size: int = 0) -> None:
+    """Update a progress bar in bytes that may be shared by concurrent downloads. tqdm updates
+    its counters without a lock, so they are updated under the lock of the progress bar.
+
+    Args:
+        progress_bar (tqdm): The progress bar.
+        downloaded (int, optional): The number of bytes downloaded since the last update.
+        Defaults to 0.
+        size (int, optional): The number of bytes to grow the total by, once the size of a
+        download is known. Defaults to 0.
+    """
+    with progress_bar.get_lock():
+        if size:
+            progress_bar.total = (progress_bar.total or 0) + size
+            progress_bar.refresh()
+        if downloaded:
+            progress_bar.update(downloaded)
+
+
+def download_in_chunks(
+    url: str,
+    file_path: Path,
+    chunk_size: int = 1024**2,  # noqa: BLK100
+    session: Optional[requests.Session] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Tuple[int, str]:
+    """Download a file in chunks. The file is written to a temporary `.part` file first which
+    is renamed atomically when the download is complete. If a `.part` file exists from an
+    interrupted download, the download is resumed with an HTTP Range request. The request is
+    conditional on the validator (ETag or Last-Modified) of the interrupted download, so that a
+    part of another version of the file (e.g., of another release) is downloaded again instead.
+
+    Args:
+        url (str): The url of the file to download.
+        file_path (Path): The path to the file to download to.
+        chunk_size (int, optional): The chunk size in bytes. Defaults to 1024 ** 2.
+        session (Optional[requests.Session], optional): A session to reuse pooled connections
+        from. Defaults to None.
+        progress_bar (Optional[tqdm], optional): A shared progress bar in bytes that is updated
+        instead of creating a new one. Defaults to None.
+
+    Raises:
+        IOError: If the connection closed before the whole file was received.
+
+    Returns:
+        Tuple[int, str]: The size of the file in bytes and its MD5 hash in hex format.
+    """
+    part_path = Path(f"{file_path}.part")
+    validator_path = get_validator_path(part_path)
+    md5 = hashlib.md5()
+    # Hash what was already downloaded to resume the hash and request the remainder. A part
+    # without a validator can't be matched to a version of the file, so it is downloaded again
+    offset = 0
+    validator = load_validator(part_path)
+    if validator is not None:
+        with open(part_path, "rb") as f:
+            for data in iter(lambda: f.read(chunk_size), b""):
+                md5.update(data)
+                offset += len(data)
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else None
+    response = (session or requests).get(url, stream=True, headers=headers)
+    # The range starts at the end of the same version, so the part file is already complete
+    if response.status_code == 416:
+        response.close()
+        os.replace(part_path, file_path)
+        validator_path.unlink(missing_ok=True)
+        return offset, md5.hexdigest()
+    response.raise_for_status()
+    # The server sent the whole file (e.g., another version of it), so start from the beginning
+    if response.status_code != 206:
+        offset = 0
+        md5 = hashlib.md5()
+        save_validator(part_path, response.headers)
+    total_size_in_bytes = offset + int(response.headers.get("content-length", 0))
+
+    if progress_bar is None:
+        progress_bar = tqdm(unit="B", unit_scale=True, total=total_size_in_bytes)  # type: ignore
+        progress_bar.update(offset)
+    else:
+        # Grow the total of the shared progress bar as soon as the size is known
+        update_progress(progress_bar, size=total_size_in_bytes - offset)
+    size = offset
+    with open(part_path, "ab" if offset else "wb") as file:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                update_progress(progress_bar, downloaded=len(chunk))
+                file.write(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+    response.close()
+    # Keep the part file to resume from if the connection closed early
+    if "content-length" in response.headers and size != total_size_in_bytes:
+        raise IOError(f"Download of {url} ended after {size} of {total_size_in_bytes} bytes")
+    os.replace(part_path, file_path)
+    validator_path.unlink(missing_ok=True)
+    return size, md5.hexdigest()
+
+
+def get_validator_path(part_path: Path) -> Path:
+    """Get the path to the validator sidecar of a part file.
+
+    Args:
+        part_path (Path): The path to the part file.
+
+    Returns:
+        Path: The path to the sidecar, e.g., papers_0.jsonl.gz.part.json.
+    """
+    return Path(f"{part_path}.json")
+
+
+def save_validator(part_path: Path, headers: Mapping[str, str]) -> None:
+    """Save the validator of the version of a file that is downloaded to a part file. Weak ETags
+    can't be used to resume a download, so the modification time is used instead.
+
+    Args:
+        part_path (Path): The path to the part file.
+        headers (Mapping[str, str]): The headers of the response.
+    """
+    validator_path = get_validator_path(part_path)
+    etag = headers.get("ETag")
+    validator = etag if etag and not etag.startswith("W/") else headers.get("Last-Modified")
+    if validator is None:
+        validator_path.unlink(missing_ok=True)
+        return
+    with open(validator_path, "w") as f:
+        json.dump({"validator": validator}, f)
+
+
+def load_validator(part_path: Path) -> Optional[str]:
+    """Load the validator of the version of a file that was downloaded to a part file.
+
+    Args:
+        part_path (Path): The path to the part file.
+
+    Returns:
+        Optional[str]: The ETag or the modification time, or None if the part file or its
+        validator is missing.
+    """
+    validator_path = get_validator_path(part_path)
+    if not (part_path.is_file() and validator_path.is_file()):
+        return None
+    with open(validator_path, "r") as f:
+        validator: Optional[str] = json.load(f).get("validator")
+    return validator
+
+
+def download_and_filter_in_chunks(
+    url: str,
+    file_path: Path,
+    filter_fn: Callable[[Iterable[bytes]], Iterable[dict]],
+    session: Optional[requests.Session] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Tuple[int, str]:
+    """Download a .jsonl.gz file and only store the records that pass a filter. The response is
+    decompressed and filtered while it arrives, so the unfiltered file is never stored. The
+    filtered file is written to a temporary `.part` file first which is renamed atomically.
+
+    Args:
+        url (str): The url of the .jsonl.gz file to download.
+        file_path (Path): The path to the filtered .jsonl.gz file.
+        filter_fn (Callable[[Iterable[bytes]], Iterable[dict]]): A function that parses and
+        filters the json lines.
+        session (Optional[requests.Session], optional): A session to reuse pooled connections
+        from. Defaults to None.
+        progress_bar (Optional[tqdm], optional): A shared progress bar in bytes that is updated
+        instead of creating a new one. Defaults to None.
+
+    Returns:
+        Tuple[int, str]: The size of the filtered file in bytes and its MD5 hash in hex format.
+    """
+    part_path = Path(f"{file_path}.part")
+    response = (session or requests).get(url, stream=True)
+    response.raise_for_status()
+    total_size_in_bytes = int(response.headers.get("content-length", 0))
+
+    if progress_bar is None:
+        progress_bar = tqdm(unit="B", unit_scale=True, total=total_size_in_bytes)  # type: ignore
+    else:
+        # Grow the total of the shared progress bar as soon as the size is known
+        update_progress(progress_bar, size=total_size_in_bytes)
+    # Count the received (compressed) bytes and hash the written (compressed) bytes
+    source = ProgressReader(response.raw, progress_bar)  # type: ignore
+    with open(part_path, "wb") as file:
+        target = HashingWriter(file)
+        # Receive and inflate in the background while filtering
+        f_in = open_gzip(source)  # type: ignore
+        with f_in, gzip.GzipFile(fileobj=target, mode="wb") as f_out:
+            for doc in filter_fn(f_in):
+                f_out.write(jsonbackend.dumps(doc) + b"\n")
+    response.close()
+    os.replace(part_path, file_path)
+    return target.size, target.md5.hexdigest()
+
+
+def get_checksum_path(file_path: Path) -> Path:
+    """Get the path to the checksum sidecar of a file.
+
+    Args:
+        file_path (Path): The path to the file.
+
+    Returns:
+        Path: The path to the sidecar, e.g., dblp.xml.gz.checksum.json.
+    """
+    return Path(f"{file_path}.checksum.json")
+
+
+def save_checksum(file_path: Path, size: int, md5: str) -> None:
+    """Save the verified MD5 hash of a file in a sidecar together with the size and modification
+    time of the file, so that it can be trusted later without rehashing the file.
+
+    Args:
+        file_path (Path): The path to the file.
+        size (int): The size of the file in bytes.
+        md5 (str): The MD5 hash of the file in hex format.
+    """
+    checksum_path = get_checksum_path(file_path)
+    tmp_path = Path(f"{checksum_path}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"md5": md5, "size": size, "mtime_ns": file_path.stat().st_mtime_ns}, f)
+    os.replace(tmp_path, checksum_path)
+
+
+def load_checksum(file_path: Path) -> Optional[str]:
+    """Load the MD5 hash of a file from its sidecar.
+
+    Args:
+        file_path (Path): The path to the file.
+
+    Returns:
+        Optional[str]: The MD5 hash in hex format, or None if there is no sidecar or the size or
+        the modification time of the file changed since it was saved.
+    """
+    checksum_path = get_checksum_path(file_path)
+    if not (file_path.is_file() and checksum_path.is_file()):
+        return None
+    with open(checksum_path, "r") as f:
+        checksum = json.load(f)
+    stat = file_path.stat()
+    if checksum["size"] != stat.st_size or checksum["mtime_ns"] != stat.st_mtime_ns:
+        return None
+    return str(checksum["md5"])
+
+
+# endregion
+
+R = TypeVar("R", bound="ProgressReader")
+T = TypeVar("T", bound="DownloadManifest")
+
+
+class ProgressReader(object):
+    """A readable file wrapper that reports the number of bytes read to a progress bar.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: R, file: IO[bytes], progress_bar: tqdm) -> None:
+        """Constructor of the ProgressReader.
+
+        Args:
+            self (R): This object.
+            file (IO[bytes]): The file to read from.
+            progress_bar (tqdm): The progress bar in bytes.
+        """
+        self.file = file
+        self.progress_bar = progress_bar
+
+    def read(self: R, size: int = -1) -> bytes:
+        """Read from the file and update the progress bar.
+
+        Args:
+            self (R): This object.
+            size (int, optional): The maximum number of bytes to read. Defaults to -1.
+
+        Returns:
+            bytes: The data read.
+        """
+        data = self.file.read(size)
+        update_progress(self.progress_bar, downloaded=len(data))
+        return data
+
+
+class DownloadManifest(object):
+    """A manifest of completely downloaded files with their sizes and checksums. Files in the
+    manifest whose size on disk matches are considered complete without rehashing them.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: T, manifest_path: Path) -> None:
+        """Constructor of the DownloadManifest. Loads the manifest if it exists.
+
+        Args:
+            self (T): This object.
+            manifest_path (Path): The path to the manifest file.
+        """
+        self.manifest_path = manifest_path
+        self.files: Dict[str, Dict[str, Union[int, str]]] = {}
+        # Downloads finish concurrently, so updates to the manifest are serialized
+        self.lock = threading.Lock()
+        if manifest_path.exists():
+            with open(manifest_path, "r") as f:
+                self.files = json.load(f)["files"]
+
+    def is_complete(self: T, file_path: Path, filters: Optional[List[str]] = None) -> bool:
+        """Check whether a file was downloaded completely.
+
+        Args:
+            self (T): This object.
+            file_path (Path): The path to the file.
+            filters (Optional[List[str]], optional): The filters the file has to be downloaded
+            with. Defaults to None which means unfiltered.
+
+        Returns:
+            bool: Whether the file is in the manifest with the same filters and its size on disk
+            matches.
+        """
+        entry = self.files.get(file_path.name)
+        return (
+            entry is not None
+            and entry.get("filters", []) == sorted(filters or [])
+            and file_path.is_file()
+            and file_path.stat().st_size == entry["size"]
+        )
+
+    def record(
+        self: T, file_path: Path, size: int, md5: str, filters: Optional[List[str]] = None
+    ) -> None:
+        """Record a completely downloaded file and persist the manifest.
+
+        Args:
+            self (T): This object.
+            file_path (Path): The path to the file.
+            size (int): The size of the file in bytes.
+            md5 (str): The MD5 hash of the file in hex format.
+            filters (Optional[List[str]], optional): The filters the file was downloaded with.
+            Defaults to None which means unfiltered.
+        """
+        with self.lock:
+            self.files[file_path.name] = {"size": size, "md5": md5}
+            if filters:
+                self.files[file_path.name]["filters"] = sorted(filters)  # type: ignore
+            # Write to a temporary file first so that the manifest is never left half written
+            tmp_path = Path(f"{self.manifest_path}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"files": self.files}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
@@ -2,13 +2,41 @@
 import os
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import List, Optional, TypeVar, Union
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
 from tqdm import tqdm
 
+from csinsights.client.download import (
+    DownloadManifest,
+    download_and_filter_in_chunks,
+    download_in_chunks,
+)
+from csinsights.data import jsonbackend
+from csinsights.data.compression import open_gzip
+from csinsights.data.corpusids import CorpusIdSet
+from csinsights.data.s2processor import (
+    check_supported_filters,
+    create_filters,
+    filter_authors,
+    filter_documents,
+    get_dataset_name,
+)
 from csinsights.log import LogMixin
 from csinsights.types import AccessType, Url
 
@@ -22,31 +50,6 @@ unsupported_features = [
 ]
 
 
-def download_in_chunks(
-    url: str, file_path: Path, chunk_size: int = 1024 ** 2  # noqa: BLK100
-) -> None:
-    """Download a file in chunks.
-
-    Args:
-        url (str): The url of the file to download.
-        file_path (Path): The path to the file to download to.
-        chunk_size (int, optional): The chunk size in bytes. Defaults to 1024 ** 2.
-    """
-    response = requests.get(url, stream=True)
-    total_size_in_bytes = int(response.headers.get("content-length", 0))
-
-    progress_bar = tqdm(
-        unit="MB",
-        total=int(total_size_in_bytes / chunk_size),
-    )  # type: ignore
-    with open(file_path, "wb") as file:
-        for chunk in response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                progress_bar.update()
-                file.write(chunk)
-    response.close()
-
-
 # endregion
 
 T = TypeVar("T", bound="SemanticScholarClient")
@@ -64,6 +67,8 @@ class SemanticScholarClient(LogMixin):
         cache_dir: Path,
         s2_base_url: Url,
         api_key: Optional[str] = None,
+        download_workers: int = 1,
+        s2_filter_on_download: bool = False,
         **kwargs: Union[str, int, bool, AccessType, datetime],
     ) -> None:
         """Constructor the the SemanticScholarClient
@@ -73,10 +78,21 @@ class SemanticScholarClient(LogMixin):
             cache_dir (Path): The cache directory to store releases in.
             s2_base_url (Url): The base url of the DBLP release page.
             api_key (Optional[str], optional): The API key to use. Defaults to None.
+            download_workers (int, optional): The number of files to download concurrently.
+            Defaults to 1.
+            s2_filter_on_download (bool, optional): Whether to apply the `s2_filter_*` filters
+            while downloading so that only the matching records are stored. Defaults to False.
         """
         self.base_url = s2_base_url
         self.cache_dir = cache_dir
         self.headers = {"x-api-key": api_key} if api_key else None
+        self.download_workers = download_workers
+        self.filter_on_download = s2_filter_on_download
+        # Share one connection pool between all downloads that is large enough for all workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=download_workers, pool_maxsize=download_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     @property
     def cache_dir(self: T) -> Path:
@@ -104,12 +120,15 @@ class SemanticScholarClient(LogMixin):
 
     def download_release(
         self: T,
+        release_version: Optional[str] = None,
         **kwargs: Union[str, int, bool, AccessType, datetime],
     ) -> str:
         """Downloads the latest release of the SemanticScholar bulk dataset api.
 
         Args:
             self (T): This object.
+            release_version (Optional[str], optional): The release version to download. Defaults
+            to None which downloads the latest release.
 
         Raises:
             NotImplementedError: If the release is not supported yet.
@@ -117,8 +136,6 @@ class SemanticScholarClient(LogMixin):
         Returns:
             str: The current (and downloaded) release version.
         """
-        # Store file paths for later processing
-        file_paths = []
         # Check if any of the not supported features are used
         if any([kwargs[feature] for feature in unsupported_features]):
             raise NotImplementedError(
@@ -127,13 +144,25 @@ class SemanticScholarClient(LogMixin):
         # Time the opertaion for debugging purposes
         start = time.perf_counter()
         # Get latest release version
-        release_version = self._fetch_lastest_release_version()
+        release_version = release_version or self.fetch_latest_release_version()
         # Get release url
         target_url = urllib.parse.urljoin(self.base_url, f"release/{release_version}/")
-        # Get data for all features
+        # Get the download links for all features
+        file_links = {}
         for arg in kwargs:
             if arg.startswith("s2_use_") and kwargs[arg]:
-                file_paths.extend(self._fetch_releases(target_url, arg.split("_")[-1]))
+                dataset = arg.split("_")[-1]
+                file_links[dataset] = self._fetch_file_links(target_url, dataset)
+        # Get the filters
+        check_supported_filters(**kwargs)  # type: ignore
+        filters = create_filters(**kwargs)  # type: ignore
+        # Download the files of all datasets concurrently
+        if self.filter_on_download and filters:
+            file_paths = self._download_and_filter_files(release_version, file_links, filters)
+        else:
+            file_paths = self._download_files(
+                release_version, [link for links in file_links.values() for link in links]
+            )
 
         # Get the time it took to download the data
         end = time.perf_counter()
@@ -143,23 +172,185 @@ class SemanticScholarClient(LogMixin):
         # Return release version
         return release_version
 
-    def _fetch_releases(self: T, release_url: str, dataset: str) -> List[Path]:
-        # Store file_paths for later processing
-        file_paths = []
+    def download_diffs(
+        self: T,
+        start_release: str,
+        release_version: Optional[str] = None,
+        **kwargs: Union[str, int, bool, AccessType, datetime],
+    ) -> str:
+        """Downloads the update and delete files between a previous release and the latest
+        release of the SemanticScholar bulk dataset api. The files are stored in the `diffs`
+        subdirectory of the cache directory as
+        `{dataset}_{from_release}_{to_release}_{update|delete}_{index}.jsonl.gz`.
+
+        Args:
+            self (T): This object.
+            start_release (str): The release version to update from.
+            release_version (Optional[str], optional): The release version to update to. Defaults
+            to None which updates to the latest release.
+
+        Raises:
+            NotImplementedError: If the release is not supported yet.
+
+        Returns:
+            str: The current release version the diffs lead to.
+        """
+        # Check if any of the not supported features are used
+        if any([kwargs[feature] for feature in unsupported_features]):
+            raise NotImplementedError(
+                f"The following features are not supported yet: {unsupported_features}"
+            )
+        # Time the opertaion for debugging purposes
+        start = time.perf_counter()
+        # Get latest release version
+        release_version = release_version or self.fetch_latest_release_version()
+        if release_version == start_release:
+            self.logger.info(f"Release {release_version} is already the latest release.")
+            return release_version
+        # Get the download links of the diffs for all features
+        diff_dir = self.cache_dir / "diffs"
+        os.makedirs(diff_dir, exist_ok=True)
+        file_links: List[Tuple[Url, Path]] = []
+        for arg in kwargs:
+            if arg.startswith("s2_use_") and kwargs[arg]:
+                dataset = arg.split("_")[-1]
+                target_url = urllib.parse.urljoin(
+                    self.base_url, f"diffs/{start_release}/to/{release_version}/{dataset}"
+                )
+                res = self.session.get(target_url, headers=self.headers)
+                res.raise_for_status()
+                # A diff per release in between, each with files of updated and deleted records
+                for diff in res.json()["diffs"]:
+                    prefix = f"{dataset}_{diff['from_release']}_{diff['to_release']}"
+                    for kind in ("update", "delete"):
+                        file_links.extend(
+                            (download_link, diff_dir / f"{prefix}_{kind}_{index}.jsonl.gz")
+                            for index, download_link in enumerate(diff[f"{kind}_files"])
+                        )
+        # Remove the diffs of other runs (e.g., since another release) so they are never applied
+        diff_paths = {path for _, path in file_links}
+        for path in diff_dir.iterdir():
+            # Part files and their validators belong to the file they are downloaded to
+            if Path(str(path).partition(".part")[0]) not in diff_paths:
+                path.unlink()
+        # Download the files of all diffs concurrently
+        file_paths = self._download_files(f"diffs_{start_release}_{release_version}", file_links)
+
+        # Get the time it took to download the data
+        end = time.perf_counter()
+        self.logger.debug(f"Downloaded diffs in {end - start:.2f} seconds.")
+        self.logger.info(
+            f"Done fetching {len(file_paths)} diff files from {start_release} to {release_version}."
+        )
+        # Return release version
+        return release_version
+
+    def _fetch_file_links(self: T, release_url: str, dataset: str) -> List[Tuple[Url, Path]]:
         # Get target url
         target_url = urllib.parse.urljoin(release_url, f"dataset/{dataset}/")
-        # Get all files
-        res = requests.get(target_url, headers=self.headers)
-        for index, download_link in enumerate(res.json()["files"]):
-            path = Path(os.path.join(self.cache_dir, f"{dataset}_{index}.jsonl.gz"))
-            download_in_chunks(download_link, path)
-            file_paths.append(path)
-        return file_paths
-
-    def _fetch_lastest_release_version(self: T) -> str:
+        # Get all files and the paths to store them at
+        res = self.session.get(target_url, headers=self.headers)
+        return [
+            (download_link, Path(os.path.join(self.cache_dir, f"{dataset}_{index}.jsonl.gz")))
+            for index, download_link in enumerate(res.json()["files"])
+        ]
+
+    def _download_and_filter_files(
+        self: T,
+        release_version: str,
+        file_links: Dict[str, List[Tuple[Url, Path]]],
+        filters: List[str],
+    ) -> List[Path]:
+        # The ids of the filtered papers decide which records of the other datasets are kept
+        corpusids = CorpusIdSet()
+        author_ids = CorpusIdSet()
+
+        def filter_fn(path: Path, lines: Iterable[bytes]) -> Iterable[dict]:
+            dataset = get_dataset_name(path)
+            if dataset == "authors":
+                return filter_authors(lines, author_ids)
+            return filter_documents(lines, dataset, filters, corpusids)
+
+        # Papers first, as they are filtered by their external ids only
+        paper_paths = self._download_files(
+            release_version, file_links.get("papers", []), filters, filter_fn
+        )
+        for paper in self._iter_documents(paper_paths):
+            corpusids.add(paper["corpusid"])
+            author_ids.update(
+                int(author["authorId"])
+                for author in paper["authors"]
+                if author["authorId"] is not None
+            )
+        # Merge the ids once before they are read concurrently
+        self.logger.debug(f"Kept {len(corpusids)} papers with {len(author_ids)} authors.")
+        # Then the remainder, filtered by the ids of the papers
+        remainder_links = [
+            link for dataset, links in file_links.items() if dataset != "papers" for link in links
+        ]
+        return paper_paths + self._download_files(
+            release_version, remainder_links, filters, filter_fn
+        )
+
+    def _iter_documents(self: T, file_paths: List[Path]) -> Iterator[dict]:
+        for file_path in file_paths:
+            with open_gzip(file_path) as f:
+                for line in f:
+                    yield jsonbackend.loads(line)
+
+    def _download_files(
+        self: T,
+        release_version: str,
+        file_links: List[Tuple[Url, Path]],
+        filters: Optional[List[str]] = None,
+        filter_fn: Optional[Callable[[Path, Iterable[bytes]], Iterable[dict]]] = None,
+    ) -> List[Path]:
+        # Skip files that were already downloaded completely (with the same filters)
+        manifest = DownloadManifest(self.cache_dir / f"manifest_{release_version}.json")
+        pending_links = [
+            (link, path) for link, path in file_links if not manifest.is_complete(path, filters)
+        ]
+        self.logger.debug(
+            f"Skipping {len(file_links) - len(pending_links)} completely downloaded files."
+        )
+
+        def download(download_link: Url, path: Path) -> None:
+            if filter_fn is None:
+                size, md5 = download_in_chunks(
+                    download_link, path, session=self.session, progress_bar=progress_bar
+                )
+            else:
+                size, md5 = download_and_filter_in_chunks(
+                    download_link,
+                    path,
+                    partial(filter_fn, path),
+                    session=self.session,
+                    progress_bar=progress_bar,
+                )
+            manifest.record(path, size, md5, filters)
+
+        # Report the progress of all downloads in one progress bar
+        progress_bar = tqdm(unit="B", unit_scale=True, total=0, desc="Downloading")
+        with ThreadPoolExecutor(max_workers=self.download_workers) as executor:
+            futures = [executor.submit(download, link, path) for link, path in pending_links]
+            # Raise the first error of any download
+            for future in futures:
+                future.result()
+        progress_bar.close()
+        return [path for _, path in file_links]
+
+    def fetch_latest_release_version(self: T) -> str:
+        """Get the latest release of the SemanticScholar bulk dataset api that has all metadata.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            str: The release version.
+        """
         # Get release url
         target_url = urllib.parse.urljoin(self.base_url, "release/")
-        releases: List[str] = list(requests.get(target_url, headers=self.headers).json())
+        releases: List[str] = list(self.session.get(target_url, headers=self.headers).json())
         # Sort list according to name which results in accoring to date
         releases.sort(reverse=True)
         # Select the latest release from the last month. This is guaranteed to have all metadata
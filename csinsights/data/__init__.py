@@ -1,5 +1,9 @@
+from .corpusids import CorpusIdSet
+from .index import ReleaseIndex
 from .s2processor import SemanticScholarDataProcessor
 
 __all__ = [
+    "CorpusIdSet",
+    "ReleaseIndex",
     "SemanticScholarDataProcessor",
 ]
@@ -0,0 +1,575 @@
+"""This module implements a compression layer for gzip files. Inflating runs in a background
+thread that overlaps with parsing, uses the fastest installed zlib implementation (isal, then
+zlib-ng) and decompresses the members of BGZF files on multiple cores. Outputs are written as BGZF
+files whose members are compressed on multiple cores, or optionally as zstd files.
+"""
+import io
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from types import ModuleType
+from typing import IO, Deque, Iterator, List, Optional, Tuple, TypeVar, Union, cast
+
+try:
+    from isal import isal_zlib  # type: ignore
+except ImportError:
+    isal_zlib = None  # type: ignore
+
+try:
+    from zlib_ng import zlib_ng  # type: ignore
+except ImportError:
+    zlib_ng = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None  # type: ignore
+
+T = TypeVar("T", bound="ThreadedReader")
+W = TypeVar("W", bound="ParallelGzipWriter")
+
+# The zlib implementation used for inflating
+zlib_backend: ModuleType = isal_zlib or zlib_ng or zlib
+
+# The zlib implementation used for deflating. isal is skipped as it only has the levels 0 to 3
+deflate_backend: ModuleType = zlib_ng or zlib
+
+# The file extensions of the supported output compressions
+COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+# The default compression levels of the supported output compressions
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+# Number of compressed bytes that are read and inflated at once
+READ_SIZE = 2**20
+
+# Number of inflated chunks the background thread is allowed to be ahead of the reader
+QUEUE_SIZE = 16
+
+# Number of compressed bytes of BGZF members that are inflated together by one thread
+BGZF_BATCH_SIZE = 2**20
+
+# Header of a BGZF member: gzip magic, deflate, FEXTRA and the "BC" subfield with the member size
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+BGZF_HEADER = struct.Struct("<4sI2sHBBHH")
+
+# Gzip window bits that expect a gzip header and trailer
+GZIP_WBITS = 31
+
+# Window bits of raw deflate data without a header and trailer
+RAW_WBITS = -15
+
+# Maximum number of uncompressed bytes per BGZF member so that the compressed member fits its size
+BGZF_BLOCK_SIZE = 65280
+
+# The empty member that marks the end of a BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+# Trailer of a gzip member: the crc32 and the size of the uncompressed data
+GZIP_TRAILER = struct.Struct("<II")
+
+
+def open_gzip(file: Union[str, Path, IO[bytes]], threads: int = 1) -> io.BufferedReader:
+    """Open a gzip file for reading. The file is inflated in a background thread so that reading
+    from the returned file overlaps with inflating the next chunks.
+
+    Args:
+        file (Union[str, Path, IO[bytes]]): The path to the gzip file or a readable binary file.
+        threads (int, optional): The number of threads to inflate the members of BGZF files
+        with. Other gzip files are inflated by one thread. Defaults to 1.
+
+    Returns:
+        io.BufferedReader: The decompressed file, supporting `read` and iterating over lines.
+    """
+    if isinstance(file, (str, Path)):
+        fileobj: IO[bytes] = open(file, "rb")
+        owns_file = True
+    else:
+        fileobj = file
+        owns_file = False
+    return io.BufferedReader(ThreadedReader(fileobj, threads, owns_file), buffer_size=READ_SIZE)
+
+
+def open_compressed(file: Union[str, Path], threads: int = 1) -> IO[bytes]:
+    """Open a gzip or zstd file for reading. The compression is chosen by the file extension.
+
+    Args:
+        file (Union[str, Path]): The path to the compressed file.
+        threads (int, optional): The number of threads to inflate the members of BGZF files
+        with. Defaults to 1.
+
+    Raises:
+        ImportError: If the file is a zstd file and zstandard is not installed.
+
+    Returns:
+        IO[bytes]: The decompressed file, supporting `read` and iterating over lines.
+    """
+    if str(file).endswith(COMPRESSIONS["zstd"]):
+        if zstandard is None:
+            raise ImportError(
+                "Reading zstd files requires zstandard. Install it with `pip install zstandard`."
+            )
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file, "rb"), closefd=True)
+        return io.BufferedReader(reader, buffer_size=READ_SIZE)
+    return open_gzip(file, threads)
+
+
+def open_writer(
+    file: Union[str, Path, IO[bytes]],
+    compression: str = "gzip",
+    level: Optional[int] = None,
+    threads: int = 1,
+) -> IO[bytes]:
+    """Open a compressed file for writing. Gzip files are written as BGZF files, which any gzip
+    reader can read, with their members compressed on multiple threads.
+
+    Args:
+        file (Union[str, Path, IO[bytes]]): The path to the compressed file or a writable binary
+        file. The file is closed when the returned file is closed.
+        compression (str, optional): The compression (gzip or zstd). Defaults to "gzip".
+        level (Optional[int], optional): The compression level. Defaults to None which selects
+        the default level of the compression.
+        threads (int, optional): The number of threads to compress with. Defaults to 1.
+
+    Raises:
+        ValueError: If the compression is unknown.
+        ImportError: If the compression is zstd and zstandard is not installed.
+
+    Returns:
+        IO[bytes]: The file to write the uncompressed data to.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"The compression {compression} is not supported. Choose one of {list(COMPRESSIONS)}."
+        )
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    fileobj: IO[bytes] = open(file, "wb") if isinstance(file, (str, Path)) else file
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(
+                "Writing zstd files requires zstandard. Install it with `pip install zstandard`."
+            )
+        # zstd compresses on multiple threads on its own (0 compresses on the calling thread)
+        compressor = zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0)
+        return cast(IO[bytes], compressor.stream_writer(fileobj, closefd=True))
+    return io.BufferedWriter(
+        ParallelGzipWriter(fileobj, level, threads),  # type: ignore
+        buffer_size=BGZF_BATCH_SIZE,
+    )
+
+
+def is_bgzf(header: Union[bytes, memoryview]) -> bool:
+    """Check whether the header of a gzip member is the header of a BGZF member.
+
+    Args:
+        header (Union[bytes, memoryview]): At least the first 18 bytes of the member.
+
+    Returns:
+        bool: Whether the member has a BGZF "BC" subfield with the size of the member.
+    """
+    if len(header) < BGZF_HEADER.size or bytes(header[:4]) != BGZF_MAGIC:
+        return False
+    _, _, _, xlen, si1, si2, slen, _ = BGZF_HEADER.unpack_from(header)
+    return xlen >= 6 and (si1, si2, slen) == (ord("B"), ord("C"), 2)
+
+
+def inflate(fileobj: IO[bytes], head: bytes = b"") -> Iterator[bytes]:
+    """Lazily inflate all members of a gzip file one after another.
+
+    Args:
+        fileobj (IO[bytes]): The gzip file.
+        head (bytes, optional): Bytes that were already read from the file. Defaults to b"".
+
+    Raises:
+        EOFError: If the file ended before the end of a member.
+
+    Returns:
+        Iterator[bytes]: The decompressed chunks.
+    """
+    decompressor = zlib_backend.decompressobj(wbits=GZIP_WBITS)
+    data = head or fileobj.read(READ_SIZE)
+    started = False
+    while data:
+        started = True
+        chunk = decompressor.decompress(data)
+        if chunk:
+            yield chunk
+        # A new member starts right after the end of the current member
+        if decompressor.eof:
+            data = decompressor.unused_data
+            decompressor = zlib_backend.decompressobj(wbits=GZIP_WBITS)
+            started = False
+            if data:
+                continue
+        data = fileobj.read(READ_SIZE)
+    if started:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+def inflate_bgzf(fileobj: IO[bytes], threads: int, head: bytes = b"") -> Iterator[bytes]:
+    """Lazily inflate the members of a BGZF file on multiple threads. The member sizes are read
+    from the headers, so the members are split without inflating them. zlib releases the GIL
+    while inflating, so the threads run in parallel.
+
+    Args:
+        fileobj (IO[bytes]): The BGZF file.
+        threads (int): The number of threads to inflate the members with.
+        head (bytes, optional): Bytes that were already read from the file. Defaults to b"".
+
+    Returns:
+        Iterator[bytes]: The decompressed chunks in the order of the members.
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # Keep a few batches in flight per thread and yield them in order
+        pending: Deque[Future] = deque()
+        for batch in _iter_bgzf_batches(fileobj, head):
+            pending.append(executor.submit(_inflate_members, batch))
+            if len(pending) >= 2 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_bgzf_batches(fileobj: IO[bytes], head: bytes) -> Iterator[List[bytes]]:
+    """Split a BGZF file into batches of complete members.
+
+    Args:
+        fileobj (IO[bytes]): The BGZF file.
+        head (bytes): Bytes that were already read from the file.
+
+    Raises:
+        EOFError: If the file ended within a member.
+
+    Returns:
+        Iterator[List[bytes]]: Batches of members of about `BGZF_BATCH_SIZE` compressed bytes.
+    """
+    buffer = head
+    batch: List[bytes] = []
+    batch_size = 0
+    offset = 0
+    while True:
+        # Read until the next header is complete
+        if len(buffer) - offset < BGZF_HEADER.size:
+            buffer = buffer[offset:] + fileobj.read(READ_SIZE)
+            offset = 0
+            if not buffer:
+                break
+            if len(buffer) < BGZF_HEADER.size:
+                raise EOFError("Compressed file ended within a member header")
+        # Members without the size subfield (e.g., appended by another tool) end the split
+        if not is_bgzf(memoryview(buffer)[offset:]):
+            if batch:
+                yield batch
+            yield [buffer[offset:] + fileobj.read()]
+            return
+        member_size = BGZF_HEADER.unpack_from(buffer, offset)[-1] + 1
+        # Read until the member is complete
+        if len(buffer) - offset < member_size:
+            buffer = buffer[offset:] + fileobj.read(max(READ_SIZE, member_size))
+            offset = 0
+            if len(buffer) < member_size:
+                raise EOFError("Compressed file ended within a member")
+        end = offset + member_size
+        batch.append(buffer[offset:end])
+        batch_size += member_size
+        offset = end
+        if batch_size >= BGZF_BATCH_SIZE:
+            yield batch
+            batch = []
+            batch_size = 0
+    if batch:
+        yield batch
+
+
+def _inflate_members(members: List[bytes]) -> bytes:
+    """Inflate complete gzip members.
+
+    Args:
+        members (List[bytes]): The compressed members.
+
+    Returns:
+        bytes: The decompressed data of all members.
+    """
+    if len(members) == 1 and not is_bgzf(members[0]):
+        # The remainder of a file that is not split into members
+        return b"".join(inflate(io.BytesIO(members[0])))
+    return b"".join(zlib_backend.decompress(member, wbits=GZIP_WBITS) for member in members)
+
+
+class ThreadedReader(io.RawIOBase):
+    """A raw binary stream over the decompressed data of a gzip file that is inflated by a
+    background thread.
+
+    Args:
+        io.RawIOBase (Any): The base class of raw binary streams.
+    """
+
+    def __init__(self: T, fileobj: IO[bytes], threads: int = 1, owns_file: bool = True) -> None:
+        """Constructor of the ThreadedReader. Starts inflating right away.
+
+        Args:
+            self (T): This object.
+            fileobj (IO[bytes]): The gzip file.
+            threads (int, optional): The number of threads to inflate the members of BGZF files
+            with. Defaults to 1.
+            owns_file (bool, optional): Whether to close the gzip file when this stream is
+            closed. Defaults to True.
+        """
+        super().__init__()
+        self.fileobj = fileobj
+        self.threads = threads
+        self.owns_file = owns_file
+        self.chunks: "queue.Queue[Union[bytes, BaseException, None]]" = queue.Queue(QUEUE_SIZE)
+        self.chunk = memoryview(b"")
+        self.stopped = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self._inflate, daemon=True)
+        self.thread.start()
+
+    def _inflate(self: T) -> None:
+        """Inflate the file and put the chunks into the queue. Runs in the background thread.
+
+        Args:
+            self (T): This object.
+        """
+        try:
+            head = self.fileobj.read(BGZF_HEADER.size)
+            if self.threads > 1 and is_bgzf(head):
+                chunks = inflate_bgzf(self.fileobj, self.threads, head)
+            else:
+                chunks = inflate(self.fileobj, head)
+            for chunk in chunks:
+                if not self._put(chunk):
+                    return
+            self._put(None)
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self: T, item: Union[bytes, BaseException, None]) -> bool:
+        """Put an item into the queue unless the reader was closed.
+
+        Args:
+            self (T): This object.
+            item (Union[bytes, BaseException, None]): A chunk, an error, or None at the end.
+
+        Returns:
+            bool: Whether the item was put into the queue.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def readable(self: T) -> bool:
+        """Whether the stream is readable.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            bool: Always True.
+        """
+        return True
+
+    def readinto(self: T, buffer: Union[bytearray, memoryview]) -> int:  # type: ignore
+        """Read decompressed bytes into a buffer.
+
+        Args:
+            self (T): This object.
+            buffer (Union[bytearray, memoryview]): The buffer to read into.
+
+        Raises:
+            BaseException: The error that occurred while inflating.
+
+        Returns:
+            int: The number of bytes read or 0 at the end of the file.
+        """
+        while not self.chunk:
+            if self.finished:
+                return 0
+            item = self.chunks.get()
+            if item is None:
+                self.finished = True
+                return 0
+            if isinstance(item, BaseException):
+                self.finished = True
+                raise item
+            self.chunk = memoryview(item)
+        size = min(len(buffer), len(self.chunk))
+        buffer[:size] = self.chunk[:size]
+        self.chunk = self.chunk[size:]
+        return size
+
+    def close(self: T) -> None:
+        """Stop the background thread and close the file.
+
+        Args:
+            self (T): This object.
+        """
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            if self.owns_file:
+                self.fileobj.close()
+        super().close()
+
+
+def inflate_member(fileobj: IO[bytes], offset: int) -> Tuple[bytes, int]:
+    """Inflate the BGZF member that starts at a compressed offset.
+
+    Args:
+        fileobj (IO[bytes]): The BGZF file, opened for random access.
+        offset (int): The offset of the member in the file.
+
+    Raises:
+        ValueError: If no BGZF member starts at the offset.
+
+    Returns:
+        Tuple[bytes, int]: The decompressed data and the offset of the next member.
+    """
+    fileobj.seek(offset)
+    header = fileobj.read(BGZF_HEADER.size)
+    if not is_bgzf(header):
+        raise ValueError(f"No BGZF member starts at offset {offset}")
+    member_size = BGZF_HEADER.unpack(header)[-1] + 1
+    member = header + fileobj.read(member_size - BGZF_HEADER.size)
+    return zlib_backend.decompress(member, wbits=GZIP_WBITS), offset + member_size
+
+
+def deflate_bgzf(data: Union[bytes, memoryview], level: int) -> bytes:
+    """Compress data into complete BGZF members.
+
+    Args:
+        data (Union[bytes, memoryview]): The uncompressed data.
+        level (int): The compression level.
+
+    Returns:
+        bytes: The members with at most `BGZF_BLOCK_SIZE` uncompressed bytes each.
+    """
+    members = []
+    view = memoryview(data)
+    for offset in range(0, len(view), BGZF_BLOCK_SIZE):
+        end = offset + BGZF_BLOCK_SIZE
+        block = view[offset:end]
+        compressor = deflate_backend.compressobj(level, zlib.DEFLATED, RAW_WBITS)
+        deflated = compressor.compress(block) + compressor.flush()
+        # The member size in the header excludes one byte by definition
+        member_size = BGZF_HEADER.size + len(deflated) + GZIP_TRAILER.size
+        members.append(
+            BGZF_HEADER.pack(BGZF_MAGIC, 0, b"\x00\xff", 6, ord("B"), ord("C"), 2, member_size - 1)
+        )
+        members.append(deflated)
+        members.append(GZIP_TRAILER.pack(zlib.crc32(block), len(block)))
+    return b"".join(members)
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """A raw binary stream that writes a BGZF file whose members are compressed on multiple
+    threads. zlib releases the GIL while deflating, so the threads run in parallel. The offsets of
+    all members are kept in `blocks` to index the file.
+
+    Args:
+        io.RawIOBase (Any): The base class of raw binary streams.
+    """
+
+    def __init__(self: W, fileobj: IO[bytes], level: int = 6, threads: int = 1) -> None:
+        """Constructor of the ParallelGzipWriter.
+
+        Args:
+            self (W): This object.
+            fileobj (IO[bytes]): The file to write the compressed members to. It is closed when
+            this stream is closed.
+            level (int, optional): The compression level. Defaults to 6.
+            threads (int, optional): The number of threads to compress with. Defaults to 1.
+        """
+        super().__init__()
+        self.fileobj = fileobj
+        self.level = level
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pending: Deque[Future] = deque()
+        # The uncompressed and compressed offset at which every member starts
+        self.blocks: List[Tuple[int, int]] = []
+        self.uncompressed_offset = 0
+        self.compressed_offset = 0
+
+    def writable(self: W) -> bool:
+        """Whether the stream is writable.
+
+        Args:
+            self (W): This object.
+
+        Returns:
+            bool: Always True.
+        """
+        return True
+
+    def write(self: W, data: Union[bytes, bytearray, memoryview]) -> int:  # type: ignore
+        """Compress data in the background. Blocks when a few batches per thread are pending.
+
+        Args:
+            self (W): This object.
+            data (Union[bytes, bytearray, memoryview]): The uncompressed data.
+
+        Returns:
+            int: The number of bytes written, which is always all of them.
+        """
+        # The buffer of the caller may be reused, so the threads get a copy
+        self.pending.append(self.executor.submit(deflate_bgzf, bytes(data), self.level))
+        # Write the finished batches in order and keep a few batches in flight per thread
+        while self.pending and (self.pending[0].done() or len(self.pending) >= 2 * self.threads):
+            self._write_members(self.pending.popleft().result())
+        return len(data)
+
+    def _write_members(self: W, members: bytes) -> None:
+        """Write compressed members to the file and record their offsets.
+
+        Args:
+            self (W): This object.
+            members (bytes): Complete BGZF members.
+        """
+        offset = 0
+        while offset < len(members):
+            self.blocks.append((self.uncompressed_offset, self.compressed_offset + offset))
+            offset += BGZF_HEADER.unpack_from(members, offset)[-1] + 1
+            self.uncompressed_offset += GZIP_TRAILER.unpack_from(members, offset - 8)[1]
+        self.compressed_offset += len(members)
+        self.fileobj.write(members)
+
+    def close(self: W) -> None:
+        """Write the pending batches and the end of the file and close the file.
+
+        Args:
+            self (W): This object.
+        """
+        if not self.closed:
+            try:
+                while self.pending:
+                    self._write_members(self.pending.popleft().result())
+                self.fileobj.write(BGZF_EOF)
+            finally:
+                self.executor.shutdown()
+                self.fileobj.close()
+        super().close()
+
+
+def default_threads(workers: int = 1) -> int:
+    """Get the number of inflate threads per reader so that readers in parallel workers don't
+    oversubscribe the cores.
+
+    Args:
+        workers (int, optional): The number of workers that read in parallel. Defaults to 1.
+
+    Returns:
+        int: The number of threads per reader.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
@@ -0,0 +1,219 @@
+"""A compact set of integer ids (e.g., corpus ids) backed by a sorted numpy array."""
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Type, TypeVar, Union
+
+import numpy as np
+
+T = TypeVar("T", bound="CorpusIdSet")
+
+# Number of buffered ids that are converted to a numpy chunk at once
+PENDING_CHUNK_SIZE = 2**20
+
+
+class CorpusIdSet(object):
+    """A set of integer ids with the `in`/`update` interface of a Python set. The ids are stored
+    in a sorted int64 numpy array (8 bytes per id instead of ~60-70 bytes in a set) and membership
+    is answered with `searchsorted`, also for whole batches of ids.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: T, ids: Optional[Iterable[int]] = None) -> None:
+        """Constructor of the CorpusIdSet.
+
+        Args:
+            self (T): This object.
+            ids (Optional[Iterable[int]], optional): Initial ids of the set. Defaults to None.
+        """
+        # The sorted and unique ids
+        self._array = np.empty(0, dtype=np.int64)
+        # Ids that have been added but not merged into the sorted array yet
+        self._pending: List[int] = []
+        self._pending_chunks: List[np.ndarray] = []
+        # Keeps an attached shared memory block alive as long as the array points to it
+        self._shared_memory: Optional[shared_memory.SharedMemory] = None
+        if ids is not None:
+            self.update(ids)
+
+    @classmethod
+    def from_array(cls: Type[T], array: np.ndarray, is_sorted: bool = False) -> T:
+        """Create a set from a numpy array of ids.
+
+        Args:
+            cls (Type[T]): This class.
+            array (np.ndarray): The ids.
+            is_sorted (bool, optional): Whether the array is already sorted and unique.
+            Defaults to False.
+
+        Returns:
+            T: The new set.
+        """
+        corpusids = cls()
+        corpusids._array = array if is_sorted else np.unique(array.astype(np.int64))
+        return corpusids
+
+    def update(self: T, ids: Iterable[int]) -> None:
+        """Add multiple ids to the set.
+
+        Args:
+            self (T): This object.
+            ids (Iterable[int]): The ids to add.
+        """
+        if isinstance(ids, np.ndarray):
+            self._pending_chunks.append(ids.astype(np.int64))
+            return
+        self._pending.extend(ids)
+        # Keep the buffer small by converting it to a numpy chunk from time to time
+        if len(self._pending) >= PENDING_CHUNK_SIZE:
+            self._pending_chunks.append(np.array(self._pending, dtype=np.int64))
+            self._pending = []
+
+    def add(self: T, id_: int) -> None:
+        """Add a single id to the set.
+
+        Args:
+            self (T): This object.
+            id_ (int): The id to add.
+        """
+        self.update((id_,))
+
+    def contains_many(self: T, ids: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+        """Test a batch of ids for membership at once.
+
+        Args:
+            self (T): This object.
+            ids (Union[Sequence[int], np.ndarray]): The ids to test.
+
+        Returns:
+            np.ndarray: A boolean mask that is True for every id contained in the set.
+        """
+        array = self._compact()
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(array):
+            return np.zeros(len(ids), dtype=bool)
+        # searchsorted is much faster for sorted keys, so the batch is sorted first
+        order = np.argsort(ids)
+        sorted_ids = ids[order]
+        positions = np.minimum(np.searchsorted(array, sorted_ids), len(array) - 1)
+        is_member = np.empty(len(ids), dtype=bool)
+        is_member[order] = array[positions] == sorted_ids
+        return is_member
+
+    def save(self: T, file_path: Path) -> None:
+        """Serialize the set to disk as a .npy file.
+
+        Args:
+            self (T): This object.
+            file_path (Path): The path to save the ids to.
+        """
+        np.save(file_path, self._compact(), allow_pickle=False)
+
+    @classmethod
+    def load(cls: Type[T], file_path: Path, mmap: bool = True) -> T:
+        """Load a set that was serialized with `save`.
+
+        Args:
+            cls (Type[T]): This class.
+            file_path (Path): The path to the .npy file.
+            mmap (bool, optional): Whether to memory map the file instead of reading it. Memory
+            mapped sets are shared between processes through the page cache. Defaults to True.
+
+        Returns:
+            T: The loaded set.
+        """
+        return cls.from_array(
+            np.load(file_path, mmap_mode="r" if mmap else None, allow_pickle=False),
+            is_sorted=True,
+        )
+
+    def to_shared_memory(self: T) -> shared_memory.SharedMemory:
+        """Copy the set into a new shared memory block. The caller owns the block and has to
+        `close` and `unlink` it when it is not needed anymore.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            shared_memory.SharedMemory: The shared memory block holding the sorted ids.
+        """
+        array = self._compact()
+        # Shared memory blocks can not be empty
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=np.int64, buffer=block.buf)[:] = array
+        return block
+
+    @classmethod
+    def from_shared_memory(cls: Type[T], name: str, length: int) -> T:
+        """Attach to a set that was copied into shared memory with `to_shared_memory`.
+
+        Args:
+            cls (Type[T]): This class.
+            name (str): The name of the shared memory block.
+            length (int): The number of ids in the set.
+
+        Returns:
+            T: The set, reading its ids directly from the shared memory block.
+        """
+        block = shared_memory.SharedMemory(name=name)
+        corpusids = cls.from_array(
+            np.ndarray((length,), dtype=np.int64, buffer=block.buf), is_sorted=True
+        )
+        corpusids._shared_memory = block
+        return corpusids
+
+    def _compact(self: T) -> np.ndarray:
+        """Merge all pending ids into the sorted array.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            np.ndarray: The sorted and unique ids.
+        """
+        if self._pending or self._pending_chunks:
+            chunks = [np.asarray(self._array), *self._pending_chunks]
+            chunks.append(np.array(self._pending, dtype=np.int64))
+            self._array = np.unique(np.concatenate(chunks))
+            self._pending = []
+            self._pending_chunks = []
+        return self._array
+
+    def __contains__(self: T, id_: object) -> bool:
+        """Test a single id for membership.
+
+        Args:
+            self (T): This object.
+            id_ (object): The id to test.
+
+        Returns:
+            bool: Whether the id is contained in the set.
+        """
+        if not isinstance(id_, (int, np.integer)):
+            return False
+        array = self._compact()
+        position = int(np.searchsorted(array, id_))
+        return position < len(array) and array[position] == id_
+
+    def __len__(self: T) -> int:
+        """The number of ids in the set.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            int: The number of ids.
+        """
+        return len(self._compact())
+
+    def __iter__(self: T) -> Iterator[int]:
+        """Iterate over the ids in ascending order.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            Iterator[int]: The ids.
+        """
+        return (int(id_) for id_ in self._compact())
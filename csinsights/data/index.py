@@ -0,0 +1,288 @@
+"""This module implements a random access index over the papers of a release. The jsonl exports
+are BGZF files, so a paper is read by inflating only the members it is stored in. The index maps
+every corpus id to its shard, the compressed offset of the member the paper starts in, and the
+offset of the paper in the inflated member. It is a .npy file sorted by corpus id that is memory
+mapped, so opening it doesn't read it and lookups are binary searches.
+"""
+import os
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+import numpy as np
+
+from csinsights.data import jsonbackend
+from csinsights.data.compression import inflate_member
+from csinsights.data.release import HashingWriter, ReleaseManifest
+
+# The name of the index in the release directory
+INDEX_NAME = "papers.index.npy"
+
+# The fields of an index entry
+INDEX_DTYPE = np.dtype(
+    [
+        ("corpusid", "<i8"),
+        ("shard", "<u4"),
+        ("block_offset", "<u8"),
+        ("in_block_offset", "<u4"),
+    ]
+)
+
+# Number of inflated members a reader keeps in memory
+BLOCK_CACHE_SIZE = 64
+
+B = TypeVar("B", bound="OffsetIndexBuilder")
+T = TypeVar("T", bound="ReleaseIndex")
+
+
+class OffsetIndexBuilder(object):
+    """Collects the uncompressed offsets of records while they are written and converts them to
+    an index once the offsets of the members are known.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: B) -> None:
+        """Constructor of the OffsetIndexBuilder.
+
+        Args:
+            self (B): This object.
+        """
+        # Typed arrays take a few bytes per record instead of a tuple of python ints
+        self.keys = array("q")
+        self.shards = array("I")
+        self.offsets = array("Q")
+
+    def add(self: B, key: int, shard: int, offset: int) -> None:
+        """Add a record.
+
+        Args:
+            self (B): This object.
+            key (int): The id of the record (e.g., the corpusid).
+            shard (int): The index of the shard the record is written to.
+            offset (int): The uncompressed offset of the record in the shard.
+        """
+        self.keys.append(key)
+        self.shards.append(shard)
+        self.offsets.append(offset)
+
+    def build(self: B, blocks: List[List[Tuple[int, int]]]) -> np.ndarray:
+        """Build the index.
+
+        Args:
+            self (B): This object.
+            blocks (List[List[Tuple[int, int]]]): The uncompressed and compressed offsets at which
+            the members of every shard start (see `ParallelGzipWriter`).
+
+        Returns:
+            np.ndarray: The index entries with `INDEX_DTYPE` sorted by id.
+        """
+        keys = np.frombuffer(self.keys, dtype=np.int64)
+        shards = np.frombuffer(self.shards, dtype=np.uint32)
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        index = np.empty(len(keys), dtype=INDEX_DTYPE)
+        index["corpusid"] = keys
+        index["shard"] = shards
+        for shard, shard_blocks in enumerate(blocks):
+            mask = shards == shard
+            if not shard_blocks or not mask.any():
+                continue
+            starts = np.array(shard_blocks, dtype=np.int64)
+            # The member a record starts in is the last member that starts at or before it
+            positions = np.searchsorted(starts[:, 0], offsets[mask], side="right") - 1
+            index["block_offset"][mask] = starts[positions, 1]
+            index["in_block_offset"][mask] = offsets[mask] - starts[positions, 0]
+        return index[np.argsort(keys, kind="stable")]
+
+
+def save_index(index: np.ndarray, release_dir: Path) -> None:
+    """Save an index to the release directory and record it in the manifest.
+
+    Args:
+        index (np.ndarray): The index entries from `OffsetIndexBuilder.build`.
+        release_dir (Path): The release directory.
+    """
+    index_path = release_dir / INDEX_NAME
+    with open(index_path, "wb") as f:
+        file = HashingWriter(f)
+        np.save(file, index, allow_pickle=False)  # type: ignore
+    ReleaseManifest(release_dir).record(
+        index_path,
+        dataset="papers",
+        format="index",
+        key="corpusid",
+        rows=len(index),
+        size=file.size,
+        md5=file.md5.hexdigest(),
+    )
+
+
+class ReleaseIndex(object):
+    """Point and batched lookups of the papers of a release by their corpus id.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(
+        self: T, release_dir: Union[str, Path], cache_size: int = BLOCK_CACHE_SIZE
+    ) -> None:
+        """Constructor of the ReleaseIndex. Memory maps the index and reads the shards of the
+        papers from the manifest.
+
+        Args:
+            self (T): This object.
+            release_dir (Union[str, Path]): The release directory.
+            cache_size (int, optional): The number of inflated members to keep in memory.
+            Defaults to `BLOCK_CACHE_SIZE`.
+        """
+        release_dir = Path(os.path.expanduser(release_dir))
+        self.index = np.load(release_dir / INDEX_NAME, mmap_mode="r", allow_pickle=False)
+        self.paths = {
+            entry["shard"]: release_dir / name
+            for name, entry in ReleaseManifest(release_dir).files.items()
+            if entry["dataset"] == "papers" and entry["format"] == "jsonl"
+        }
+        self.files: Dict[int, IO[bytes]] = {}
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[Tuple[int, int], Tuple[bytes, int]]" = OrderedDict()
+
+    def get(self: T, corpusid: int) -> Optional[dict]:
+        """Look up a paper.
+
+        Args:
+            self (T): This object.
+            corpusid (int): The corpus id of the paper.
+
+        Returns:
+            Optional[dict]: The paper or None if it is not in the release.
+        """
+        return self.get_many([corpusid])[0]
+
+    def get_many(self: T, corpusids: Union[Sequence[int], np.ndarray]) -> List[Optional[dict]]:
+        """Look up a batch of papers at once.
+
+        Args:
+            self (T): This object.
+            corpusids (Union[Sequence[int], np.ndarray]): The corpus ids of the papers.
+
+        Returns:
+            List[Optional[dict]]: The papers in the order of the corpus ids, with None for corpus
+            ids that are not in the release.
+        """
+        ids = np.asarray(corpusids, dtype=np.int64)
+        papers: List[Optional[dict]] = [None] * len(ids)
+        keys = self.index["corpusid"]
+        if not len(keys) or not len(ids):
+            return papers
+        positions = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+        found = np.flatnonzero(keys[positions] == ids)
+        entries = self.index[positions[found]]
+        # Read the papers in the order of the files so that every member is inflated once
+        order = np.lexsort((entries["in_block_offset"], entries["block_offset"], entries["shard"]))
+        for position in order:
+            entry = entries[position]
+            line = self._read_line(
+                int(entry["shard"]), int(entry["block_offset"]), int(entry["in_block_offset"])
+            )
+            papers[found[position]] = jsonbackend.loads(line)
+        return papers
+
+    def _read_line(self: T, shard: int, block_offset: int, in_block_offset: int) -> bytes:
+        """Read a json line that starts in a member and may continue in the next members.
+
+        Args:
+            self (T): This object.
+            shard (int): The index of the shard.
+            block_offset (int): The compressed offset of the member.
+            in_block_offset (int): The offset of the line in the inflated member.
+
+        Returns:
+            bytes: The line without the newline.
+        """
+        data, next_offset = self._inflate(shard, block_offset)
+        end = data.find(b"\n", in_block_offset)
+        if end != -1:
+            return data[in_block_offset:end]
+        parts = [data[in_block_offset:]]
+        while True:
+            data, next_offset = self._inflate(shard, next_offset)
+            end = data.find(b"\n")
+            if end != -1 or not data:
+                parts.append(data[:end] if end != -1 else data)
+                return b"".join(parts)
+            parts.append(data)
+
+    def _inflate(self: T, shard: int, offset: int) -> Tuple[bytes, int]:
+        """Inflate a member of a shard, or get it from the cache of recently inflated members.
+
+        Args:
+            self (T): This object.
+            shard (int): The index of the shard.
+            offset (int): The compressed offset of the member.
+
+        Returns:
+            Tuple[bytes, int]: The inflated member and the offset of the next member.
+        """
+        key = (shard, offset)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if shard not in self.files:
+            self.files[shard] = open(self.paths[shard], "rb")
+        self.cache[key] = inflate_member(self.files[shard], offset)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return self.cache[key]
+
+    def close(self: T) -> None:
+        """Close all shards.
+
+        Args:
+            self (T): This object.
+        """
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+        self.cache.clear()
+
+    def __len__(self: T) -> int:
+        """The number of papers in the index.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            int: The number of papers.
+        """
+        return len(self.index)
+
+    def __enter__(self: T) -> T:
+        """Enter the context of the index.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            T: This object.
+        """
+        return self
+
+    def __exit__(
+        self: T,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close all shards.
+
+        Args:
+            self (T): This object.
+            exc_type (Optional[Type[BaseException]]): The type of the error, if any.
+            exc (Optional[BaseException]): The error, if any.
+            traceback (Optional[TracebackType]): The traceback of the error, if any.
+        """
+        self.close()
@@ -0,0 +1,87 @@
+"""This module implements a pluggable JSON backend. The fastest installed library is used for
+decoding and encoding json lines (orjson, then msgspec) with the standard library as fallback.
+"""
+import json
+from typing import Any, Callable, Dict, NamedTuple, Optional, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import msgspec  # type: ignore
+except ImportError:
+    msgspec = None  # type: ignore
+
+
+class JsonBackend(NamedTuple):
+    """A JSON library with functions to decode and encode a single json line.
+
+    Args:
+        NamedTuple (Any): A named tuple.
+    """
+
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _json_dumps(obj: object) -> bytes:
+    """Encode an object with the standard library like `jsonlines` does.
+
+    Args:
+        obj (object): The object to encode.
+
+    Returns:
+        bytes: The encoded object without a trailing newline.
+    """
+    return json.dumps(obj, ensure_ascii=False).encode()
+
+
+def get_available_backends() -> Dict[str, JsonBackend]:
+    """Get all installed backends.
+
+    Returns:
+        Dict[str, JsonBackend]: The installed backends by name in the order of preference.
+    """
+    backends = {}
+    if orjson is not None:
+        backends["orjson"] = JsonBackend("orjson", orjson.loads, orjson.dumps)
+    if msgspec is not None:
+        # Records are decoded to dicts and not to typed structs as they are joined and exported
+        # with all of their fields
+        backends["msgspec"] = JsonBackend(
+            "msgspec", msgspec.json.Decoder().decode, msgspec.json.Encoder().encode
+        )
+    backends["json"] = JsonBackend("json", json.loads, _json_dumps)
+    return backends
+
+
+def get_backend(name: Optional[str] = None) -> JsonBackend:
+    """Get a JSON backend.
+
+    Args:
+        name (Optional[str], optional): The name of the backend (orjson, msgspec, or json).
+        Defaults to None which selects the fastest installed backend.
+
+    Raises:
+        ValueError: If the backend is unknown or not installed.
+
+    Returns:
+        JsonBackend: The backend.
+    """
+    backends = get_available_backends()
+    if name is None:
+        return next(iter(backends.values()))
+    if name not in backends:
+        raise ValueError(
+            f"The JSON backend {name} is not available. Choose one of {list(backends)}."
+        )
+    return backends[name]
+
+
+# The default backend that is used for all json lines
+backend = get_backend()
+loads = backend.loads
+dumps = backend.dumps
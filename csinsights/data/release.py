@@ -0,0 +1,261 @@
+"""This module implements sharded release exports. Records are hash partitioned into shards by
+their id, so that consumers can read the shards in parallel, and every exported file is listed in
+a manifest with its row count, size, and checksum, so that consumers can verify the shards without
+reading them. A record with the id `key` is in shard `crc32(str(key).encode()) % shards`.
+"""
+import hashlib
+import json
+import os
+import zlib
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+# The ids that records of the datasets are partitioned by
+SHARD_KEYS = {"papers": "corpusid", "authors": "authorid"}
+
+# The name of the manifest in the release directory
+MANIFEST_NAME = "manifest.json"
+
+W = TypeVar("W", bound="HashingWriter")
+R = TypeVar("R", bound="ReleaseManifest")
+S = TypeVar("S", bound="ShardedExport")
+
+
+def get_shard(key: Union[int, str], shards: int) -> int:
+    """Get the shard of a record. The hash is stable across processes and platforms.
+
+    Args:
+        key (Union[int, str]): The id of the record (e.g., the corpusid).
+        shards (int): The number of shards.
+
+    Returns:
+        int: The index of the shard.
+    """
+    return zlib.crc32(str(key).encode()) % shards
+
+
+class HashingWriter(object):
+    """A writable file wrapper that computes the size and MD5 hash of everything written.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: W, file: IO[bytes]) -> None:
+        """Constructor of the HashingWriter.
+
+        Args:
+            self (W): This object.
+            file (IO[bytes]): The file to write to.
+        """
+        self.file = file
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def write(self: W, data: bytes) -> int:
+        """Write to the file and update the hash.
+
+        Args:
+            self (W): This object.
+            data (bytes): The data to write.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        self.md5.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self: W) -> None:
+        """Flush the file.
+
+        Args:
+            self (W): This object.
+        """
+        self.file.flush()
+
+    def close(self: W) -> None:
+        """Close the file.
+
+        Args:
+            self (W): This object.
+        """
+        self.file.close()
+
+
+class ReleaseManifest(object):
+    """A manifest of the exported files of a release with their datasets, shards, row counts,
+    sizes, and checksums.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: R, release_dir: Path) -> None:
+        """Constructor of the ReleaseManifest. Loads the manifest if it exists.
+
+        Args:
+            self (R): This object.
+            release_dir (Path): The release directory.
+        """
+        self.release_dir = release_dir
+        self.manifest_path = release_dir / MANIFEST_NAME
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                self.files = json.load(f)["files"]
+
+    def remove(self: R, dataset: str, export_format: str) -> None:
+        """Remove the files of an export, e.g., before it is exported with a different number of
+        shards.
+
+        Args:
+            self (R): This object.
+            dataset (str): The name of the dataset (e.g., papers).
+            export_format (str): The format of the export (e.g., jsonl).
+        """
+        for name, entry in list(self.files.items()):
+            if entry["dataset"] == dataset and entry["format"] == export_format:
+                (self.release_dir / name).unlink(missing_ok=True)
+                del self.files[name]
+        self.save()
+
+    def record(self: R, file_path: Path, **entry: Union[str, int]) -> None:
+        """Record an exported file and persist the manifest.
+
+        Args:
+            self (R): This object.
+            file_path (Path): The path to the file.
+            **entry (Union[str, int]): The dataset, format, shard, shards, key, rows, size, and
+            md5 of the file.
+        """
+        self.files[file_path.name] = entry
+        self.save()
+
+    def save(self: R) -> None:
+        """Persist the manifest.
+
+        Args:
+            self (R): This object.
+        """
+        # Write to a temporary file first so that the manifest is never left half written
+        tmp_path = Path(f"{self.manifest_path}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"partitioning": "crc32", "files": self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class ShardedExport(object):
+    """The shards of an export of a dataset. The shards are recorded in the manifest when the
+    export is closed without an error.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(
+        self: S,
+        manifest: ReleaseManifest,
+        dataset: str,
+        export_format: str,
+        paths: List[Path],
+        open_fn: Callable[[IO[bytes]], IO],
+    ) -> None:
+        """Constructor of the ShardedExport. Replaces the previous export in the manifest and
+        opens all shards.
+
+        Args:
+            self (S): This object.
+            manifest (ReleaseManifest): The manifest of the release.
+            dataset (str): The name of the dataset (e.g., papers).
+            export_format (str): The format of the export (e.g., jsonl).
+            paths (List[Path]): The paths to the shards.
+            open_fn (Callable[[IO[bytes]], IO]): A function that opens a shard for writing the
+            export (e.g., compressed) on top of the file it is stored in.
+        """
+        self.manifest = manifest
+        self.dataset = dataset
+        self.export_format = export_format
+        self.paths = paths
+        self.key = SHARD_KEYS[dataset]
+        manifest.remove(dataset, export_format)
+        self.hashes = [HashingWriter(open(path, "wb")) for path in paths]
+        self.files = [open_fn(file) for file in self.hashes]  # type: ignore
+        self.rows = [0] * len(paths)
+        # The number of uncompressed bytes written to every shard
+        self.offsets = [0] * len(paths)
+
+    def index(self: S, record: dict) -> int:
+        """Get the shard of a record and count it.
+
+        Args:
+            self (S): This object.
+            record (dict): The record.
+
+        Returns:
+            int: The index of the shard in `files`.
+        """
+        shard = get_shard(record[self.key], len(self.files)) if len(self.files) > 1 else 0
+        self.rows[shard] += 1
+        return shard
+
+    def write(self: S, record: dict, data: bytes) -> Tuple[int, int]:
+        """Write the data of a record to its shard.
+
+        Args:
+            self (S): This object.
+            record (dict): The record.
+            data (bytes): The data to write (e.g., the json line of the record).
+
+        Returns:
+            Tuple[int, int]: The index of the shard and the uncompressed offset of the data in
+            the shard.
+        """
+        shard = self.index(record)
+        offset = self.offsets[shard]
+        self.files[shard].write(data)
+        self.offsets[shard] += len(data)
+        return shard, offset
+
+    def __enter__(self: S) -> S:
+        """Enter the context of the export.
+
+        Args:
+            self (S): This object.
+
+        Returns:
+            S: This object.
+        """
+        return self
+
+    def __exit__(
+        self: S,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Close all shards and record them in the manifest.
+
+        Args:
+            self (S): This object.
+            exc_type (Optional[Type[BaseException]]): The type of the error, if any.
+            exc (Optional[BaseException]): The error, if any.
+            traceback (Optional[TracebackType]): The traceback of the error, if any.
+        """
+        for file in self.files:
+            file.close()
+        if exc_type is not None:
+            return
+        for shard, (path, hashing, rows) in enumerate(zip(self.paths, self.hashes, self.rows)):
+            self.manifest.record(
+                path,
+                dataset=self.dataset,
+                format=self.export_format,
+                shard=shard,
+                shards=len(self.paths),
+                key=self.key,
+                rows=rows,
+                size=hashing.size,
+                md5=hashing.md5.hexdigest(),
+            )
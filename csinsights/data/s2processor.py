@@ -1,17 +1,60 @@
 """The data processort class for the SemanticScholar dataset."""
-import gzip
-import json
+import csv
+import heapq
+import io
+import multiprocessing
 import os
+import re
+import shutil
 from collections import defaultdict
+from functools import partial
+from itertools import groupby, repeat
 from pathlib import Path
-from typing import Dict, List, Set, TypeVar, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-import jsonlines
-import pandas as pd
 from tqdm import tqdm
 
+from csinsights.data import jsonbackend
+from csinsights.data.compression import (
+    COMPRESSIONS,
+    default_threads,
+    open_compressed,
+    open_gzip,
+    open_writer,
+)
+from csinsights.data.corpusids import CorpusIdSet
+from csinsights.data.index import OffsetIndexBuilder, save_index
+from csinsights.data.release import ReleaseManifest, ShardedExport
+from csinsights.data.schema import (
+    JOINED_FIELDS,
+    SCHEMAS,
+    conform,
+    flatten_record,
+    flatten_schema,
+    to_arrow_schema,
+)
+from csinsights.data.spill import ExternalSorter, MemoryBudget
 from csinsights.log import LogMixin
 
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
 T = TypeVar("T", bound="SemanticScholarDataProcessor")
 
 s2filters = {
@@ -24,6 +67,332 @@ s2filters = {
 
 unsupported_filters: List[str] = []
 
+# The filters and corpus ids of a worker process. They are set once per worker by `_init_worker`
+# and the corpus ids are read from shared memory so that they are never pickled.
+_worker_filters: List[str] = []
+_worker_corpusids = CorpusIdSet()
+
+# Number of documents whose corpus ids are tested for membership at once
+MEMBERSHIP_BATCH_SIZE = 10000
+
+# Finds the corpus ids in a raw json line to test them for membership before parsing the line
+CORPUSID_PATTERN = re.compile(rb'"corpusid"\s*:\s*(\d+)')
+
+# Finds the author ids in a raw json line to test them for membership before parsing the line
+AUTHORID_PATTERN = re.compile(rb'"authorid"\s*:\s*"?(\d+)')
+
+# Number of records that are flattened and written at once when exporting to csv
+CSV_CHUNK_SIZE = 100000
+
+# Number of records per row group of the parquet export
+PARQUET_ROW_GROUP_SIZE = 100000
+
+
+def get_dataset_name(filepath: Path) -> str:
+    """Get the name of the dataset from the path of a shard (e.g., papers_0.jsonl.gz -> papers).
+
+    Args:
+        filepath (Path): The path to the .jsonl.gz shard.
+
+    Returns:
+        str: The name of the dataset.
+    """
+    return filepath.name.split("_")[0]
+
+
+def get_shard_index(filepath: Path) -> int:
+    """Get the index of a shard from its path (e.g., papers_12.jsonl.gz -> 12).
+
+    Args:
+        filepath (Path): The path to the .jsonl.gz shard.
+
+    Returns:
+        int: The index of the shard or -1 if the name has no index.
+    """
+    index = filepath.name.split(".")[0].split("_")[-1]
+    return int(index) if index.isdigit() else -1
+
+
+def check_supported_filters(**kwargs: Union[str, bool]) -> None:
+    """Check if any of the not supported filters are used.
+
+    Raises:
+        NotImplementedError: If a filter is not supported yet.
+    """
+    if any([kwargs[feature] for feature in unsupported_filters]):
+        raise NotImplementedError(
+            f"The following filters are not supported yet: {unsupported_filters}"
+        )
+
+
+def create_filters(**kwargs: Union[str, bool]) -> List[str]:
+    """Create the external id filters from the `s2_filter_*` arguments.
+
+    Returns:
+        List[str]: The names of the external ids to filter by (e.g., DBLP).
+    """
+    # Only the filters by external id, not options like `s2_filter_on_download`
+    return [
+        external_id for name, external_id in s2filters.items() if kwargs.get(f"s2_filter_{name}")
+    ]
+
+
+def create_filter_pattern(filters: List[str]) -> Optional[Pattern[bytes]]:
+    """Create a pattern that finds any of the external ids with a non-null value in a raw json
+    line. Every paper that matches the filters also matches the pattern, but not vice versa.
+
+    Args:
+        filters (List[str]): The names of the external ids papers are filtered by.
+
+    Returns:
+        Optional[Pattern[bytes]]: The pattern or None if there are no filters.
+    """
+    if not filters:
+        return None
+    names = b"|".join(re.escape(f.encode()) for f in filters)
+    return re.compile(b'"(?:' + names + rb')"\s*:(?!\s*null)')
+
+
+def normalize_document(doc: dict) -> dict:
+    """Use the external ids of the open access info of a document as its external ids.
+
+    Args:
+        doc (dict): The parsed document. It is changed in place.
+
+    Returns:
+        dict: The document.
+    """
+    if (
+        "openaccessinfo" in doc
+        and doc["openaccessinfo"] is not None
+        and "externalids" in doc["openaccessinfo"]
+    ):
+        doc["externalids"] = doc["openaccessinfo"]["externalids"]
+        del doc["openaccessinfo"]
+    return doc
+
+
+def matches_filters(paper: dict, filters: List[str]) -> bool:
+    """Check whether a paper has any of the external ids it is filtered by.
+
+    Args:
+        paper (dict): The paper.
+        filters (List[str]): The names of the external ids papers are filtered by.
+
+    Returns:
+        bool: Whether the paper has at least one of the external ids.
+    """
+    return any(
+        paper["externalids"][f] is not None
+        if "externalids" in paper and paper["externalids"] is not None and f in paper["externalids"]
+        else False
+        for f in filters
+    )
+
+
+def iter_and_filter_jsonl_file(
+    filepath: Path, filters: List[str], filtered_corpusids: CorpusIdSet, threads: int = 1
+) -> Iterator[dict]:
+    """Lazily read and filter the data from a jsonl file.
+
+    Args:
+        filepath (Path): The path to the .jsonl.gz file.
+        filters (List[str]): The names of the external ids papers are filtered by.
+        filtered_corpusids (CorpusIdSet): A set of corpus ids. The rest can be filtered.
+        threads (int, optional): The number of threads to inflate BGZF files with. Defaults to 1.
+
+    Returns:
+        Iterator[dict]: The filtered documents of the file.
+    """
+    # Open it, inflating in the background while filtering
+    with open_gzip(filepath, threads) as f:
+        yield from filter_documents(
+            tqdm(f, miniters=10000, desc=f"Reading {filepath}"),
+            get_dataset_name(filepath),
+            filters,
+            filtered_corpusids,
+        )
+
+
+def filter_documents(
+    lines: Iterable[bytes], dataset: str, filters: List[str], filtered_corpusids: CorpusIdSet
+) -> Iterator[dict]:
+    """Lazily parse and filter the json lines of a dataset.
+
+    Args:
+        lines (Iterable[bytes]): The json lines.
+        dataset (str): The name of the dataset (e.g., papers).
+        filters (List[str]): The names of the external ids papers are filtered by.
+        filtered_corpusids (CorpusIdSet): A set of corpus ids. The rest can be filtered.
+
+    Returns:
+        Iterator[dict]: The filtered documents.
+    """
+    # Check the type of the dataset once instead of once per document
+    is_papers = dataset == "papers"
+    # If it's authors or abstracts they don't include DBLP ids so we accept loading
+    # also without the condition. But then we filter by corpusid to not overload
+    # the memory. The filtered_corpusids are empty at first and get extended by the
+    # filtered papers.
+    accept_all = dataset == "authors" or (not filtered_corpusids and not is_papers)
+    check_corpusids = bool(filtered_corpusids)
+
+    # Screen the raw lines of papers for non-null external ids before parsing them
+    filter_pattern = create_filter_pattern(filters) if is_papers else None
+
+    # Skip the lines of a batch that can't pass the filters without parsing them. Lines that
+    # pass are filtered exactly after parsing, so the screen only has to avoid false negatives
+    def screen_batch(lines: List[bytes]) -> List[bytes]:
+        if accept_all:
+            return lines
+        keep = [False] * len(lines)
+        screened_corpusids, screened_positions = [], []
+        for position, line in enumerate(lines):
+            if filter_pattern is not None and filter_pattern.search(line):
+                keep[position] = True
+            elif check_corpusids:
+                # Only an unambiguous corpus id can be tested before parsing
+                corpusids = CORPUSID_PATTERN.findall(line)
+                if len(corpusids) == 1:
+                    screened_corpusids.append(int(corpusids[0]))
+                    screened_positions.append(position)
+                else:
+                    keep[position] = True
+        if screened_corpusids:
+            is_member = filtered_corpusids.contains_many(screened_corpusids)
+            for position, member in zip(screened_positions, is_member):
+                keep[position] = bool(member)
+        return [line for line, kept in zip(lines, keep) if kept]
+
+    # Filter a batch of documents, testing all corpus ids of the batch at once
+    def filter_batch(docs: List[dict]) -> List[dict]:
+        if accept_all:
+            return docs
+        if check_corpusids:
+            is_member = filtered_corpusids.contains_many(
+                [-1 if doc["corpusid"] is None else doc["corpusid"] for doc in docs]
+            )
+            return [
+                doc
+                for doc, member in zip(docs, is_member)
+                if member or (is_papers and matches_filters(doc, filters))
+            ]
+        return [doc for doc in docs if is_papers and matches_filters(doc, filters)]
+
+    # Read them
+    def parse_batch(lines: List[bytes]) -> List[dict]:
+        return [normalize_document(jsonbackend.loads(line)) for line in screen_batch(lines)]
+
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= MEMBERSHIP_BATCH_SIZE:
+            yield from filter_batch(parse_batch(batch))
+            batch = []
+    yield from filter_batch(parse_batch(batch))
+
+
+def filter_authors(lines: Iterable[bytes], author_ids: CorpusIdSet) -> Iterator[dict]:
+    """Lazily parse the json lines of authors and keep the ones with the given ids. The ids are
+    tested on the raw lines in batches, so only the kept authors are parsed.
+
+    Args:
+        lines (Iterable[bytes]): The json lines.
+        author_ids (CorpusIdSet): The ids of the authors to keep.
+
+    Returns:
+        Iterator[dict]: The filtered authors.
+    """
+    batch: List[bytes] = []
+
+    # Skip the lines of a batch whose author id is not in the set without parsing them
+    def screen_batch(lines: List[bytes]) -> List[bytes]:
+        keep = [True] * len(lines)
+        screened_ids, screened_positions = [], []
+        for position, line in enumerate(lines):
+            # Only an unambiguous author id can be tested before parsing
+            authorids = AUTHORID_PATTERN.findall(line)
+            if len(authorids) == 1:
+                screened_ids.append(int(authorids[0]))
+                screened_positions.append(position)
+        if screened_ids:
+            is_member = author_ids.contains_many(screened_ids)
+            for position, member in zip(screened_positions, is_member):
+                keep[position] = bool(member)
+        return [line for line, kept in zip(lines, keep) if kept]
+
+    # Parse the lines that passed the screen and test them exactly
+    def parse_batch(lines: List[bytes]) -> Iterator[dict]:
+        for line in screen_batch(lines):
+            author = jsonbackend.loads(line)
+            # Authors without an id can't be referenced by papers
+            if author["authorid"] is not None and int(author["authorid"]) in author_ids:
+                yield author
+
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= MEMBERSHIP_BATCH_SIZE:
+            yield from parse_batch(batch)
+            batch = []
+    yield from parse_batch(batch)
+
+
+def _init_worker(filters: List[str], corpusids_name: str, corpusids_length: int) -> None:
+    """Initialize a worker process of the shard reading pool.
+
+    Args:
+        filters (List[str]): The names of the external ids papers are filtered by.
+        corpusids_name (str): The name of the shared memory block holding the corpus ids.
+        corpusids_length (int): The number of corpus ids in the shared memory block.
+    """
+    global _worker_filters, _worker_corpusids
+    _worker_filters = filters
+    _worker_corpusids = CorpusIdSet.from_shared_memory(corpusids_name, corpusids_length)
+
+
+def _read_and_filter_shard(filepath: Path) -> List[dict]:
+    """Read and filter a shard in a worker process of the shard reading pool.
+
+    Args:
+        filepath (Path): The path to the .jsonl.gz shard.
+
+    Returns:
+        List[dict]: The filtered documents of the shard.
+    """
+    return list(iter_and_filter_jsonl_file(filepath, _worker_filters, _worker_corpusids))
+
+
+D = TypeVar("D", bound="StreamingDataset")
+
+
+class StreamingDataset(object):
+    """A dataset that is not held in memory but re-generated every time it is iterated.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: D, generator_fn: Callable[[], Iterator[dict]]) -> None:
+        """Constructor of the StreamingDataset.
+
+        Args:
+            self (D): This object.
+            generator_fn (Callable[[], Iterator[dict]]): A function returning a fresh iterator
+            over the records of the dataset.
+        """
+        self.generator_fn = generator_fn
+
+    def __iter__(self: D) -> Iterator[dict]:
+        """Iterate over a fresh stream of records.
+
+        Args:
+            self (D): This object.
+
+        Returns:
+            Iterator[dict]: The records of the dataset.
+        """
+        return self.generator_fn()
+
 
 class SemanticScholarDataProcessor(LogMixin):
     """A data processor for
@@ -32,16 +401,52 @@ class SemanticScholarDataProcessor(LogMixin):
         LogMixin (Any): A shared log mixin class.
     """
 
-    def __init__(self: T, cache_dir: Path, **kwargs: Union[str, Path]) -> None:
+    def __init__(
+        self: T,
+        cache_dir: Path,
+        s2_streaming: bool = False,
+        workers: int = 1,
+        max_memory: Optional[int] = None,
+        compression: str = "gzip",
+        compression_level: Optional[int] = None,
+        release_shards: int = 1,
+        **kwargs: Union[str, Path],
+    ) -> None:
         """Constructor the the SemanticScholarDataProcessor
 
         Args:
             self (T): This object.
             cache_dir (Path): The cache directory to store releases in.
+            s2_streaming (bool, optional): Whether to stream the data through the pipeline instead
+            of loading all datasets into memory. Defaults to False.
+            workers (int, optional): The number of processes to read shards with. Defaults to 1.
+            max_memory (Optional[int], optional): The memory budget in MB for joining the datasets.
+            If set, the datasets are sorted and joined out of core and spilled to the cache
+            directory whenever the budget is exceeded. Defaults to None.
+            compression (str, optional): The compression of the jsonl and csv exports (gzip or
+            zstd). Defaults to "gzip".
+            compression_level (Optional[int], optional): The compression level of the exports.
+            Defaults to None which selects the default level of the compression.
+            release_shards (int, optional): The number of shards the jsonl and csv exports of every
+            dataset are split into by their ids. Defaults to 1.
         """
         self.cache_dir = cache_dir
+        self.streaming = s2_streaming
+        self.workers = workers
+        self.max_memory = max_memory
+        # Share the cores between the workers to inflate BGZF shards
+        self.decompress_threads = default_threads(workers)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.release_shards = release_shards
+        # The exports run after the workers finished, so the shards compress on all cores
+        self.compress_threads = default_threads(release_shards)
         # A dict that stores the dataset name and its filtered data {"dataset_name": [...]}
         self.datasets: Dict[str, list] = defaultdict(list)
+        # A dict that stores the dataset name and a re-iterable stream of its data (streaming mode)
+        self.streams: Dict[str, Iterable[dict]] = {}
+        # A dict that stores the dataset name and the checkpoint its stream is read from
+        self.checkpoints: Dict[str, Path] = {}
 
     def process_data(self: T, **kwargs: str) -> T:
         """Load and join the data from the releases.
@@ -49,132 +454,508 @@ class SemanticScholarDataProcessor(LogMixin):
         Args:
             self (T): This object.
         """
+        # With a memory budget, the datasets are joined on disk
+        if self.max_memory is not None:
+            return self._process_data_external(**kwargs)
+        # In streaming mode, only the join state is kept in memory
+        if self.streaming:
+            return self._process_data_streaming(**kwargs)
         # Collect all corpus ids from filtered papers. Some sentient metadata fields don't
         # have external ids (e.g. for DBLP). If we don't filter them out early, we will run into
         # memory issues later on
-        filtered_corpusids: Set[str] = set()
+        filtered_corpusids = CorpusIdSet()
         # First get all papers to get which paper ids are important to filter
-        for filepath in self.cache_dir.glob("papers*.jsonl.gz"):
+        for filepath, filtered in self._read_shards(
+            self._get_shards("papers"), filtered_corpusids, **kwargs
+        ):
             # Read the data and filter it
-            filtered = self._read_and_filter_jsonl_file(filepath, filtered_corpusids, **kwargs)
-            filtered_corpusids.update([paper["corpusid"] for paper in filtered])
-            self.datasets[str(filepath).split("/")[-1].split("_")[0]].extend(filtered)
-        # Then get the remainder
-        for filepath in self.cache_dir.glob("*.jsonl.gz"):
-            if "papers" not in str(filepath):
-                # Read the data and filter it
-                filtered = self._read_and_filter_jsonl_file(filepath, filtered_corpusids, **kwargs)
-                # Append it to the datasets dict
-                self.datasets[str(filepath).split("/")[-1].split("_")[0]].extend(filtered)
+            papers = list(filtered)
+            filtered_corpusids.update([paper["corpusid"] for paper in papers])
+            self.datasets["papers"].extend(papers)
+        # Then get the remainder except for the authors
+        side_shards = [
+            filepath
+            for filepath in self._get_shards(exclude="papers")
+            if get_dataset_name(filepath) != "authors"
+        ]
+        for filepath, filtered in self._read_shards(side_shards, filtered_corpusids, **kwargs):
+            # Append it to the datasets dict
+            self.datasets[get_dataset_name(filepath)].extend(filtered)
 
         # Merge the datasets
         self._merge_datasets()
-        # Filter the authors
-        self._filter_authors()
-        # Prepare the data for release
-        self._prepare_for_release()
+        # Read only the authors of the final papers, prepared for release
+        self.datasets["authors"] = list(
+            self._iter_authors(self._get_paper_authors(self.datasets["papers"]))
+        )
         # Return an instance of this object to make function calls available in a chain
         return self
 
-    def _filter_authors(self: T) -> None:
-        """Filter the authors according to the filtered dataset.
+    def _process_data_streaming(self: T, **kwargs: str) -> T:
+        """Load and join the data from the releases as a stream. Only the filtered papers (the
+        join state) are kept in memory while all other datasets are streamed from the shards.
 
         Args:
             self (T): This object.
         """
+        # Index the filtered papers by corpusid. This is the only state that is held in memory.
+        papers_index: Dict[int, dict] = {}
+        for filepath, filtered in self._read_shards(
+            self._get_shards("papers"), CorpusIdSet(), **kwargs
+        ):
+            for paper in filtered:
+                papers_index[paper["corpusid"]] = paper
+        # Join the remainder (e.g., abstracts) into the papers while reading the shards
+        side_shards = [
+            filepath
+            for filepath in self._get_shards(exclude="papers")
+            if get_dataset_name(filepath) != "authors"
+        ]
+        for filepath, filtered in self._read_shards(
+            side_shards, CorpusIdSet(papers_index), **kwargs
+        ):
+            self._join_into(papers_index, filtered)
         # Get all unique author ids from papers
-        all_paper_authors = set()
-        for paper in self.datasets["papers"]:
-            for author in paper["authors"]:
-                all_paper_authors.add(author["authorId"])
-
-        # Filter authors
-        self.datasets["authors"] = [
-            author for author in self.datasets["authors"] if author["authorid"] in all_paper_authors
+        all_paper_authors = self._get_paper_authors(papers_index.values())
+        # Papers are served from the index and authors are re-read from the shards on every export
+        self.streams["papers"] = papers_index.values()
+        self.streams["authors"] = StreamingDataset(lambda: self._iter_authors(all_paper_authors))
+        # Return an instance of this object to make function calls available in a chain
+        return self
+
+    def _process_data_external(self: T, **kwargs: str) -> T:
+        """Load and join the data from the releases out of core. Every dataset is sorted by
+        corpusid into runs on disk which are k-way merged into the joined papers on every export.
+
+        Args:
+            self (T): This object.
+        """
+        assert self.max_memory is not None
+        # Start from an empty spill directory so that no stale runs are merged
+        spill_dir = self.cache_dir / "spill"
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        budget = MemoryBudget(self.max_memory * 2**20)
+        sorters: Dict[str, ExternalSorter] = {}
+        # Collect the corpus ids and author ids of the filtered papers while sorting them
+        filtered_corpusids = CorpusIdSet()
+        all_paper_authors = CorpusIdSet()
+        sorters["papers"] = ExternalSorter("papers", spill_dir, budget)
+        for filepath, filtered in self._read_shards(
+            self._get_shards("papers"), filtered_corpusids, **kwargs
+        ):
+            for paper in filtered:
+                filtered_corpusids.add(paper["corpusid"])
+                all_paper_authors.update(
+                    int(author["authorId"])
+                    for author in paper["authors"]
+                    if author["authorId"] is not None
+                )
+                sorters["papers"].add(paper["corpusid"], jsonbackend.dumps(paper))
+        # Sort the remainder (e.g., abstracts) that belongs to the filtered papers
+        side_shards = [
+            filepath
+            for filepath in self._get_shards(exclude="papers")
+            if get_dataset_name(filepath) != "authors"
         ]
+        for filepath, filtered in self._read_shards(side_shards, filtered_corpusids, **kwargs):
+            dataset = get_dataset_name(filepath)
+            if dataset not in sorters:
+                sorters[dataset] = ExternalSorter(dataset, spill_dir, budget)
+            for doc in filtered:
+                sorters[dataset].add(doc["corpusid"], jsonbackend.dumps(doc))
+        # Papers are merged from the runs and authors are re-read from the shards on every export
+        self.streams["papers"] = StreamingDataset(
+            lambda: self._iter_sort_merge_join(list(sorters.values()))
+        )
+        self.streams["authors"] = StreamingDataset(lambda: self._iter_authors(all_paper_authors))
+        # Return an instance of this object to make function calls available in a chain
+        return self
 
-    def _merge_datasets(self: T) -> None:
-        """Merge the datasets.
+    def _iter_sort_merge_join(self: T, sorters: List[ExternalSorter]) -> Iterator[dict]:
+        """K-way merge the sorted datasets and join them into papers. The first sorter holds the
+        papers. Records without a matching paper are dropped. Fields of the paper take precedence.
+
+        Args:
+            self (T): This object.
+            sorters (List[ExternalSorter]): The sorted datasets, starting with the papers.
+
+        Returns:
+            Iterator[dict]: The joined papers sorted by corpusid.
+        """
+        # Records with the same corpusid are ordered by their dataset so that papers come first
+        merged = heapq.merge(
+            *[zip(repeat(rank), sorter) for rank, sorter in enumerate(sorters)],
+            key=lambda x: (x[1][0], x[0]),
+        )
+        for _, group in groupby(merged, key=lambda x: x[1][0]):
+            rank, (_, record) = next(group)
+            # Drop sentient records without a paper
+            if rank != 0:
+                continue
+            paper = jsonbackend.loads(record)
+            for _, (_, record) in group:
+                for key, value in jsonbackend.loads(record).items():
+                    paper.setdefault(key, value)
+            yield paper
+
+    def process_diffs(
+        self: T, previous_release_dir: str, from_release: str, to_release: str, **kwargs: str
+    ) -> T:
+        """Update a previous release with the diffs in the `diffs` subdirectory of the cache
+        directory instead of processing a full release. The diffs are applied in the order of
+        the releases, with papers first so that the other datasets are joined into them.
 
         Args:
             self (T): This object.
+            previous_release_dir (str): The directory of the previous release.
+            from_release (str): The release version of the previous release.
+            to_release (str): The release version to update the previous release to.
+
+        Raises:
+            FileNotFoundError: If the previous release has no papers or authors.
+            NotImplementedError: If a diff of a dataset can't be joined into papers.
         """
-        # Sort by corpusid
-        for dataset in self.datasets:
-            self.datasets[dataset] = sorted(
-                self.datasets[dataset], key=lambda x: ("corpusid" in x, x.get("corpusid", None))
+        # Check if any of the not supported features are used
+        check_supported_filters(**kwargs)
+        filters = create_filters(**kwargs)
+        release_dir = os.path.expanduser(previous_release_dir)
+        # Without the previous release, the new release would only contain the diffs
+        export_files = {}
+        for dataset in ("papers", "authors"):
+            export_files[dataset] = self._get_export_files(release_dir, dataset, "jsonl")
+            if not export_files[dataset]:
+                raise FileNotFoundError(
+                    f"The previous release in {release_dir} has no jsonl export of {dataset}."
+                )
+        # Index the previous release by corpusid and authorid
+        papers_index: Dict[int, dict] = {
+            paper["corpusid"]: paper
+            for filepath in export_files["papers"]
+            for paper in self._iter_jsonl_file(filepath)
+        }
+        authors_index: Dict[str, dict] = {
+            author["authorid"]: author
+            for filepath in export_files["authors"]
+            for author in self._iter_jsonl_file(filepath)
+        }
+        author_diffs = []
+        for filepaths in self._get_diffs(from_release, to_release):
+            for filepath in filepaths:
+                dataset = get_dataset_name(filepath)
+                is_delete = filepath.name.split("_")[3] == "delete"
+                # Authors depend on the papers of the final release, so they are applied last
+                if dataset == "authors":
+                    author_diffs.append((filepath, is_delete))
+                elif dataset == "papers":
+                    self._apply_paper_diff(papers_index, filepath, is_delete, filters)
+                elif dataset not in JOINED_FIELDS:
+                    raise NotImplementedError(f"Applying diffs of {dataset} is not supported yet.")
+                elif is_delete:
+                    for record in self._iter_jsonl_file(filepath):
+                        paper = papers_index.get(record["corpusid"])
+                        if paper is not None:
+                            for key in JOINED_FIELDS[dataset]:
+                                paper.pop(key, None)
+                else:
+                    for record in iter_and_filter_jsonl_file(
+                        filepath, filters, CorpusIdSet(papers_index)
+                    ):
+                        paper = papers_index.get(record["corpusid"])
+                        if paper is None:
+                            continue
+                        # Replace the fields joined from the previous record
+                        for key in JOINED_FIELDS[dataset]:
+                            paper.pop(key, None)
+                            if key in record:
+                                paper[key] = record[key]
+        # Apply the author diffs for the authors referenced by the updated papers
+        all_paper_authors = self._get_paper_authors(papers_index.values())
+        for filepath, is_delete in author_diffs:
+            if is_delete:
+                for record in self._iter_jsonl_file(filepath):
+                    authors_index.pop(record["authorid"], None)
+                continue
+            with open_gzip(filepath, self.decompress_threads) as f:
+                for author in filter_authors(f, all_paper_authors):
+                    # Change "url" key of authors to "s2url"
+                    author["s2url"] = author.pop("url")
+                    authors_index[author["authorid"]] = author
+        # Drop the authors that are not referenced anymore
+        authors = [
+            author
+            for author in authors_index.values()
+            if author["authorid"] is not None and int(author["authorid"]) in all_paper_authors
+        ]
+        # Diffs only contain changed records, so unchanged authors of papers that newly match
+        # the filters are missing until they change or a full release is processed
+        missing_authors = len(all_paper_authors) - len(authors)
+        if missing_authors:
+            self.logger.warning(
+                f"{missing_authors} referenced authors are neither in the previous release nor"
+                " in the diffs."
             )
+        self.streams["papers"] = papers_index.values()
+        self.streams["authors"] = authors
+        # Return an instance of this object to make function calls available in a chain
+        return self
 
+    def _apply_paper_diff(
+        self: T, papers_index: Dict[int, dict], filepath: Path, is_delete: bool, filters: List[str]
+    ) -> None:
+        """Apply the updated or deleted papers of a diff to the indexed papers in place.
+
+        Args:
+            self (T): This object.
+            papers_index (Dict[int, dict]): The papers indexed by corpusid.
+            filepath (Path): The path to the .jsonl.gz file of the diff.
+            is_delete (bool): Whether the file contains deleted papers.
+            filters (List[str]): The names of the external ids papers are filtered by.
+        """
+        if is_delete:
+            for record in self._iter_jsonl_file(filepath):
+                papers_index.pop(record["corpusid"], None)
+            return
+        # Updated papers are normalized like the papers of a full release
+        for paper in map(normalize_document, self._iter_jsonl_file(filepath)):
+            previous = papers_index.pop(paper["corpusid"], None)
+            # Updated papers that don't match the filters anymore are removed
+            if not matches_filters(paper, filters):
+                continue
+            # Keep the fields that were joined from other datasets
+            if previous is not None:
+                for fields in JOINED_FIELDS.values():
+                    for key in fields:
+                        if key in previous:
+                            paper.setdefault(key, previous[key])
+            papers_index[paper["corpusid"]] = paper
+
+    def _get_diffs(self: T, from_release: str, to_release: str) -> List[List[Path]]:
+        """Get the files of the diffs from a release to another in the `diffs` subdirectory of
+        the cache directory. Diffs of other releases (e.g., of an aborted run) are ignored.
+
+        Args:
+            self (T): This object.
+            from_release (str): The release version the first diff starts at.
+            to_release (str): The release version the last diff leads to.
+
+        Raises:
+            FileNotFoundError: If no chain of diffs leads from one release to the other.
+
+        Returns:
+            List[List[Path]]: The files per diff in the order of the releases. The files of a
+            diff are sorted with papers first and updates before deletes.
+        """
+        diffs: Dict[str, Dict[str, List[Path]]] = defaultdict(lambda: defaultdict(list))
+        for filepath in (self.cache_dir / "diffs").glob("*.jsonl.gz"):
+            _, diff_from, diff_to, *_ = filepath.name.split("_")
+            diffs[diff_from][diff_to].append(filepath)
+        # Follow the diffs between consecutive releases from one release to the other
+        chain = []
+        release = from_release
+        while release != to_release:
+            next_releases = [diff_to for diff_to in diffs[release] if diff_to <= to_release]
+            if not next_releases:
+                raise FileNotFoundError(
+                    f"There are no diffs from {release} towards {to_release} in {self.cache_dir}."
+                )
+            next_release = min(next_releases)
+            chain.append(diffs[release][next_release])
+            release = next_release
+        return [
+            sorted(
+                filepaths,
+                key=lambda x: (
+                    get_dataset_name(x) != "papers",
+                    get_dataset_name(x),
+                    x.name.split("_")[3] == "delete",
+                    get_shard_index(x),
+                ),
+            )
+            for filepaths in chain
+        ]
+
+    def _iter_jsonl_file(self: T, filepath: Path) -> Iterator[dict]:
+        """Lazily read all records of a jsonl file.
+
+        Args:
+            self (T): This object.
+            filepath (Path): The path to the .jsonl.gz or .jsonl.zst file.
+
+        Returns:
+            Iterator[dict]: The records of the file.
+        """
+        with open_compressed(filepath, self.decompress_threads) as f:
+            for line in tqdm(f, miniters=10000, desc=f"Reading {filepath}"):
+                yield jsonbackend.loads(line)
+
+    def _get_shards(self: T, dataset: str = "", exclude: str = "") -> List[Path]:
+        """Get the shards in the cache directory in a deterministic order.
+
+        Args:
+            self (T): This object.
+            dataset (str, optional): The name of the dataset (e.g., papers). Defaults to "" which
+            returns the shards of all datasets.
+            exclude (str, optional): The name of a dataset to exclude. Defaults to "".
+
+        Returns:
+            List[Path]: The paths to the .jsonl.gz shards sorted by dataset and shard index.
+        """
+        filepaths = []
+        for filepath in self.cache_dir.glob("*.jsonl.gz"):
+            name = get_dataset_name(filepath)
+            if (not dataset or name == dataset) and name != exclude:
+                filepaths.append(filepath)
+        return sorted(filepaths, key=lambda x: (get_dataset_name(x), get_shard_index(x)))
+
+    def _read_shards(
+        self: T,
+        filepaths: List[Path],
+        filtered_corpusids: CorpusIdSet,
+        **kwargs: Union[str, bool],
+    ) -> Iterator[Tuple[Path, Iterable[dict]]]:
+        """Read and filter shards, in parallel if more than one worker is configured. The
+        results are returned in the order of `filepaths`.
+
+        Args:
+            self (T): This object.
+            filepaths (List[Path]): The paths to the .jsonl.gz shards.
+            filtered_corpusids (CorpusIdSet): A set of corpus ids. The rest can be filtered.
+
+        Returns:
+            Iterator[Tuple[Path, Iterable[dict]]]: The path and the filtered documents per shard.
+        """
+        if self.workers <= 1 or len(filepaths) <= 1:
+            for filepath in filepaths:
+                yield filepath, self._iter_and_filter_jsonl_file(
+                    filepath, filtered_corpusids, **kwargs
+                )
+            return
+        # Check if any of the not supported features are used
+        check_supported_filters(**kwargs)
+        # The corpus ids are shared with the workers instead of being pickled for every shard
+        shared_corpusids = filtered_corpusids.to_shared_memory()
+        try:
+            with multiprocessing.Pool(
+                min(self.workers, len(filepaths)),
+                initializer=_init_worker,
+                initargs=(create_filters(**kwargs), shared_corpusids.name, len(filtered_corpusids)),
+            ) as pool:
+                yield from zip(filepaths, pool.imap(_read_and_filter_shard, filepaths))
+        finally:
+            shared_corpusids.close()
+            shared_corpusids.unlink()
+
+    def _get_dataset(self: T, dataset: str) -> Iterable[dict]:
+        """Get the processed records of a dataset, either from memory or as a stream.
+
+        Args:
+            self (T): This object.
+            dataset (str): The name of the dataset (e.g., papers).
+
+        Returns:
+            Iterable[dict]: The records of the dataset.
+        """
+        if dataset in self.streams:
+            return self.streams[dataset]
+        return self.datasets[dataset]
+
+    def _join_into(self: T, papers_index: Dict[int, dict], records: Iterable[dict]) -> None:
+        """Join records of a sentient dataset (e.g., abstracts) into the indexed papers in place.
+        Records without a matching paper are dropped. Fields of the paper take precedence.
+
+        Args:
+            self (T): This object.
+            papers_index (Dict[int, dict]): The papers indexed by corpusid.
+            records (Iterable[dict]): The records to join into the papers.
+        """
+        for record in records:
+            paper = papers_index.get(record["corpusid"])
+            if paper is not None:
+                for key, value in record.items():
+                    paper.setdefault(key, value)
+
+    def _iter_authors(self: T, all_paper_authors: CorpusIdSet) -> Iterator[dict]:
+        """Stream the authors from the shards that are referenced by the papers.
+
+        Args:
+            self (T): This object.
+            all_paper_authors (CorpusIdSet): The author ids referenced by the papers.
+
+        Returns:
+            Iterator[dict]: The filtered authors, prepared for release.
+        """
+        for filepath in self._get_shards("authors"):
+            with open_gzip(filepath, self.decompress_threads) as f:
+                lines = tqdm(f, miniters=10000, desc=f"Reading {filepath}")
+                for author in filter_authors(lines, all_paper_authors):
+                    # Change "url" key of authors to "s2url"
+                    author["s2url"] = author.pop("url")
+                    yield author
+
+    def _get_paper_authors(self: T, papers: Iterable[dict]) -> CorpusIdSet:
+        """Get all unique author ids referenced by papers.
+
+        Args:
+            self (T): This object.
+            papers (Iterable[dict]): The papers.
+
+        Returns:
+            CorpusIdSet: The ids of the authors of the papers.
+        """
+        return CorpusIdSet(
+            int(author["authorId"])
+            for paper in papers
+            for author in paper["authors"]
+            if author["authorId"] is not None
+        )
+
+    def _merge_datasets(self: T) -> None:
+        """Merge the datasets.
+
+        Args:
+            self (T): This object.
+        """
+        # Index the papers by corpusid once
+        papers_index = {paper["corpusid"]: paper for paper in self.datasets["papers"]}
+        # Authors have to be filtered seperately and we always merge on papers
+        sentient_datasets = [name for name in self.datasets if name not in ("authors", "papers")]
         # Merge papers with sentient metadata
-        for dataset in self.datasets:
-            # Authors have to be filtered seperately and we always merge on papers
-            if dataset != "authors" and dataset != "papers":
-                # Update papers by joining the data (e.g., abstracts, citations, ...)
-                # The final dataset will only contain "papers" and "authors"
-                d: dict = defaultdict(dict)
-                for doc in (self.datasets[dataset], self.datasets["papers"]):
-                    for elem in doc:
-                        d[elem["corpusid"]].update(elem)
-                self.datasets["papers"] = list(d.values())
+        for dataset in sentient_datasets:
+            # Update papers in place by joining the data (e.g., abstracts, citations, ...)
+            # The final dataset will only contain "papers" and "authors"
+            self._join_into(papers_index, self.datasets.pop(dataset))
+        self.datasets["papers"] = list(papers_index.values())
 
     def _read_and_filter_jsonl_file(
-        self: T, filepath: Path, filtered_corpusids: set, **kwargs: Union[str, bool]
+        self: T, filepath: Path, filtered_corpusids: CorpusIdSet, **kwargs: Union[str, bool]
     ) -> List[dict]:
         """Read the data from a jsonl file.
 
         Args:
             self (T): This object.
-            filtered_corpusids (set): A set of corpus ids. The rest can be filtered.
+            filtered_corpusids (CorpusIdSet): A set of corpus ids. The rest can be filtered.
             filepath (Path): The path to the .jsonl.gz file.
         """
-        # Check if any of the not supported features are used
-        if any([kwargs[feature] for feature in unsupported_filters]):
-            raise NotImplementedError(
-                f"The following filters are not supported yet: {unsupported_filters}"
-            )
-        # Create Filters
-        filters = []
-        for arg in kwargs:
-            if arg.startswith("s2_filter_") and kwargs[arg]:
-                filters.append(s2filters[arg.split("_")[-1]])
-
-        # Create filter condition by ids
-        def check_condition(paper: dict) -> bool:
-            return any(
-                paper["externalids"][f] is not None
-                if "externalids" in paper
-                and paper["externalids"] is not None
-                and f in paper["externalids"]
-                else False
-                for f in filters
-            )
+        return list(self._iter_and_filter_jsonl_file(filepath, filtered_corpusids, **kwargs))
 
-        docs = []
-        # Open it
-        with gzip.open(filepath, "rb") as f:
-            for line in tqdm(f, miniters=10000, desc=f"Reading {filepath}"):
-                # Read it
-                doc = json.loads(line)
-                if (
-                    "openaccessinfo" in doc
-                    and doc["openaccessinfo"] is not None
-                    and "externalids" in doc["openaccessinfo"]
-                ):
-                    doc["externalids"] = doc["openaccessinfo"]["externalids"]
-                    del doc["openaccessinfo"]
-                # If it's authors or abstracts they don't include DBLP ids so we accept loading
-                # also without the condition. But then we filter by corpusid to not overload
-                # the memory. The filtered_corpusids are empty at first and get extended by the
-                # filtered papers.
-                if (
-                    ("papers" in str(filepath) and check_condition(doc))
-                    or "authors" in str(filepath)
-                    or (not filtered_corpusids and "papers" not in str(filepath))
-                    or doc["corpusid"] in filtered_corpusids
-                ):
-                    docs.append(doc)
-
-        return docs
+    def _iter_and_filter_jsonl_file(
+        self: T, filepath: Path, filtered_corpusids: CorpusIdSet, **kwargs: Union[str, bool]
+    ) -> Iterator[dict]:
+        """Lazily read the data from a jsonl file.
+
+        Args:
+            self (T): This object.
+            filtered_corpusids (CorpusIdSet): A set of corpus ids. The rest can be filtered.
+            filepath (Path): The path to the .jsonl.gz file.
+
+        Returns:
+            Iterator[dict]: The filtered documents of the file.
+        """
+        # Check if any of the not supported features are used
+        check_supported_filters(**kwargs)
+        return iter_and_filter_jsonl_file(
+            filepath, create_filters(**kwargs), filtered_corpusids, self.decompress_threads
+        )
 
     def clean_cache(self: T) -> None:
         """Clean the cache directory.
@@ -182,18 +963,73 @@ class SemanticScholarDataProcessor(LogMixin):
         Args:
             self (T): This object.
         """
-        for file in self.cache_dir.glob("*.jsonl.gz"):
+        # Remove the downloads, including the interrupted ones and their validators
+        for file in self.cache_dir.glob("*.jsonl.gz*"):
             file.unlink()
+        # Remove the runs of the out of core join and the applied diffs
+        shutil.rmtree(self.cache_dir / "spill", ignore_errors=True)
+        shutil.rmtree(self.cache_dir / "diffs", ignore_errors=True)
 
-    def _prepare_for_release(self: T) -> None:
-        """Prepare the data for release.
+    def save_checkpoint(self: T, checkpoint_dir: Path) -> None:
+        """Persist the processed papers and authors, so that they can be exported again without
+        processing the data again. The datasets are only produced and serialized once: afterwards
+        they are served from the checkpoint, whose lines the jsonl export reuses.
 
         Args:
             self (T): This object.
+            checkpoint_dir (Path): The directory to write the datasets to.
         """
-        # Change "url" key of authors to "s2url"
-        for author in self.datasets["authors"]:
-            author["s2url"] = author.pop("url")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        for dataset in ("papers", "authors"):
+            file_path = checkpoint_dir / f"{dataset}.jsonl.gz"
+            # Write to a temporary file first so that a checkpoint is never left half written
+            tmp_path = Path(f"{file_path}.tmp")
+            with open_writer(tmp_path, threads=self.compress_threads) as f:
+                for record in self._get_dataset(dataset):
+                    f.write(jsonbackend.dumps(record) + b"\n")
+            os.replace(tmp_path, file_path)
+        # Streams would process the data again and the datasets in memory aren't needed anymore
+        self.load_checkpoint(checkpoint_dir)
+
+    def load_checkpoint(self: T, checkpoint_dir: Path) -> T:
+        """Load the processed papers and authors that were persisted with `save_checkpoint`. The
+        datasets are streamed from the checkpoint on every export.
+
+        Args:
+            self (T): This object.
+            checkpoint_dir (Path): The directory the datasets were written to.
+
+        Returns:
+            T: This object.
+        """
+        self.datasets.clear()
+        for dataset in ("papers", "authors"):
+            self.checkpoints[dataset] = checkpoint_dir / f"{dataset}.jsonl.gz"
+            self.streams[dataset] = StreamingDataset(
+                partial(self._iter_jsonl_file, self.checkpoints[dataset])
+            )
+        # Return an instance of this object to make function calls available in a chain
+        return self
+
+    def _iter_json_lines(self: T, dataset: str) -> Iterator[Tuple[dict, bytes]]:
+        """Iterate over the records of a dataset with their json lines. The lines of a checkpoint
+        are reused as they are, so the records are not serialized again.
+
+        Args:
+            self (T): This object.
+            dataset (str): The name of the dataset (e.g., papers).
+
+        Returns:
+            Iterator[Tuple[dict, bytes]]: The records and their json lines.
+        """
+        if dataset not in self.checkpoints:
+            for record in self._get_dataset(dataset):
+                yield record, jsonbackend.dumps(record) + b"\n"
+            return
+        filepath = self.checkpoints[dataset]
+        with open_compressed(filepath, self.decompress_threads) as f:
+            for line in tqdm(f, miniters=10000, desc=f"Reading {filepath}"):
+                yield jsonbackend.loads(line), line
 
     def _prepare_release_dir(self: T, release_dir: str = "") -> None:
         """Prepare the release directory.
@@ -206,27 +1042,137 @@ class SemanticScholarDataProcessor(LogMixin):
         if release_dir:
             os.makedirs(os.path.expanduser(release_dir), exist_ok=True)
 
+    def _get_export_files(
+        self: T, release_dir: str, dataset: str, export_format: str
+    ) -> List[Path]:
+        """Get the files of an export of a previous release, which may be split into shards. The
+        files are looked up in the manifest of the release, so that they are found with whatever
+        compression the release was exported with.
+
+        Args:
+            self (T): This object.
+            release_dir (str): The release directory.
+            dataset (str): The name of the dataset (e.g., papers).
+            export_format (str): The format of the export (e.g., jsonl).
+
+        Returns:
+            List[Path]: The paths to the files sorted by shard index.
+        """
+        manifest = ReleaseManifest(Path(release_dir))
+        shards = sorted(
+            (entry.get("shard", 0), name)
+            for name, entry in manifest.files.items()
+            if entry["dataset"] == dataset and entry["format"] == export_format
+        )
+        if shards:
+            return [Path(release_dir) / name for _, name in shards]
+        # Releases exported before the manifest have a single file
+        for extension in COMPRESSIONS.values():
+            filepath = Path(release_dir) / f"{dataset}.{export_format}{extension}"
+            if filepath.exists():
+                return [filepath]
+        return []
+
+    def _open_export(
+        self: T, custom_path: str, dataset: str, export_format: str, text: bool = False
+    ) -> ShardedExport:
+        """Open the shards of an export for writing with the compression of this processor.
+
+        Args:
+            self (T): This object.
+            custom_path (str): The custom path.
+            dataset (str): The name of the dataset (e.g., papers).
+            export_format (str): The format of the export (e.g., jsonl).
+            text (bool, optional): Whether to open the shards in text mode. Defaults to False.
+
+        Returns:
+            ShardedExport: The shards to write the uncompressed export to.
+        """
+        release_dir = Path(os.path.expanduser(custom_path))
+        extension = f".{export_format}{COMPRESSIONS[self.compression]}"
+        # A single shard keeps the name of the dataset
+        if self.release_shards > 1:
+            paths = [
+                release_dir / f"{dataset}_{index}{extension}"
+                for index in range(self.release_shards)
+            ]
+        else:
+            paths = [release_dir / f"{dataset}{extension}"]
+        open_fn = partial(
+            open_writer,
+            compression=self.compression,
+            level=self.compression_level,
+            threads=self.compress_threads,
+        )
+        if text:
+            return ShardedExport(
+                ReleaseManifest(release_dir),
+                dataset,
+                export_format,
+                paths,
+                lambda file: io.TextIOWrapper(open_fn(file), encoding="utf-8", newline=""),
+            )
+        return ShardedExport(ReleaseManifest(release_dir), dataset, export_format, paths, open_fn)
+
     def to_jsonl(self: T, custom_path: str = "") -> None:
-        """Export the data to a jsonl file.
+        """Export the data to a jsonl file. Gzip exports come with an index of the papers by their
+        corpus id for random access (see `csinsights.data.ReleaseIndex`).
+
+        Args:
+            self (T): This object.
+            custom_path (str, optional): The custom path. Defaults to "".
+        """
+        # Prepare the release dir
+        self._prepare_release_dir(custom_path)
+        release_dir = Path(os.path.expanduser(custom_path))
+        # The index points into the members of BGZF files, which only gzip exports are
+        ReleaseManifest(release_dir).remove("papers", "index")
+        offset_index = OffsetIndexBuilder() if self.compression == "gzip" else None
+        # Export both datasets line by line with the JSON backend
+        for dataset in ("papers", "authors"):
+            with self._open_export(custom_path, dataset, "jsonl") as export:
+                for record, line in self._iter_json_lines(dataset):
+                    shard, offset = export.write(record, line)
+                    if dataset == "papers" and offset_index is not None:
+                        offset_index.add(record["corpusid"], shard, offset)
+            # Index the papers by the offsets of the members they were compressed into
+            if dataset == "papers" and offset_index is not None:
+                blocks = [file.raw.blocks for file in export.files]  # type: ignore
+                save_index(offset_index.build(blocks), release_dir)
+
+    def to_parquet(self: T, custom_path: str = "") -> None:
+        """Export the data to parquet files with the schemas of `csinsights.data.schema`. The
+        records are written in row groups, so streams are never held in memory at once.
 
         Args:
             self (T): This object.
             custom_path (str, optional): The custom path. Defaults to "".
+
+        Raises:
+            ImportError: If pyarrow is not installed.
         """
+        if pq is None:
+            raise ImportError(
+                "The parquet export requires pyarrow. Install it with `poetry install -E parquet`."
+            )
         # Prepare the release dir
         self._prepare_release_dir(custom_path)
-        # Papers export
-        with gzip.open(
-            os.path.join(os.path.expanduser(custom_path), "papers.jsonl.gz"), "wb"
-        ) as fp:
-            json_writer = jsonlines.Writer(fp)  # type: ignore
-            json_writer.write_all(self.datasets["papers"])
-        # Authors export
-        with gzip.open(
-            os.path.join(os.path.expanduser(custom_path), "authors.jsonl.gz"), "wb"
-        ) as fp:
-            json_writer = jsonlines.Writer(fp)  # type: ignore
-            json_writer.write_all(self.datasets["authors"])
+        for dataset, schema in SCHEMAS.items():
+            arrow_schema = to_arrow_schema(schema)
+            with pq.ParquetWriter(
+                os.path.join(os.path.expanduser(custom_path), f"{dataset}.parquet"),
+                arrow_schema,
+                compression="zstd",
+            ) as writer:
+                for chunk in self._iter_chunks(self._get_dataset(dataset), PARQUET_ROW_GROUP_SIZE):
+                    try:
+                        table = pa.Table.from_pylist(chunk, schema=arrow_schema)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError):
+                        # Convert the values that don't match the schema
+                        table = pa.Table.from_pylist(
+                            [conform(record, schema) for record in chunk], schema=arrow_schema
+                        )
+                    writer.write_table(table)
 
     def to_csv(self: T, custom_path: str = "") -> None:
         """Export the data to a csv file.
@@ -237,21 +1183,64 @@ class SemanticScholarDataProcessor(LogMixin):
         """
         # Prepare the release dir
         self._prepare_release_dir(custom_path)
-        # Create dataframes
-        papers_df = pd.json_normalize(self.datasets["papers"])
-        authors_df = pd.json_normalize(self.datasets["authors"])
-        # Save to csv
-        papers_df.to_csv(
-            os.path.join(os.path.expanduser(custom_path), "papers.csv.gz"),
-            index=False,
-            sep="\t",
-            compression="gzip",
-            line_terminator="\r\n",
-        )
-        authors_df.to_csv(
-            os.path.join(os.path.expanduser(custom_path), "authors.csv.gz"),
-            index=False,
-            sep="\t",
-            compression="gzip",
-            line_terminator="\r\n",
-        )
+        # Write every dataset in chunks with the flat columns of its schema
+        for dataset in ("papers", "authors"):
+            self._write_csv(
+                self._get_dataset(dataset),
+                flatten_schema(SCHEMAS[dataset]),
+                self._open_export(custom_path, dataset, "csv", text=True),
+            )
+
+    def _write_csv(
+        self: T,
+        records: Iterable[dict],
+        columns: List[Tuple[str, Tuple[str, ...]]],
+        export: ShardedExport,
+    ) -> None:
+        """Export records to csv files in chunks. The columns are fixed by the schema so that
+        they don't depend on the records and only one chunk is held in memory at a time.
+
+        Args:
+            self (T): This object.
+            records (Iterable[dict]): The records to export.
+            columns (List[Tuple[str, Tuple[str, ...]]]): The columns from `flatten_schema`.
+            export (ShardedExport): The shards in text mode to write to. They are closed
+            afterwards.
+        """
+        with export:
+            # Every shard is a complete csv file with a header
+            writers = [
+                csv.writer(file, delimiter="\t", lineterminator="\r\n") for file in export.files
+            ]
+            for writer in writers:
+                writer.writerow([name for name, _ in columns])
+            for chunk in self._iter_chunks(records):
+                # Write the rows of a chunk at once per shard
+                rows: List[List[List[Any]]] = [[] for _ in writers]
+                for record in chunk:
+                    rows[export.index(record)].append(flatten_record(record, columns))
+                for writer, shard_rows in zip(writers, rows):
+                    writer.writerows(shard_rows)
+
+    def _iter_chunks(
+        self: T, records: Iterable[dict], chunk_size: int = CSV_CHUNK_SIZE
+    ) -> Iterator[List[dict]]:
+        """Split a stream of records into chunks.
+
+        Args:
+            self (T): This object.
+            records (Iterable[dict]): The records to split.
+            chunk_size (int, optional): The maximum number of records per chunk. Defaults to
+            `CSV_CHUNK_SIZE`.
+
+        Returns:
+            Iterator[List[dict]]: Lists of at most `chunk_size` records.
+        """
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
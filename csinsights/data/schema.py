@@ -0,0 +1,189 @@
+"""This module defines the schema of the released datasets. The schema is declared with plain
+python types so that it can be used without pyarrow (e.g., for the csv columns). Field types are
+either a type name, a dict of fields for nested records, or a list with the type of its items.
+"""
+from typing import Any, Dict, List, Tuple, Union
+
+from csinsights.data import jsonbackend
+
+try:
+    import pyarrow as pa  # type: ignore
+except ImportError:
+    pa = None  # type: ignore
+
+FieldType = Union[str, Dict[str, Any], List[Any]]
+
+PAPERS_SCHEMA: Dict[str, FieldType] = {
+    "corpusid": "int64",
+    "externalids": {
+        "ACL": "string",
+        "DBLP": "string",
+        "ArXiv": "string",
+        "MAG": "string",
+        "CorpusId": "string",
+        "PubMed": "string",
+        "PubMedCentral": "string",
+        "DOI": "string",
+    },
+    "url": "string",
+    "title": "string",
+    "authors": [{"authorId": "string", "name": "string"}],
+    "venue": "string",
+    "publicationvenueid": "string",
+    "year": "int32",
+    "referencecount": "int32",
+    "citationcount": "int32",
+    "influentialcitationcount": "int32",
+    "isopenaccess": "bool",
+    "s2fieldsofstudy": [{"category": "string", "source": "string"}],
+    "publicationtypes": ["string"],
+    "publicationdate": "string",
+    "journal": {"name": "string", "pages": "string", "volume": "string"},
+    "updated": "string",
+    # Joined from the abstracts
+    "abstract": "string",
+}
+
+AUTHORS_SCHEMA: Dict[str, FieldType] = {
+    "authorid": "string",
+    "externalids": {"DBLP": ["string"], "ORCID": "string"},
+    "name": "string",
+    "aliases": ["string"],
+    "affiliations": ["string"],
+    "homepage": "string",
+    "papercount": "int32",
+    "citationcount": "int32",
+    "hindex": "int32",
+    "updated": "string",
+    "s2url": "string",
+}
+
+SCHEMAS = {"papers": PAPERS_SCHEMA, "authors": AUTHORS_SCHEMA}
+
+# The fields that the other datasets join into papers. The other fields of their records (e.g.,
+# corpusid or updated) are fields of papers, which take precedence.
+JOINED_FIELDS: Dict[str, List[str]] = {
+    "abstracts": ["abstract", "openaccessinfo"],
+    "s2orc": ["content"],
+}
+
+
+def conform(value: Any, field_type: FieldType) -> Any:  # noqa: ANN401
+    """Convert a value to a field type. Unknown fields of records are dropped, missing fields
+    are set to None, and values that can't be converted become None.
+
+    Args:
+        value (Any): The value (e.g., a record).
+        field_type (FieldType): The type of the field (e.g., `PAPERS_SCHEMA`).
+
+    Returns:
+        Any: The converted value.
+    """
+    if value is None:
+        return None
+    if isinstance(field_type, dict):
+        if not isinstance(value, dict):
+            return None
+        return {key: conform(value.get(key), item_type) for key, item_type in field_type.items()}
+    if isinstance(field_type, list):
+        if not isinstance(value, list):
+            return None
+        return [conform(item, field_type[0]) for item in value]
+    if field_type == "string":
+        if isinstance(value, str):
+            return value
+        # Keep nested values readable instead of using their python representation
+        if isinstance(value, (dict, list)):
+            return jsonbackend.dumps(value).decode()
+        return str(value)
+    if field_type == "bool":
+        return bool(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_schema(
+    schema: Dict[str, FieldType], prefix: Tuple[str, ...] = ()
+) -> List[Tuple[str, Tuple[str, ...]]]:
+    """Get the flat columns of a schema. Nested records are split into a column per field that is
+    named by its path joined with dots (e.g., `externalids.DBLP`) like `pd.json_normalize` does.
+    Lists are kept in one column.
+
+    Args:
+        schema (Dict[str, FieldType]): The schema (e.g., `PAPERS_SCHEMA`).
+        prefix (Tuple[str, ...], optional): The path of the nested record. Defaults to ().
+
+    Returns:
+        List[Tuple[str, Tuple[str, ...]]]: The name and the path of every column in the order of
+        the schema.
+    """
+    columns = []
+    for name, field_type in schema.items():
+        path = prefix + (name,)
+        if isinstance(field_type, dict):
+            columns.extend(flatten_schema(field_type, path))
+        else:
+            columns.append((".".join(path), path))
+    return columns
+
+
+def flatten_record(record: dict, columns: List[Tuple[str, Tuple[str, ...]]]) -> List[Any]:
+    """Get the values of a record for flat columns. Missing values are None.
+
+    Args:
+        record (dict): The record.
+        columns (List[Tuple[str, Tuple[str, ...]]]): The columns from `flatten_schema`.
+
+    Returns:
+        List[Any]: The values in the order of the columns.
+    """
+    row = []
+    for _, path in columns:
+        value: Any = record
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        row.append(value)
+    return row
+
+
+def to_arrow_schema(schema: Dict[str, FieldType]) -> "pa.Schema":
+    """Convert a schema to an arrow schema.
+
+    Args:
+        schema (Dict[str, FieldType]): The schema (e.g., `PAPERS_SCHEMA`).
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+
+    Returns:
+        pa.Schema: The arrow schema with nested fields as structs and lists.
+    """
+    if pa is None:
+        raise ImportError(
+            "The arrow schema requires pyarrow. Install it with `poetry install -E parquet`."
+        )
+    return pa.schema([(name, _to_arrow_type(field_type)) for name, field_type in schema.items()])
+
+
+def _to_arrow_type(field_type: FieldType) -> "pa.DataType":
+    """Convert a field type to an arrow type.
+
+    Args:
+        field_type (FieldType): The type of the field.
+
+    Returns:
+        pa.DataType: The arrow type.
+    """
+    if isinstance(field_type, dict):
+        return pa.struct([(name, _to_arrow_type(item)) for name, item in field_type.items()])
+    if isinstance(field_type, list):
+        return pa.list_(_to_arrow_type(field_type[0]))
+    arrow_types = {
+        "string": pa.string(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "bool": pa.bool_(),
+    }
+    return arrow_types[field_type]
@@ -0,0 +1,180 @@
+"""This module implements external-memory sorting of records that spills sorted runs to disk."""
+import gzip
+import heapq
+import os
+import sys
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterator, List, Tuple, TypeVar
+
+from csinsights.log import LogMixin
+
+B = TypeVar("B", bound="MemoryBudget")
+T = TypeVar("T", bound="ExternalSorter")
+
+# Maximum number of runs per sorter before they are merged into one to limit open files
+MAX_RUNS = 64
+
+# Approximate memory overhead of a buffered (key, record) tuple next to the record bytes
+ENTRY_OVERHEAD = 100
+
+
+class MemoryBudget(object):
+    """A memory budget that is shared by multiple sorters. When the records buffered by all
+    sorters exceed the budget, the largest buffers are spilled to disk until it fits again.
+
+    Args:
+        object (Any): Just the default python object.
+    """
+
+    def __init__(self: B, max_memory: int) -> None:
+        """Constructor of the MemoryBudget.
+
+        Args:
+            self (B): This object.
+            max_memory (int): The maximum number of bytes that can be buffered in memory.
+        """
+        self.max_memory = max_memory
+        self.used = 0
+        self.sorters: List["ExternalSorter"] = []
+
+    def reserve(self: B, size: int) -> None:
+        """Account for newly buffered bytes and spill buffers if the budget is exceeded.
+
+        Args:
+            self (B): This object.
+            size (int): The number of newly buffered bytes.
+        """
+        self.used += size
+        while self.used > self.max_memory:
+            largest = max(self.sorters, key=lambda sorter: sorter.buffered)
+            if not largest.buffered:
+                break
+            largest.spill()
+
+
+class ExternalSorter(LogMixin):
+    """Sorts (key, record) pairs by key. Records are buffered in memory and written to sorted
+    runs on disk when the memory budget is exceeded. Iterating k-way merges all runs.
+
+    Args:
+        LogMixin (Any): A shared log mixin class.
+    """
+
+    def __init__(self: T, name: str, spill_dir: Path, budget: MemoryBudget) -> None:
+        """Constructor of the ExternalSorter.
+
+        Args:
+            self (T): This object.
+            name (str): The name of the sorted dataset. Used to name the runs.
+            spill_dir (Path): The directory to write the runs to.
+            budget (MemoryBudget): The memory budget shared with other sorters.
+        """
+        self.name = name
+        self.spill_dir = spill_dir
+        self.budget = budget
+        self.budget.sorters.append(self)
+        self.buffer: List[Tuple[int, bytes]] = []
+        self.buffered = 0
+        self.runs: List[Path] = []
+        self.run_counter = 0
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def add(self: T, key: int, record: bytes) -> None:
+        """Add a serialized record.
+
+        Args:
+            self (T): This object.
+            key (int): The key to sort by (e.g., the corpusid).
+            record (bytes): The serialized record without a trailing newline.
+        """
+        size = sys.getsizeof(record) + ENTRY_OVERHEAD
+        self.buffer.append((key, record))
+        self.buffered += size
+        self.budget.reserve(size)
+
+    def spill(self: T) -> None:
+        """Sort the buffered records and write them to a new run on disk.
+
+        Args:
+            self (T): This object.
+        """
+        self.logger.debug(f"Spilling {len(self.buffer)} records of {self.name}")
+        self.buffer.sort(key=itemgetter(0))
+        self.runs.append(self._write_run(iter(self.buffer)))
+        self.budget.used -= self.buffered
+        self.buffer = []
+        self.buffered = 0
+        # Merge all runs into one if there are too many to merge them at once later
+        if len(self.runs) >= MAX_RUNS:
+            self.logger.debug(f"Merging {len(self.runs)} runs of {self.name}")
+            runs, self.runs = self.runs, []
+            self.runs.append(self._write_run(self._merge_runs(runs)))
+            for run_path in runs:
+                run_path.unlink()
+
+    def _write_run(self: T, records: Iterator[Tuple[int, bytes]]) -> Path:
+        """Write sorted records to a new run on disk.
+
+        Args:
+            self (T): This object.
+            records (Iterator[Tuple[int, bytes]]): The sorted records.
+
+        Returns:
+            Path: The path to the run.
+        """
+        run_path = self.spill_dir / f"{self.name}_{self.run_counter}.run.gz"
+        self.run_counter += 1
+        # Runs are read back soon, so fast compression is preferred over small files
+        with gzip.open(run_path, "wb", compresslevel=1) as f:
+            for key, record in records:
+                f.write(b"%d\t%s\n" % (key, record))
+        return run_path
+
+    def _merge_runs(
+        self: T, runs: List[Path], *sorted_records: Iterator[Tuple[int, bytes]]
+    ) -> Iterator[Tuple[int, bytes]]:
+        """K-way merge runs and other sorted records.
+
+        Args:
+            self (T): This object.
+            runs (List[Path]): The paths to the runs.
+            sorted_records (Iterator[Tuple[int, bytes]]): Other sorted records to merge.
+
+        Returns:
+            Iterator[Tuple[int, bytes]]: The merged records sorted by key.
+        """
+        files = [gzip.open(run_path, "rb") for run_path in runs]
+        try:
+            yield from heapq.merge(
+                *[self._iter_run(f) for f in files], *sorted_records, key=itemgetter(0)
+            )
+        finally:
+            for f in files:
+                f.close()
+
+    def __iter__(self: T) -> Iterator[Tuple[int, bytes]]:
+        """Iterate over all records sorted by key.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            Iterator[Tuple[int, bytes]]: The key and the serialized record.
+        """
+        self.buffer.sort(key=itemgetter(0))
+        return self._merge_runs(self.runs, iter(self.buffer))
+
+    def _iter_run(self: T, f: gzip.GzipFile) -> Iterator[Tuple[int, bytes]]:
+        """Iterate over the records of a sorted run.
+
+        Args:
+            self (T): This object.
+            f (gzip.GzipFile): The opened run.
+
+        Returns:
+            Iterator[Tuple[int, bytes]]: The key and the serialized record.
+        """
+        for line in f:
+            key, _, record = line.rstrip(b"\n").partition(b"\t")
+            yield int(key), record
@@ -12,6 +12,7 @@ import click
 from csinsights.client import SemanticScholarClient
 from csinsights.data.s2processor import SemanticScholarDataProcessor
 from csinsights.log import set_glob_logger
+from csinsights.stages import STAGES, StageCheckpoints
 from csinsights.types import AccessType
 
 default_cache_dir = None
@@ -41,6 +42,99 @@ def filter_options(function: Callable) -> Callable:
         default=default_cache_dir,
         help="Where to cache downloads. Default is ~/.cache/csinsights.",
     )(function)
+    function = click.option(
+        "--workers",
+        is_flag=False,
+        type=int,
+        default=1,
+        help="The number of processes to read and filter shards with. Default is 1.",
+    )(function)
+    function = click.option(
+        "--download_workers",
+        is_flag=False,
+        type=int,
+        default=1,
+        help="The number of files to download concurrently. Default is 1.",
+    )(function)
+    function = click.option(
+        "--max_memory",
+        is_flag=False,
+        type=int,
+        default=None,
+        help=(
+            "Memory budget in MB for joining the datasets. If set, the datasets are sorted and"
+            " joined on disk and spilled to cache_dir when the budget is exceeded. Default is None."
+        ),
+    )(function)
+
+    # Pipeline options
+    function = click.option(
+        "--resume",
+        is_flag=True,
+        help=(
+            "Whether to continue after the last stage that completed for the latest release with"
+            " the same options, e.g., after a crash or timeout. Default is False."
+        ),
+    )(function)
+    function = click.option(
+        "--from_stage",
+        is_flag=False,
+        type=click.Choice(STAGES),
+        default=None,
+        help=(
+            "The first stage to run (download, process, export, clean). The stage before it has"
+            " to be completed with the same options. Default is download."
+        ),
+    )(function)
+    function = click.option(
+        "--to_stage",
+        is_flag=False,
+        type=click.Choice(STAGES),
+        default=None,
+        help="The last stage to run (download, process, export, clean). Default is clean.",
+    )(function)
+
+    function = click.option(
+        "--parquet",
+        is_flag=True,
+        help=(
+            "Whether to also export the release as parquet files. Requires the parquet extra"
+            " (pyarrow). Default is False."
+        ),
+    )(function)
+    function = click.option(
+        "--compression",
+        is_flag=False,
+        type=click.Choice(["gzip", "zstd"]),
+        default="gzip",
+        help=(
+            "The compression of the jsonl and csv exports. gzip files are compressed on all cores"
+            " and stay readable by any gzip reader. zstd requires zstandard. Default is gzip."
+        ),
+    )(function)
+    function = click.option(
+        "--compression_level",
+        is_flag=False,
+        type=int,
+        default=None,
+        help=(
+            "The compression level of the exports (1-9 for gzip, 1-22 for zstd). Lower levels are"
+            " faster but larger. Default is 6 for gzip and 3 for zstd."
+        ),
+    )(function)
+
+    function = click.option(
+        "--release_shards",
+        is_flag=False,
+        type=click.IntRange(min=1),
+        default=1,
+        help=(
+            "The number of shards to split the jsonl and csv exports of every dataset into. Records"
+            " are partitioned by the crc32 of their corpusid (authorid for authors) and all files"
+            " are listed with their row counts, sizes, and MD5 hashes in manifest.json. Default is"
+            " 1."
+        ),
+    )(function)
 
     # DBLP options
     function = click.option(
@@ -57,6 +151,17 @@ def filter_options(function: Callable) -> Callable:
         default={AccessType.OPEN},
         help="Filters DBLP with the specified access type (OPEN, CLOSED, ALL). Default is OPEN.",
     )(function)
+    function = click.option(
+        "--dblp_record_types",
+        is_flag=False,
+        type=str,
+        multiple=True,
+        default=None,
+        help=(
+            "The DBLP record types to load (e.g., article, inproceedings). Can be given multiple"
+            " times. Default is all types."
+        ),
+    )(function)
     function = click.option(
         "--dblp_use_filters",
         is_flag=True,
@@ -149,6 +254,32 @@ def filter_options(function: Callable) -> Callable:
             " with other filters as union. Default is False."
         ),
     )(function)
+    function = click.option(
+        "--s2_previous_release",
+        is_flag=False,
+        type=str,
+        default=None,
+        help=(
+            "The release version of a previous release in ~/d3-releases. If set, only the diffs"
+            " since this release are downloaded and applied to it. Default is None."
+        ),
+    )(function)
+    function = click.option(
+        "--s2_filter_on_download",
+        is_flag=True,
+        help=(
+            "Whether to apply the filters while downloading so that only the matching records are"
+            " stored in cache_dir. Default is False."
+        ),
+    )(function)
+    function = click.option(
+        "--s2_streaming",
+        is_flag=True,
+        help=(
+            "Whether to stream the datasets from the shards to the exports instead of loading them"
+            " into memory. Only the filtered papers are kept in memory. Default is False."
+        ),
+    )(function)
 
     return function
 
@@ -170,16 +301,72 @@ def main(**kwargs: Union[str, int, bool, datetime, AccessType]) -> None:
     ), "Please set the S2_API_KEY environment variable if you want to use SemanticScholar."
     # Get cache_dir
     cache_dir = Path(str(kwargs.pop("cache_dir")))
+    resume = bool(kwargs.pop("resume", False))
+    from_stage = kwargs.pop("from_stage", None)
+    to_stage = kwargs.pop("to_stage", None)
     # Create client
     s2client = SemanticScholarClient(cache_dir=cache_dir, api_key=api_key, **kwargs)  # type: ignore
-    # Get latest timestamp of backend and update
-    release_version = s2client.download_release(api_key=api_key, **kwargs)  # type: ignore
+    # Get the latest release, which all stages of this run are for
+    release_version = s2client.fetch_latest_release_version()
+    # Get the previous release to update incrementally
+    previous_release = kwargs.get("s2_previous_release")
+    # The previous release is the latest one, so there is nothing to update or export
+    if previous_release and previous_release == release_version:
+        s2client.logger.info(f"Release {release_version} is already the latest release.")
+        return
+    # Select the stages to run from the completion markers of the release in the cache directory
+    checkpoints = StageCheckpoints(cache_dir, kwargs, release_version)
+    stages = checkpoints.select_stages(
+        str(from_stage) if from_stage else None, str(to_stage) if to_stage else None, resume
+    )
+    # All selected stages completed already
+    if not stages:
+        return
+    kwargs.pop("s2_previous_release", None)
     # Create SemanticScholar data processor
     s2processor = SemanticScholarDataProcessor(cache_dir=cache_dir, **kwargs)  # type: ignore
-    # Process data
-    dataset = s2processor.process_data(cache_dir=cache_dir, **kwargs)  # type: ignore
-    # Store data
-    dataset.to_jsonl(f"~/d3-releases/{release_version}/")
-    dataset.to_csv(f"~/d3-releases/{release_version}")
-    # Clean cache
-    s2processor.clean_cache()
+    dataset = None
+    if "download" in stages:
+        if previous_release:
+            # Get the diffs since the previous release
+            s2client.download_diffs(
+                str(previous_release), release_version, api_key=api_key, **kwargs  # type: ignore
+            )
+        else:
+            # Get latest timestamp of backend and update
+            s2client.download_release(release_version, api_key=api_key, **kwargs)  # type: ignore
+        checkpoints.complete("download")
+    checkpoint_dir = checkpoints.get_release_dir()
+    if "process" in stages:
+        if previous_release:
+            # Apply the diffs to the previous release
+            dataset = s2processor.process_diffs(
+                f"~/d3-releases/{previous_release}/",
+                str(previous_release),
+                release_version,
+                **kwargs,  # type: ignore
+            )
+        else:
+            # Process data
+            dataset = s2processor.process_data(cache_dir=cache_dir, **kwargs)  # type: ignore
+        # Persist the processed data so that the export can be rerun without processing it. The
+        # export of this run reads from the checkpoint as well
+        dataset.save_checkpoint(checkpoint_dir)
+        checkpoints.complete("process")
+    if "export" in stages:
+        # Load the processed data if it was processed by a previous run
+        if dataset is None:
+            dataset = s2processor.load_checkpoint(checkpoint_dir)
+        # Store data
+        dataset.to_jsonl(f"~/d3-releases/{release_version}/")
+        dataset.to_csv(f"~/d3-releases/{release_version}")
+        if kwargs["parquet"]:
+            dataset.to_parquet(f"~/d3-releases/{release_version}")
+        checkpoints.complete("export")
+    if "clean" in stages:
+        # Clean cache and the intermediate output of the stages
+        s2processor.clean_cache()
+        checkpoints.clean()
+        checkpoints.complete("clean")
+        # The downloaded files are gone, so they have to be downloaded again before processing
+        checkpoints.invalidate("download")
@@ -0,0 +1,233 @@
+"""This module implements the checkpoints of the stages of the pipeline in `process.main`. A stage
+writes a completion marker under the cache directory when it finished. The markers are keyed by
+the release version and the hash of the options that change the output of the stages, so that an
+interrupted run can continue after the last stage that completed and a new release runs all stages.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TypeVar
+
+from csinsights.log import LogMixin
+
+# The stages of the pipeline in the order they run
+STAGES = ("download", "process", "export", "clean")
+
+# Options that don't change the output of any stage
+RUNTIME_OPTIONS = {
+    "verbose",
+    "cache_dir",
+    "workers",
+    "download_workers",
+    "max_memory",
+    "s2_streaming",
+    "resume",
+    "from_stage",
+    "to_stage",
+}
+
+# Options that only change the output of the export
+EXPORT_OPTIONS = {"parquet", "compression", "compression_level", "release_shards"}
+
+T = TypeVar("T", bound="StageCheckpoints")
+
+
+def get_options_hash(options: Dict[str, Any]) -> str:
+    """Get a stable hash of options.
+
+    Args:
+        options (Dict[str, Any]): The options (e.g., the command line arguments).
+
+    Returns:
+        str: The SHA1 hash of the options in hex format.
+    """
+    # Sets have no stable order, so they are sorted
+    normalized = {
+        key: sorted(map(str, value)) if isinstance(value, (set, frozenset)) else value
+        for key, value in options.items()
+    }
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class StageCheckpoints(LogMixin):
+    """The completion markers of the stages of a pipeline run.
+
+    Args:
+        LogMixin (Any): A shared log mixin class.
+    """
+
+    def __init__(self: T, cache_dir: Path, options: Dict[str, Any], release_version: str) -> None:
+        """Constructor of the StageCheckpoints.
+
+        Args:
+            self (T): This object.
+            cache_dir (Path): The cache directory to store the checkpoints in.
+            options (Dict[str, Any]): The options of the run (e.g., the command line arguments).
+            release_version (str): The release version the stages run for.
+        """
+        data_options = {
+            key: value
+            for key, value in options.items()
+            if key not in RUNTIME_OPTIONS and key not in EXPORT_OPTIONS
+        }
+        export_options = {key: value for key, value in options.items() if key in EXPORT_OPTIONS}
+        self.options_hash = get_options_hash(data_options)
+        # Changing only the export options reruns only the export
+        self.export_hash = get_options_hash({**data_options, **export_options})
+        self.release_version = release_version
+        # The checkpoints of all releases processed with these options
+        self.options_dir = cache_dir / "stages" / self.options_hash
+        self.checkpoint_dir = self.options_dir / release_version
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def get_release_dir(self: T) -> Path:
+        """Get the directory for the intermediate output of the stages of the release.
+
+        Args:
+            self (T): This object.
+
+        Returns:
+            Path: The directory.
+        """
+        return self.checkpoint_dir / "output"
+
+    def get_marker(self: T, stage: str) -> Optional[Dict[str, str]]:
+        """Get the completion marker of a stage.
+
+        Args:
+            self (T): This object.
+            stage (str): The name of the stage.
+
+        Returns:
+            Optional[Dict[str, str]]: The release version and the options hash of the completed
+            stage, or None if it did not complete for the release with the current options.
+        """
+        marker_path = self._get_marker_path(stage)
+        if not marker_path.is_file():
+            return None
+        with open(marker_path, "r") as f:
+            marker: Dict[str, str] = json.load(f)
+        if (
+            marker.get("options") != self._get_stage_hash(stage)
+            or marker.get("release_version") != self.release_version
+        ):
+            return None
+        return marker
+
+    def complete(self: T, stage: str) -> None:
+        """Mark a stage as completed for the release. The markers of all later stages are removed,
+        as their output is stale now.
+
+        Args:
+            self (T): This object.
+            stage (str): The name of the stage.
+        """
+        marker_path = self._get_marker_path(stage)
+        # Write to a temporary file first so that a marker is never left half written
+        tmp_path = Path(f"{marker_path}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"release_version": self.release_version, "options": self._get_stage_hash(stage)},
+                f,
+            )
+        os.replace(tmp_path, marker_path)
+        later_stages = STAGES.index(stage) + 1
+        for later_stage in STAGES[later_stages:]:
+            self.invalidate(later_stage)
+        self.logger.debug(f"Completed stage {stage} of release {self.release_version}")
+
+    def invalidate(self: T, stage: str) -> None:
+        """Remove the completion marker of a stage.
+
+        Args:
+            self (T): This object.
+            stage (str): The name of the stage.
+        """
+        self._get_marker_path(stage).unlink(missing_ok=True)
+
+    def clean(self: T) -> None:
+        """Remove the intermediate output of the stages of the release and the checkpoints of all
+        previous releases. The completion marker of the process stage is removed as well, as the
+        export can't continue from its output anymore.
+
+        Args:
+            self (T): This object.
+        """
+        for checkpoint_dir in self.options_dir.iterdir():
+            if checkpoint_dir != self.checkpoint_dir:
+                shutil.rmtree(checkpoint_dir)
+        shutil.rmtree(self.get_release_dir(), ignore_errors=True)
+        self.invalidate("process")
+        self.logger.debug(f"Removed the intermediate output in {self.options_dir}")
+
+    def select_stages(
+        self: T,
+        from_stage: Optional[str] = None,
+        to_stage: Optional[str] = None,
+        resume: bool = False,
+    ) -> List[str]:
+        """Select the stages to run for the release.
+
+        Args:
+            self (T): This object.
+            from_stage (Optional[str], optional): The first stage to run. Defaults to None which
+            starts with the first stage.
+            to_stage (Optional[str], optional): The last stage to run. Defaults to None which ends
+            with the last stage.
+            resume (bool, optional): Whether to skip the selected stages up to the last one that
+            completed for the release. Defaults to False.
+
+        Raises:
+            ValueError: If the stage before the first selected stage did not complete.
+
+        Returns:
+            List[str]: The stages to run in order.
+        """
+        start = STAGES.index(from_stage or STAGES[0])
+        end = STAGES.index(to_stage or STAGES[-1])
+        if resume:
+            # Continue after the last stage that completed
+            for index in range(end, start - 1, -1):
+                if self.get_marker(STAGES[index]) is not None:
+                    self.logger.debug(f"Resuming after completed stage {STAGES[index]}")
+                    start = index + 1
+                    break
+        # The stop of the slice is exclusive
+        stop = end + 1
+        stages = list(STAGES[start:stop])
+        # The stages after the first one continue from the output of the stage before
+        if 0 < start <= end and self.get_marker(STAGES[start - 1]) is None:
+            raise ValueError(
+                f"The stage {STAGES[start - 1]} did not complete for release"
+                f" {self.release_version} with these options. Run it first, e.g., with"
+                f" --from_stage {STAGES[start - 1]}."
+            )
+        return stages
+
+    def _get_marker_path(self: T, stage: str) -> Path:
+        """Get the path to the completion marker of a stage.
+
+        Args:
+            self (T): This object.
+            stage (str): The name of the stage.
+
+        Returns:
+            Path: The path to the marker.
+        """
+        return self.checkpoint_dir / f"{stage}.done"
+
+    def _get_stage_hash(self: T, stage: str) -> str:
+        """Get the hash of the options that change the output of a stage.
+
+        Args:
+            self (T): This object.
+            stage (str): The name of the stage.
+
+        Returns:
+            str: The hash of the options.
+        """
+        if STAGES.index(stage) >= STAGES.index("export"):
+            return self.export_hash
+        return self.options_hash
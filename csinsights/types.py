@@ -29,6 +29,14 @@ class AccessType(str, Enum):
     ALL = "all"
 
 
+class ChangeType(str, Enum):
+    """The change of a record between two releases."""
+
+    ADDED = "added"
+    CHANGED = "changed"
+    DELETED = "deleted"
+
+
 class ExtractorType(str, Enum):
     """The type of Extractor."""
 
@@ -68,8 +76,6 @@ Url = str
 
 DatasetJsonDict = Dict[str, List[Dict[str, Any]]]
 
-FilterFunction = Callable[[DatasetJsonDict], DatasetJsonDict]
-
 PdfExtractionFn = Callable[
     [
         ValidGrobidServices,
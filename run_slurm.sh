@@ -9,4 +9,4 @@ source ~/.bashrc
 conda activate nlp
 
 poetry install
-poetry run cli main --s2_use_papers --s2_use_abstracts --s2_use_authors --s2_filter_dblp
\ No newline at end of file
+poetry run cli main --s2_use_papers --s2_use_abstracts --s2_use_authors --s2_filter_dblp --s2_streaming --workers 16 --download_workers 8
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""Helpers of the tests: writing shards and a local stand-in for the S2 datasets API."""
+import gzip
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TypeVar, Union
+
+S = TypeVar("S", bound="S2StandIn")
+H = TypeVar("H", bound="S2Handler")
+
+# Sample shards with null ids, several ids per line, and odd whitespace
+FIXTURES = Path(__file__).parent / "fixtures" / "s2"
+
+# A sample DBLP release with the entities of its DTD, nested markup, and every kind of edition
+DBLP_FIXTURES = Path(__file__).parent / "fixtures" / "dblp"
+
+
+def write_jsonl_gz(path: Path, records: Iterable[Union[dict, str]]) -> Path:
+    """Write records to a .jsonl.gz file.
+
+    Args:
+        path (Path): The path to the file.
+        records (Iterable[Union[dict, str]]): The records. Strings are written as they are, so
+        that raw lines (e.g., with odd whitespace) can be tested.
+
+    Returns:
+        Path: The path to the file.
+    """
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(record if isinstance(record, str) else json.dumps(record))
+            f.write("\n")
+    return path
+
+
+def read_jsonl_gz(path: Path) -> List[dict]:
+    """Read all records of a .jsonl.gz file.
+
+    Args:
+        path (Path): The path to the file.
+
+    Returns:
+        List[dict]: The records.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def write_sample_shards(directory: Path) -> Path:
+    """Write the sample shards into a directory as gzip shards like the ones S2 serves.
+
+    Args:
+        directory (Path): The directory to write the shards to.
+
+    Returns:
+        Path: The directory.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in FIXTURES.glob("*.jsonl"):
+        lines = path.read_text().splitlines()
+        # Papers are joined by their corpus id, which every paper of a release has
+        if path.name.startswith("papers"):
+            lines = [line for line in lines if '"corpusid": null' not in line]
+        write_jsonl_gz(directory / f"{path.name}.gz", lines)
+    return directory
+
+
+def s2_options(**overrides: Any) -> Dict[str, Any]:  # noqa: ANN401
+    """Get the S2 options of the command line with their defaults.
+
+    Args:
+        **overrides (Any): The options to change.
+
+    Returns:
+        Dict[str, Any]: The options.
+    """
+    options: Dict[str, Any] = {
+        f"s2_use_{dataset}": False
+        for dataset in ("papers", "abstracts", "authors", "citations", "embeddings", "s2orc")
+    }
+    options["s2_use_tldrs"] = False
+    for name in ("acl", "dblp", "pubmed", "pubmedcentral", "arxiv"):
+        options[f"s2_filter_{name}"] = False
+    options["s2_filter_on_download"] = False
+    options.update(overrides)
+    return options
+
+
+class S2Handler(BaseHTTPRequestHandler):
+    """Answers the requests of the S2 client like the S2 datasets API.
+
+    Args:
+        BaseHTTPRequestHandler (Any): The handler of the http server.
+    """
+
+    server: "S2StandIn"
+
+    def log_message(self: H, format: str, *args: Any) -> None:  # noqa: ANN401
+        """Don't log the requests.
+
+        Args:
+            self (H): This object.
+            format (str): The format of the message.
+            *args (Any): The arguments of the message.
+        """
+
+    def do_GET(self: H) -> None:  # noqa: N802
+        """Answer a GET request.
+
+        Args:
+            self (H): This object.
+        """
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        base_url = self.server.base_url
+        if self.path == "/release/":
+            return self._send_json(self.server.releases)
+        match = re.match(r"^/release/([^/]+)/dataset/([^/]+)/$", self.path)
+        if match:
+            names = sorted(path.name for path in self.server.directory.glob(f"{match[2]}_*"))
+            return self._send_json({"files": [f"{base_url}files/{name}" for name in names]})
+        match = re.match(r"^/diffs/([^/]+)/to/([^/]+)/([^/]+)$", self.path)
+        if match:
+            diffs = [
+                {
+                    "from_release": diff["from_release"],
+                    "to_release": diff["to_release"],
+                    "update_files": [
+                        f"{base_url}files/{name}" for name in diff["update"].get(match[3], [])
+                    ],
+                    "delete_files": [
+                        f"{base_url}files/{name}" for name in diff["delete"].get(match[3], [])
+                    ],
+                }
+                for diff in self.server.diffs
+            ]
+            return self._send_json({"dataset": match[3], "diffs": diffs})
+        match = re.match(r"^/files/(.+)$", self.path)
+        if not match or not (self.server.directory / match[1]).is_file():
+            return self.send_error(404)
+        name = match[1]
+        data = (self.server.directory / name).read_bytes()
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        # Serve the remainder of the file for a Range request like a file server, unless the
+        # request is conditional on another version of the file
+        match = re.match(r"^bytes=(\d+)-$", self.headers.get("Range") or "")
+        start = int(match[1]) if match else 0
+        if self.headers.get("If-Range", etag) != etag:
+            start = 0
+        if start >= len(data) > 0:
+            self.send_response(416)
+            self.end_headers()
+            return None
+        self.send_response(206 if start else 200)
+        self.send_header("content-length", str(len(data) - start))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        # Close the connection early to interrupt the download of a file
+        end = self.server.interrupt.get(name, len(data))
+        self.close_connection = end < len(data)
+        self.wfile.write(data[start:end])
+        return None
+
+    def _send_json(self: H, obj: Any) -> None:  # noqa: ANN401
+        """Send a json response.
+
+        Args:
+            self (H): This object.
+            obj (Any): The object to send.
+        """
+        data = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class S2StandIn(ThreadingHTTPServer):
+    """A local stand-in for the S2 datasets API that serves the shards in a directory. It lists
+    the releases, the files of a dataset (`{dataset}_*` files), the diffs between releases, and
+    serves the files with ETags and support for (conditional) Range requests.
+
+    Args:
+        ThreadingHTTPServer (Any): A http server that answers every request in a thread.
+    """
+
+    def __init__(self: S, directory: Path, releases: Optional[List[str]] = None) -> None:
+        """Constructor of the S2StandIn. Listens on a free local port.
+
+        Args:
+            self (S): This object.
+            directory (Path): The directory with the files to serve.
+            releases (Optional[List[str]], optional): The release versions. Defaults to None which
+            lists three releases, of which `2022-09-27` is the latest complete one.
+        """
+        super().__init__(("127.0.0.1", 0), S2Handler)
+        self.directory = directory
+        self.releases = releases or ["2022-10-11", "2022-09-27", "2022-09-13"]
+        # The diffs with the names of their update and delete files by dataset
+        self.diffs: List[Dict[str, Any]] = []
+        # The path and the Range header of every request
+        self.requests: List[Tuple[str, Optional[str]]] = []
+        # The number of bytes after which the download of a file is interrupted by its name
+        self.interrupt: Dict[str, int] = {}
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def __enter__(self: S) -> S:
+        """Start serving in a background thread.
+
+        Args:
+            self (S): This object.
+
+        Returns:
+            S: This object.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self: S, *args: Any) -> None:  # noqa: ANN401
+        """Stop serving.
+
+        Args:
+            self (S): This object.
+            *args (Any): The error, if any.
+        """
+        self.shutdown()
+        self.server_close()
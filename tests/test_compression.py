@@ -0,0 +1,210 @@
+"""Tests of the compression layer: reading plain gzip and BGZF files on a background thread and
+on multiple threads has to give the same data as the gzip module, with every zlib implementation,
+and the files written on multiple threads have to be readable by any reader.
+"""
+import gzip
+import io
+import random
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+from csinsights.data import compression
+from csinsights.data.compression import (
+    BGZF_EOF,
+    ParallelGzipWriter,
+    deflate_bgzf,
+    inflate_bgzf,
+    inflate_member,
+    is_bgzf,
+    open_compressed,
+    open_gzip,
+    open_writer,
+)
+
+BACKENDS = {
+    "zlib": compression.zlib,
+    "zlib-ng": compression.zlib_ng,
+    "isal": compression.isal_zlib,
+}
+
+
+def create_data(size: int, seed: int = 0) -> bytes:
+    """Create json lines that compress like the lines of a shard.
+
+    Args:
+        size (int): The number of bytes to create at least.
+        seed (int, optional): The seed of the random lines. Defaults to 0.
+
+    Returns:
+        bytes: The lines.
+    """
+    rng = random.Random(seed)
+    lines = []
+    written = 0
+    while written < size:
+        line = f'{{"corpusid": {written}, "title": "{rng.random()}"}}\n'.encode()
+        lines.append(line)
+        written += len(line)
+    return b"".join(lines)
+
+
+@pytest.fixture(params=list(BACKENDS), autouse=True)
+def zlib_backend(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> ModuleType:
+    """Inflate with every installed zlib implementation.
+
+    Args:
+        request (pytest.FixtureRequest): The request with the name of the implementation.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+
+    Returns:
+        ModuleType: The implementation.
+    """
+    backend = BACKENDS[request.param]
+    if backend is None:
+        pytest.skip(f"{request.param} is not installed")
+    monkeypatch.setattr(compression, "zlib_backend", backend)
+    return backend
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_open_gzip_reads_plain_gzip(tmp_path: Path, threads: int) -> None:
+    """Gzip files with several members are read from a path and from a file object.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        threads (int): The number of threads to inflate with.
+    """
+    data = create_data(3 * 10**5)
+    path = tmp_path / "shard.jsonl.gz"
+    path.write_bytes(gzip.compress(data[:1000]) + gzip.compress(data[1000:]))
+    with open_gzip(path, threads) as f:
+        assert f.read() == data
+    with open(path, "rb") as fileobj:
+        with open_gzip(fileobj, threads) as f:
+            assert list(f) == data.splitlines(keepends=True)
+        # The file object belongs to the caller
+        assert not fileobj.closed
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_open_gzip_inflates_bgzf(tmp_path: Path, threads: int) -> None:
+    """BGZF files are inflated in the order of their members, including a plain gzip member that
+    another tool appended.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        threads (int): The number of threads to inflate with.
+    """
+    data = create_data(3 * compression.BGZF_BATCH_SIZE)
+    bgzf = deflate_bgzf(data, 6) + BGZF_EOF
+    assert is_bgzf(bgzf) and not is_bgzf(gzip.compress(data))
+    assert b"".join(inflate_bgzf(io.BytesIO(bgzf), threads)) == data
+    path = tmp_path / "papers.jsonl.gz"
+    path.write_bytes(bgzf + gzip.compress(b"appended\n"))
+    with open_gzip(path, threads) as f:
+        assert f.read() == data + b"appended\n"
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_open_gzip_raises_on_truncated_files(tmp_path: Path, threads: int) -> None:
+    """A file that ends within a member raises an error instead of ending early.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        threads (int): The number of threads to inflate with.
+    """
+    data = create_data(10**5)
+    for name, compressed in (("plain", gzip.compress(data)), ("bgzf", deflate_bgzf(data, 6))):
+        path = tmp_path / f"{name}.jsonl.gz"
+        path.write_bytes(compressed[:-100])
+        with open_gzip(path, threads) as f:
+            with pytest.raises(EOFError):
+                f.read()
+
+
+def test_closing_the_reader_stops_inflating(tmp_path: Path) -> None:
+    """Closing a file that was not read to the end stops the background thread.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    path = tmp_path / "papers.jsonl.gz"
+    path.write_bytes(deflate_bgzf(create_data(4 * compression.BGZF_BATCH_SIZE), 1) + BGZF_EOF)
+    f = open_gzip(path, 2)
+    assert f.readline().startswith(b'{"corpusid": 0')
+    f.close()
+    assert not f.raw.thread.is_alive()  # type: ignore
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_open_writer_writes_bgzf(tmp_path: Path, threads: int) -> None:
+    """Writes of any size are compressed into BGZF members that the gzip module reads.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        threads (int): The number of threads to deflate with.
+    """
+    data = create_data(3 * compression.BGZF_BATCH_SIZE)
+    path = tmp_path / "papers.jsonl.gz"
+    with open_writer(path, level=1, threads=threads) as f:
+        for start, end in ((0, 10), (10, 100000), (100000, 2 * 10**6), (2 * 10**6, len(data))):
+            f.write(data[start:end])
+    compressed = path.read_bytes()
+    assert is_bgzf(compressed) and compressed.endswith(BGZF_EOF)
+    assert gzip.decompress(compressed) == data
+    with open_compressed(path, threads) as f:
+        assert f.read() == data
+    # Nothing but the end of the file is written for empty files
+    with open_writer(tmp_path / "empty.jsonl.gz", threads=threads):
+        pass
+    assert (tmp_path / "empty.jsonl.gz").read_bytes() == BGZF_EOF
+
+
+def test_parallel_gzip_writer_records_the_members(tmp_path: Path) -> None:
+    """Every member recorded in `blocks` starts at its offset and holds the data at its
+    uncompressed offset.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    data = create_data(2 * compression.BGZF_BATCH_SIZE)
+    path = tmp_path / "papers.jsonl.gz"
+    writer = ParallelGzipWriter(open(path, "wb"), level=1, threads=2)
+    with io.BufferedWriter(writer, compression.BGZF_BATCH_SIZE) as f:  # type: ignore
+        f.write(data)
+    assert len(writer.blocks) > 1
+    with open(path, "rb") as f:
+        for index, (uncompressed_offset, compressed_offset) in enumerate(writer.blocks):
+            block, next_offset = inflate_member(f, compressed_offset)
+            assert data[uncompressed_offset:].startswith(block)
+            if index + 1 < len(writer.blocks):
+                assert writer.blocks[index + 1] == (uncompressed_offset + len(block), next_offset)
+
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_open_writer_writes_zstd(tmp_path: Path, threads: int) -> None:
+    """Zstd files are compressed on multiple threads and read back by their extension.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        threads (int): The number of threads to compress with.
+    """
+    pytest.importorskip("zstandard")
+    data = create_data(10**6)
+    path = tmp_path / "papers.jsonl.zst"
+    with open_writer(path, "zstd", threads=threads) as f:
+        f.write(data)
+    with open_compressed(path) as f:
+        assert list(f) == data.splitlines(keepends=True)
+
+
+def test_open_writer_rejects_unknown_compressions(tmp_path: Path) -> None:
+    """Only the supported compressions can be written.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    with pytest.raises(ValueError):
+        open_writer(tmp_path / "papers.jsonl.bz2", "bz2")
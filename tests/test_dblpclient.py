@@ -0,0 +1,451 @@
+"""Tests of the DBLP client: the records of a release have to be parsed one at a time into the same
+structure `xmltodict` gave, with the entities of the DTD resolved, and filtering them on their
+columns has to keep the records that filtering them one by one keeps. The release is cached in
+SQLite with one row per record and its filter columns in a .columns.npz file next to it, and the
+changes since the previous release are found by the fingerprints of both releases. Downloads are
+verified by the MD5 hash computed while downloading and trusted afterwards by a checksum sidecar.
+"""
+import gzip
+import hashlib
+import io
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+import numpy as np
+import pytest
+
+from csinsights.client import dblpclient
+from csinsights.client.dblpclient import (
+    TREE_CACHE_VERSION,
+    DBLPClient,
+    RecordColumns,
+    build_tree_columns,
+    create_record_mask,
+    diff_fingerprints,
+    encode_access_types,
+    get_access_code,
+    get_access_types,
+    get_fingerprint_path,
+    get_tree_cache_version,
+    get_tree_columns_path,
+    iter_cache_keys,
+    iter_fingerprint,
+    iter_xml_records,
+    load_tree_columns,
+    read_tree_cache,
+    save_tree_columns,
+    write_fingerprint,
+    write_tree_cache,
+)
+from csinsights.client.download import get_checksum_path, load_checksum, save_checksum
+from csinsights.types import AccessType, ChangeType
+from tests.helpers import DBLP_FIXTURES, S2StandIn
+
+# The records of the sample release as `xmltodict` converts them
+RECORDS: List[Tuple[str, Dict[str, Any]]] = [
+    (
+        "article",
+        {
+            "@key": "journals/tc/Muller20",
+            "@mdate": "2020-03-01",
+            "author": {"@orcid": "0000-0001-2345-6789", "#text": "Jürgen Müller"},
+            "title": {"i": "and", "#text": "Open  shut"},
+            "year": "2020",
+            "journal": "TC",
+            "ee": {"@type": "oa", "#text": "https://doi.org/10.1000/1"},
+        },
+    ),
+    (
+        "article",
+        {
+            "@key": "journals/tc/Closed21",
+            "@mdate": "2021-06-15",
+            "author": ["René Closed", "Second Author"],
+            "title": "Closed access",
+            "year": "2021",
+            "journal": "TC",
+            "ee": "https://doi.org/10.1000/2",
+        },
+    ),
+    (
+        "inproceedings",
+        {
+            "@key": "conf/icse/Mixed22",
+            "@mdate": "2022-01-10",
+            "author": "Mixed Access",
+            "title": {"sub": "2", "#text": "HO in software"},
+            "year": "2022",
+            "booktitle": "ICSE",
+            "ee": [
+                {"@type": "closed", "#text": "https://doi.org/10.1000/3"},
+                {"@type": "oa", "#text": "https://arxiv.org/abs/2201.00001"},
+            ],
+        },
+    ),
+    (
+        "inproceedings",
+        {
+            "@key": "conf/icse/Old19",
+            "@mdate": "2019-05-05",
+            "author": "Old Paper",
+            "title": "Without an edition",
+            "year": "2019",
+            "booktitle": "ICSE",
+        },
+    ),
+    (
+        "www",
+        {
+            "@key": "homepages/1/Muller",
+            "author": "Jürgen Müller",
+            "title": "Home Page",
+            "url": "https://example.org",
+        },
+    ),
+]
+
+
+def test_iter_xml_records_resolves_the_dtd_next_to_the_file() -> None:
+    """The records of a release are parsed with the entities of the DTD next to the xml."""
+    with open(DBLP_FIXTURES / "dblp.xml", "rb") as f:
+        assert list(iter_xml_records(f)) == RECORDS
+
+
+def test_iter_xml_records_resolves_a_downloaded_dtd() -> None:
+    """The records of a stream without a location are parsed with the entities of a given DTD,
+    e.g., of a gzip release that is inflated while it is parsed.
+    """
+    compressed = gzip.compress((DBLP_FIXTURES / "dblp.xml").read_bytes())
+    with gzip.open(io.BytesIO(compressed), "rb") as f:
+        records = iter_xml_records(f, DBLP_FIXTURES / "dblp.dtd")  # type: ignore
+        # Records are parsed lazily
+        assert next(records) == RECORDS[0]
+        assert list(records) == RECORDS[1:]
+
+
+def group_records(records: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group records by their type in the order of the release.
+
+    Args:
+        records (List[Tuple[str, Dict[str, Any]]]): The type and the record.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: The records grouped by their type.
+    """
+    tree: Dict[str, List[Dict[str, Any]]] = {}
+    for tag, record in records:
+        tree.setdefault(tag, []).append(record)
+    return tree
+
+
+def test_tree_cache_reads_the_records_by_type(tmp_path: Path) -> None:
+    """The records are read from the cache grouped by type, all or only the requested types.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    write_tree_cache(cache_path, RECORDS)
+    assert get_tree_cache_version(cache_path) == TREE_CACHE_VERSION
+    assert read_tree_cache(cache_path) == group_records(RECORDS)
+    assert read_tree_cache(cache_path, {"inproceedings", "phdthesis"}) == {
+        "inproceedings": group_records(RECORDS)["inproceedings"]
+    }
+    assert read_tree_cache(cache_path, set()) == {}
+    # Files that are not a cache have no version, e.g., the json caches of previous versions
+    (tmp_path / "dblp.json").write_text("{}")
+    assert get_tree_cache_version(tmp_path / "dblp.json") is None
+
+
+def test_tree_cache_is_replaced_only_when_complete(tmp_path: Path) -> None:
+    """A cache whose records fail to be parsed doesn't replace the previous cache.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    write_tree_cache(cache_path, RECORDS[:2])
+
+    def failing_records() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        yield from RECORDS
+        raise ValueError("truncated release")
+
+    with pytest.raises(ValueError):
+        write_tree_cache(cache_path, failing_records())
+    assert read_tree_cache(cache_path) == group_records(RECORDS[:2])
+
+
+def test_stale_tree_cache_is_rebuilt(tmp_path: Path) -> None:
+    """A cache of another version is not used by the client.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    client = DBLPClient(cache_dir=tmp_path, base_url="https://dblp.org/xml")
+    client.releases = ["https://dblp.org/xml/release/dblp-2022-01-01.xml.gz"]
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    assert client._get_serialized_cache_hit() is None
+    write_tree_cache(cache_path, RECORDS)
+    assert client._get_serialized_cache_hit() == cache_path
+    connection = sqlite3.connect(cache_path)
+    connection.execute(f"PRAGMA user_version = {TREE_CACHE_VERSION - 1}")
+    connection.close()
+    assert client._get_serialized_cache_hit() is None
+
+
+def keep_record(
+    record: Dict[str, Any], access_types: Set[AccessType], from_timestamp: datetime
+) -> bool:
+    """Filter a record by its modification date and the access types of its editions.
+
+    Args:
+        record (Dict[str, Any]): The record.
+        access_types (Set[AccessType]): A set of valid access types.
+        from_timestamp (datetime): The timestamp to filter by.
+
+    Returns:
+        bool: Whether to keep the record.
+    """
+    if "@mdate" not in record or datetime.fromisoformat(record["@mdate"]) <= from_timestamp:
+        return False
+    if AccessType.ALL in access_types:
+        return True
+    # Editions without a type and records without an edition are closed access
+    editions = get_access_types(record.get("ee")) or [None]
+    return any(AccessType(edition or "closed") in access_types for edition in editions)
+
+
+@pytest.mark.parametrize(
+    "access_types",
+    [
+        {AccessType.OPEN},
+        {AccessType.CLOSED},
+        {AccessType.OPEN, AccessType.CLOSED},
+        {AccessType.ALL},
+    ],
+    ids=lambda access_types: "+".join(sorted(access_type.value for access_type in access_types)),
+)
+@pytest.mark.parametrize("from_timestamp", [datetime(1980, 1, 1), datetime(2020, 3, 1)])
+def test_record_mask_matches_the_record_filter(
+    access_types: Set[AccessType], from_timestamp: datetime
+) -> None:
+    """The mask of the columns keeps the records that the filter of single records keeps.
+
+    Args:
+        access_types (Set[AccessType]): A set of valid access types.
+        from_timestamp (datetime): The timestamp to filter by.
+    """
+    records = [record for _, record in RECORDS]
+    columns = RecordColumns(
+        np.arange(len(records), dtype=np.int64),
+        np.array([record.get("@mdate") for record in records], dtype="datetime64[D]"),
+        np.array(
+            [get_access_code(encode_access_types(get_access_types(r.get("ee")))) for r in records],
+            dtype=np.uint8,
+        ),
+    )
+    mask = create_record_mask(columns, access_types, from_timestamp)
+    assert mask.tolist() == [keep_record(r, access_types, from_timestamp) for r in records]
+
+
+def test_tree_columns_are_saved_next_to_the_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The columns are built once per cache, loaded from the .columns.npz file afterwards, and
+    rebuilt when the cache is rebuilt or the columns are of another version.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    write_tree_cache(cache_path, RECORDS)
+    columns = load_tree_columns(cache_path)
+    assert get_tree_columns_path(cache_path).exists()
+    assert list(columns) == ["article", "inproceedings", "www"]
+    assert columns["article"].rowid.tolist() == [1, 2]
+    assert columns["www"].mdate.tolist() == [None]
+    built: List[Path] = []
+
+    def counting_build(file_path: Path) -> Dict[str, RecordColumns]:
+        built.append(file_path)
+        return build_tree_columns(file_path)
+
+    monkeypatch.setattr(dblpclient, "build_tree_columns", counting_build)
+    loaded = load_tree_columns(cache_path)
+    assert not built
+    assert list(loaded) == list(columns)
+    for tag, type_columns in columns.items():
+        for name in RecordColumns._fields:
+            np.testing.assert_array_equal(getattr(loaded[tag], name), getattr(type_columns, name))
+    # Columns of another version are rebuilt
+    monkeypatch.setattr(dblpclient, "TREE_CACHE_VERSION", TREE_CACHE_VERSION + 1)
+    load_tree_columns(cache_path)
+    assert built == [cache_path]
+    # The columns of a cache are removed when the cache is rebuilt
+    save_tree_columns(cache_path, columns)
+    write_tree_cache(cache_path, RECORDS[:1])
+    assert not get_tree_columns_path(cache_path).exists()
+    assert list(load_tree_columns(cache_path)) == ["article"]
+
+
+@pytest.mark.parametrize("record_types", [None, {"inproceedings"}], ids=["all", "inproceedings"])
+def test_filter_columns_loads_the_kept_records(tmp_path: Path, record_types: Set[str]) -> None:
+    """The client loads the records that the filter of single records keeps in their order.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        record_types (Set[str]): The types of records to load.
+    """
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    write_tree_cache(cache_path, RECORDS)
+    client = DBLPClient(cache_dir=tmp_path, base_url="https://dblp.org/xml")
+    access_types, from_timestamp = {AccessType.OPEN}, datetime(2020, 1, 1)
+    expected = group_records(
+        [
+            (tag, record)
+            for tag, record in RECORDS
+            if (record_types is None or tag in record_types)
+            and keep_record(record, access_types, from_timestamp)
+        ]
+    )
+    tree = client._filter_columns(cache_path, access_types, from_timestamp, record_types)
+    assert {tag: records for tag, records in tree.items() if records} == expected
+
+
+def test_diff_fingerprints_merges_the_sorted_keys() -> None:
+    """Records are added, changed, or deleted by their keys and modification dates."""
+    previous = [("a", "2020-01-01"), ("b", "2020-01-01"), ("d", ""), ("f", "2020-01-01")]
+    current = [("b", "2021-01-01", 1), ("c", "2020-01-01", 2), ("d", "", 3), ("g", "", 4)]
+    assert list(diff_fingerprints(previous, current)) == [
+        (ChangeType.DELETED, "a", None),
+        (ChangeType.CHANGED, "b", 1),
+        (ChangeType.ADDED, "c", 2),
+        (ChangeType.DELETED, "f", None),
+        (ChangeType.ADDED, "g", 4),
+    ]
+    assert list(diff_fingerprints([], current[:1])) == [(ChangeType.ADDED, "b", 1)]
+    assert list(diff_fingerprints(previous[:1], [])) == [(ChangeType.DELETED, "a", None)]
+
+
+def test_fingerprint_is_written_once_consumed(tmp_path: Path) -> None:
+    """The fingerprint lists the keys of a cache in order and is written when all keys passed.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_path = tmp_path / "dblp-2022-01-01.xml.sqlite"
+    write_tree_cache(cache_path, RECORDS)
+    fingerprint_path = get_fingerprint_path(cache_path)
+    entries = write_fingerprint(fingerprint_path, iter_cache_keys(cache_path))
+    assert next(entries) == ("conf/icse/Mixed22", "2022-01-10", 3)
+    assert not fingerprint_path.exists()
+    assert [key for key, _, _ in entries][-1] == "journals/tc/Muller20"
+    assert list(iter_fingerprint(fingerprint_path)) == sorted(
+        (record["@key"], record.get("@mdate", "")) for _, record in RECORDS
+    )
+
+
+def test_download_and_diff_release_finds_the_changes(tmp_path: Path) -> None:
+    """The delta of a release has the added and changed records of the requested types that pass
+    the filters and the keys of the deleted records.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    previous = [
+        ("article", {**RECORDS[0][1]}),
+        ("article", {**RECORDS[1][1], "@mdate": "2020-01-01"}),
+        ("article", {"@key": "journals/tc/Gone18", "@mdate": "2018-01-01"}),
+    ]
+    write_tree_cache(tmp_path / "dblp-2022-01-01.xml.sqlite", previous)
+    write_tree_cache(tmp_path / "dblp-2022-02-01.xml.sqlite", RECORDS)
+    client = DBLPClient(cache_dir=tmp_path, base_url="https://dblp.org/xml")
+    client.releases = [
+        "https://dblp.org/xml/release/dblp-2022-02-01.xml.gz",
+        "https://dblp.org/xml/release/dblp-2022-01-01.xml.gz",
+    ]
+    delta = client.download_and_diff_release(False, {AccessType.ALL})
+    assert {tag: records for tag, records in delta.added.items() if records} == group_records(
+        RECORDS[2:]
+    )
+    assert delta.changed == {"article": [RECORDS[1][1]], "inproceedings": [], "www": []}
+    assert delta.deleted == ["journals/tc/Gone18"]
+    # The previous release is compared by its fingerprint once it was written from its cache
+    assert get_fingerprint_path(tmp_path / "dblp-2022-01-01.xml.sqlite").exists()
+    assert get_fingerprint_path(tmp_path / "dblp-2022-02-01.xml.sqlite").exists()
+    (tmp_path / "dblp-2022-01-01.xml.sqlite").unlink()
+    delta = client.download_and_diff_release(
+        True, {AccessType.OPEN}, dblp_record_types=["article", "inproceedings"]
+    )
+    assert delta.added == {"article": [], "inproceedings": [RECORDS[2][1]]}
+    assert delta.changed == {"article": [], "inproceedings": []}
+    assert delta.deleted == ["journals/tc/Gone18"]
+
+
+def test_checksum_is_trusted_until_the_file_changes(tmp_path: Path) -> None:
+    """The checksum of a file is only loaded while its size and modification time are unchanged.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    file_path = tmp_path / "dblp.xml.gz"
+    assert load_checksum(file_path) is None
+    file_path.write_bytes(b"release")
+    assert load_checksum(file_path) is None
+    save_checksum(file_path, 7, "abc")
+    assert load_checksum(file_path) == "abc"
+    stat = file_path.stat()
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load_checksum(file_path) is None
+    save_checksum(file_path, 7, "abc")
+    with open(file_path, "ab") as f:
+        f.write(b"s")
+    os.utime(file_path, ns=(stat.st_atime_ns, file_path.stat().st_mtime_ns))
+    assert load_checksum(file_path) is None
+
+
+def test_download_xml_verifies_the_release_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A release is hashed while it is downloaded, verified against the remote MD5 hash, and not
+    downloaded or hashed again while its checksum is valid.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    directory = tmp_path / "server"
+    directory.mkdir()
+    data = gzip.compress((DBLP_FIXTURES / "dblp.xml").read_bytes())
+    (directory / "dblp.xml.gz").write_bytes(data)
+    (directory / "dblp.xml.gz.md5").write_text(f"{hashlib.md5(data).hexdigest()}  dblp.xml.gz")
+    hashed: List[Path] = []
+    local_md5 = dblpclient.local_md5
+
+    def counting_md5(filepath: Path) -> str:
+        hashed.append(filepath)
+        return local_md5(filepath)
+
+    monkeypatch.setattr(dblpclient, "local_md5", counting_md5)
+    with S2StandIn(directory) as server:
+        client = DBLPClient(cache_dir=tmp_path / "cache", base_url=server.base_url)
+        file_url = f"{server.base_url}files/dblp.xml.gz"
+        file_path = client._download_xml(file_url)
+        assert file_path.read_bytes() == data and load_checksum(file_path) is not None
+        downloads = [path for path, _ in server.requests if path == "/files/dblp.xml.gz"]
+        client._download_xml(file_url)
+        assert [path for path, _ in server.requests if path == "/files/dblp.xml.gz"] == downloads
+        assert not hashed
+        # A cached release without a checksum is hashed once
+        get_checksum_path(file_path).unlink()
+        client._download_xml(file_url)
+        client._download_xml(file_url)
+        assert hashed == [file_path]
+        # A release that doesn't match the remote hash is not trusted
+        (directory / "dblp.xml.gz.md5").write_text(f"{hashlib.md5(b'').hexdigest()}  dblp.xml.gz")
+        with pytest.raises(ValueError):
+            client._download_xml(file_url)
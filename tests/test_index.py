@@ -0,0 +1,97 @@
+"""Tests of the random access index over the papers of a release: looking up a paper by its corpus
+id has to give the exported paper, whichever shard and members the paper was written to.
+"""
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from csinsights.data import ReleaseIndex, SemanticScholarDataProcessor, compression
+from csinsights.data.index import INDEX_NAME, OffsetIndexBuilder
+from csinsights.data.release import ReleaseManifest
+from tests.helpers import read_jsonl_gz, s2_options, write_sample_shards
+
+OPTIONS = s2_options(s2_use_papers=True, s2_use_authors=True, s2_filter_dblp=True)
+
+
+def export_papers(tmp_path: Path, release_shards: int) -> Dict[int, dict]:
+    """Export the sample shards and read the exported papers.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        release_shards (int): The number of shards to export.
+
+    Returns:
+        Dict[int, dict]: The papers by their corpus id.
+    """
+    processor = SemanticScholarDataProcessor(
+        cache_dir=write_sample_shards(tmp_path / "cache"), release_shards=release_shards
+    )
+    processor.process_data(**OPTIONS).to_jsonl(str(tmp_path / "release"))
+    return {
+        paper["corpusid"]: paper
+        for name, entry in ReleaseManifest(tmp_path / "release").files.items()
+        if entry["dataset"] == "papers" and entry["format"] == "jsonl"
+        for paper in read_jsonl_gz(tmp_path / "release" / name)
+    }
+
+
+@pytest.mark.parametrize("block_size", [compression.BGZF_BLOCK_SIZE, 64], ids=["default", "small"])
+@pytest.mark.parametrize("release_shards", [1, 3])
+def test_index_looks_up_every_paper(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, release_shards: int, block_size: int
+) -> None:
+    """Every exported paper is found by its corpus id, also if the papers span several members.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+        release_shards (int): The number of shards to export.
+        block_size (int): The number of uncompressed bytes per BGZF member.
+    """
+    monkeypatch.setattr(compression, "BGZF_BLOCK_SIZE", block_size)
+    papers = export_papers(tmp_path, release_shards)
+    assert papers
+    entry = ReleaseManifest(tmp_path / "release").files[INDEX_NAME]
+    assert entry["format"] == "index" and entry["rows"] == len(papers)
+    corpusids = sorted(papers)
+    # A small cache makes the lookups inflate members again
+    with ReleaseIndex(tmp_path / "release", cache_size=2) as index:
+        assert len(index) == len(papers)
+        assert all(index.get(corpusid) == papers[corpusid] for corpusid in corpusids)
+        # Batches come back in the order of the ids, with None for unknown ids
+        missing = max(corpusids) + 1
+        batch: List[int] = [missing] + corpusids[::-1] + [-1]
+        assert index.get_many(batch) == [None] + [papers[i] for i in corpusids[::-1]] + [None]
+        assert index.get_many([]) == []
+
+
+def test_index_is_not_written_for_other_compressions(tmp_path: Path) -> None:
+    """Only gzip exports are indexed, and the index of a previous gzip export is removed.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    pytest.importorskip("zstandard")
+    cache_dir = write_sample_shards(tmp_path / "cache")
+    for export_compression in ("gzip", "zstd"):
+        processor = SemanticScholarDataProcessor(
+            cache_dir=cache_dir, compression=export_compression
+        )
+        processor.process_data(**OPTIONS).to_jsonl(str(tmp_path / "release"))
+        if export_compression == "gzip":
+            assert (tmp_path / "release" / INDEX_NAME).exists()
+    assert INDEX_NAME not in ReleaseManifest(tmp_path / "release").files
+    assert not (tmp_path / "release" / INDEX_NAME).exists()
+
+
+def test_builder_maps_offsets_to_members() -> None:
+    """The builder sorts the entries by id and points them at the members they start in."""
+    builder = OffsetIndexBuilder()
+    for key, shard, offset in ((7, 0, 0), (3, 0, 150), (5, 1, 20), (1, 0, 100)):
+        builder.add(key, shard, offset)
+    index = builder.build([[(0, 0), (100, 40)], [(0, 0)]])
+    assert index["corpusid"].tolist() == [1, 3, 5, 7]
+    assert index["shard"].tolist() == [0, 0, 1, 0]
+    assert index["block_offset"].tolist() == [40, 40, 0, 0]
+    assert index["in_block_offset"].tolist() == [0, 50, 20, 0]
@@ -0,0 +1,48 @@
+"""Tests of the parquet export: the parquet files have the fixed schemas of the released datasets
+and the same rows as the jsonl export, with the values that don't match the schema converted.
+"""
+from pathlib import Path
+
+import pyarrow.parquet as pq  # type: ignore
+
+from csinsights.data import SemanticScholarDataProcessor
+from csinsights.data.schema import SCHEMAS, conform, to_arrow_schema
+from tests.helpers import read_jsonl_gz, s2_options, write_jsonl_gz, write_sample_shards
+
+OPTIONS = s2_options(
+    s2_use_papers=True, s2_use_abstracts=True, s2_use_authors=True, s2_filter_dblp=True
+)
+
+
+def test_parquet_export_has_the_fixed_schema(tmp_path: Path) -> None:
+    """The parquet files have the schemas of the datasets and the rows of the jsonl export.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = write_sample_shards(tmp_path / "cache")
+    # A paper with values of other types than the schema and a field that is not in it
+    odd_paper = {
+        "corpusid": 7001,
+        "externalids": {"DBLP": "conf/x/7001", "CorpusId": 7001},
+        "title": "Odd types",
+        "authors": [],
+        "year": "2020",
+        "citationcount": "many",
+        "unknown": True,
+    }
+    write_jsonl_gz(cache_dir / "papers_9.jsonl.gz", [odd_paper])
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir).process_data(**OPTIONS)
+    processor.to_jsonl(str(tmp_path / "release"))
+    processor.to_parquet(str(tmp_path / "release"))
+    for dataset, schema in SCHEMAS.items():
+        path = tmp_path / "release" / f"{dataset}.parquet"
+        assert pq.read_schema(path) == to_arrow_schema(schema)
+        records = read_jsonl_gz(tmp_path / "release" / f"{dataset}.jsonl.gz")
+        assert records
+        assert pq.read_table(path).to_pylist() == [conform(record, schema) for record in records]
+    table = pq.read_table(tmp_path / "release" / "papers.parquet")
+    papers = {paper["corpusid"]: paper for paper in table.to_pylist()}
+    assert papers[7001]["year"] == 2020 and papers[7001]["citationcount"] is None
+    assert papers[7001]["externalids"]["CorpusId"] == "7001"
+    assert "unknown" not in papers[7001]
@@ -0,0 +1,92 @@
+"""Tests of the sharded release exports: every record has to be in the shard of its id, and the
+manifest has to list every exported file with the row count, size, and checksum of the file.
+"""
+import gzip
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from csinsights.data import SemanticScholarDataProcessor
+from csinsights.data.release import (
+    MANIFEST_NAME,
+    ReleaseManifest,
+    ShardedExport,
+    get_shard,
+)
+from tests.helpers import read_jsonl_gz, s2_options, write_sample_shards
+
+OPTIONS = s2_options(s2_use_papers=True, s2_use_authors=True, s2_filter_dblp=True)
+
+
+def test_sharded_export_is_listed_in_the_manifest(tmp_path: Path) -> None:
+    """The jsonl and csv exports are split into shards by the ids of the records, and the
+    manifest lists every shard with its rows, size, and MD5 hash.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = write_sample_shards(tmp_path / "cache")
+    release_dir = tmp_path / "release"
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir, release_shards=3)
+    processor.process_data(**OPTIONS)
+    processor.to_jsonl(str(release_dir))
+    processor.to_csv(str(release_dir))
+    manifest = ReleaseManifest(release_dir)
+    for dataset, key in (("papers", "corpusid"), ("authors", "authorid")):
+        for export_format in ("jsonl", "csv"):
+            entries = {
+                name: entry
+                for name, entry in manifest.files.items()
+                if entry["dataset"] == dataset and entry["format"] == export_format
+            }
+            assert sorted(entries) == [f"{dataset}_{i}.{export_format}.gz" for i in range(3)]
+            for name, entry in entries.items():
+                data = (release_dir / name).read_bytes()
+                assert entry["shards"] == 3 and entry["key"] == key
+                assert entry["size"] == len(data)
+                assert entry["md5"] == hashlib.md5(data).hexdigest()
+                lines = gzip.decompress(data).splitlines()
+                # The csv shards start with the header
+                assert entry["rows"] == len(lines) - (export_format == "csv")
+        shards = [read_jsonl_gz(release_dir / f"{dataset}_{i}.jsonl.gz") for i in range(3)]
+        assert all(
+            get_shard(record[key], 3) == i for i, shard in enumerate(shards) for record in shard
+        )
+        assert sum(map(len, shards)) > 0
+
+
+def test_export_replaces_the_previous_shards(tmp_path: Path) -> None:
+    """Exporting with a different number of shards removes the files of the previous export.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = write_sample_shards(tmp_path / "cache")
+    release_dir = tmp_path / "release"
+    for shards in (3, 1):
+        processor = SemanticScholarDataProcessor(cache_dir=cache_dir, release_shards=shards)
+        processor.process_data(**OPTIONS).to_jsonl(str(release_dir))
+    names = {name for name in ReleaseManifest(release_dir).files if name.endswith(".jsonl.gz")}
+    assert names == {"papers.jsonl.gz", "authors.jsonl.gz"}
+    assert sorted(path.name for path in release_dir.glob("*.jsonl.gz")) == sorted(names)
+
+
+def test_failed_export_is_not_recorded(tmp_path: Path) -> None:
+    """The shards of an export that raised an error are not recorded in the manifest.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    paths = [tmp_path / f"papers_{i}.jsonl" for i in range(2)]
+    with pytest.raises(RuntimeError):
+        with ShardedExport(
+            ReleaseManifest(tmp_path), "papers", "jsonl", paths, lambda f: f
+        ) as export:
+            export.write({"corpusid": 1}, b'{"corpusid": 1}\n')
+            raise RuntimeError("interrupted")
+    assert ReleaseManifest(tmp_path).files == {}
+    with ShardedExport(ReleaseManifest(tmp_path), "papers", "jsonl", paths, lambda f: f) as export:
+        assert export.write({"corpusid": 1}, b'{"corpusid": 1}\n') == (get_shard(1, 2), 0)
+    assert (tmp_path / MANIFEST_NAME).exists()
+    assert sum(entry["rows"] for entry in ReleaseManifest(tmp_path).files.values()) == 1
@@ -0,0 +1,217 @@
+"""Tests of the concurrent downloads of the S2 client against a local stand-in of the API."""
+import io
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from tqdm import tqdm
+
+from csinsights.client import SemanticScholarClient
+from csinsights.client.download import download_in_chunks, update_progress
+from csinsights.data import SemanticScholarDataProcessor
+from tests.helpers import (
+    S2StandIn,
+    read_jsonl_gz,
+    s2_options,
+    write_jsonl_gz,
+    write_sample_shards,
+)
+
+# The datasets and the number of shards the stand-in serves of each
+SHARDS = {"papers": 3, "abstracts": 2, "authors": 2}
+
+
+@pytest.fixture
+def s2_server(tmp_path: Path) -> Iterator[S2StandIn]:
+    """Serve a release with a few shards per dataset.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+
+    Returns:
+        Iterator[S2StandIn]: The running stand-in.
+    """
+    directory = tmp_path / "server"
+    directory.mkdir()
+    for dataset, shards in SHARDS.items():
+        for shard in range(shards):
+            write_jsonl_gz(
+                directory / f"{dataset}_{shard}.jsonl.gz",
+                ({"corpusid": shard * 1000 + i, "dataset": dataset} for i in range(500)),
+            )
+    with S2StandIn(directory) as server:
+        yield server
+
+
+def create_client(server: S2StandIn, cache_dir: Path) -> SemanticScholarClient:
+    """Create a client of the stand-in that downloads on four threads.
+
+    Args:
+        server (S2StandIn): The stand-in.
+        cache_dir (Path): The cache directory to download to.
+
+    Returns:
+        SemanticScholarClient: The client.
+    """
+    return SemanticScholarClient(
+        cache_dir=cache_dir, s2_base_url=server.base_url, download_workers=4
+    )
+
+
+def download_release(client: SemanticScholarClient) -> str:
+    """Download all datasets of the latest release.
+
+    Args:
+        client (SemanticScholarClient): The client.
+
+    Returns:
+        str: The release version.
+    """
+    return client.download_release(
+        **s2_options(s2_use_papers=True, s2_use_abstracts=True, s2_use_authors=True)
+    )
+
+
+def test_download_release_downloads_all_shards(s2_server: S2StandIn, tmp_path: Path) -> None:
+    """All shards of all datasets are downloaded concurrently and completely.
+
+    Args:
+        s2_server (S2StandIn): The stand-in.
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = tmp_path / "cache"
+    assert download_release(create_client(s2_server, cache_dir)) == "2022-09-27"
+    for path in s2_server.directory.iterdir():
+        assert (cache_dir / path.name).read_bytes() == path.read_bytes()
+    assert not list(cache_dir.glob("*.part"))
+
+
+def test_download_release_skips_complete_shards(s2_server: S2StandIn, tmp_path: Path) -> None:
+    """Shards that were downloaded completely are not downloaded again.
+
+    Args:
+        s2_server (S2StandIn): The stand-in.
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = tmp_path / "cache"
+    download_release(create_client(s2_server, cache_dir))
+    s2_server.requests.clear()
+    download_release(create_client(s2_server, cache_dir))
+    assert not [path for path, _ in s2_server.requests if path.startswith("/files/")]
+
+
+def interrupt_download(server: S2StandIn, cache_dir: Path, name: str) -> int:
+    """Interrupt the download of a shard after a few bytes like a closed connection.
+
+    Args:
+        server (S2StandIn): The stand-in.
+        cache_dir (Path): The cache directory to download to.
+        name (str): The name of the shard.
+
+    Returns:
+        int: The number of bytes in the part file.
+    """
+    server.interrupt[name] = 1000
+    with pytest.raises(IOError):
+        download_in_chunks(f"{server.base_url}files/{name}", cache_dir / name, chunk_size=256)
+    del server.interrupt[name]
+    return (cache_dir / f"{name}.part").stat().st_size
+
+
+def test_download_release_resumes_interrupted_shards(s2_server: S2StandIn, tmp_path: Path) -> None:
+    """An interrupted download is resumed from its part file with a Range request.
+
+    Args:
+        s2_server (S2StandIn): The stand-in.
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    offset = interrupt_download(s2_server, cache_dir, "papers_1.jsonl.gz")
+    assert offset > 0
+    download_release(create_client(s2_server, cache_dir))
+    data = (s2_server.directory / "papers_1.jsonl.gz").read_bytes()
+    assert (cache_dir / "papers_1.jsonl.gz").read_bytes() == data
+    assert ("/files/papers_1.jsonl.gz", f"bytes={offset}-") in s2_server.requests
+    assert not list(cache_dir.glob("*.part*"))
+
+
+def test_download_release_restarts_parts_of_other_versions(
+    s2_server: S2StandIn, tmp_path: Path
+) -> None:
+    """A part file of another version of a shard (e.g., of another release) or of an unknown
+    version is not resumed, but downloaded again.
+
+    Args:
+        s2_server (S2StandIn): The stand-in.
+        tmp_path (Path): A temporary directory.
+    """
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    interrupt_download(s2_server, cache_dir, "papers_1.jsonl.gz")
+    # The next release has other records in a shard with the same name
+    write_jsonl_gz(
+        s2_server.directory / "papers_1.jsonl.gz",
+        ({"corpusid": i, "dataset": "next release"} for i in range(500)),
+    )
+    # A part file without the version it was downloaded from
+    (cache_dir / "papers_2.jsonl.gz.part").write_bytes(b"\x1f\x8b" * 100)
+    download_release(create_client(s2_server, cache_dir))
+    for path in s2_server.directory.iterdir():
+        assert (cache_dir / path.name).read_bytes() == path.read_bytes()
+    assert ("/files/papers_2.jsonl.gz", None) in s2_server.requests
+    assert not list(cache_dir.glob("*.part*"))
+
+
+def test_download_release_filters_on_download(tmp_path: Path) -> None:
+    """Filtering while downloading stores only the matching records, from which the same release
+    is processed as from all records.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    directory = write_sample_shards(tmp_path / "server")
+    options = s2_options(
+        s2_use_papers=True, s2_use_abstracts=True, s2_use_authors=True, s2_filter_dblp=True
+    )
+    releases = {}
+    with S2StandIn(directory) as server:
+        for filter_on_download in (False, True):
+            # The command line passes all options to the client and the processor
+            options["s2_filter_on_download"] = filter_on_download
+            cache_dir = tmp_path / f"cache_{filter_on_download}"
+            client = SemanticScholarClient(
+                cache_dir=cache_dir, s2_base_url=server.base_url, download_workers=2, **options
+            )
+            client.download_release(**options)
+            processor = SemanticScholarDataProcessor(cache_dir=cache_dir, **options)
+            release_dir = tmp_path / f"release_{filter_on_download}"
+            processor.process_data(**options).to_jsonl(str(release_dir))
+            releases[filter_on_download] = {
+                dataset: read_jsonl_gz(release_dir / f"{dataset}.jsonl.gz")
+                for dataset in ("papers", "authors")
+            }
+    assert releases[True] == releases[False]
+    assert releases[True]["papers"] and releases[True]["authors"]
+    for path in directory.iterdir():
+        downloaded = read_jsonl_gz(tmp_path / "cache_True" / path.name)
+        assert 0 < len(downloaded) < len(read_jsonl_gz(path))
+        if path.name.startswith("papers"):
+            assert all(paper["externalids"]["DBLP"] is not None for paper in downloaded)
+
+
+def test_update_progress_from_threads() -> None:
+    """A progress bar that is shared by concurrent downloads counts every update."""
+    progress_bar = tqdm(total=0, file=io.StringIO())
+
+    def download() -> None:
+        for _ in range(2000):
+            update_progress(progress_bar, downloaded=1, size=1)
+
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert progress_bar.n == progress_bar.total == 16000
@@ -0,0 +1,277 @@
+"""Tests of incremental releases: the diffs between two releases are downloaded from a local
+stand-in of the S2 diff endpoints and applied to the previous release, which has to give the same
+release as processing the new release from scratch.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from csinsights.client import SemanticScholarClient
+from csinsights.data import SemanticScholarDataProcessor
+from tests.helpers import S2StandIn, read_jsonl_gz, s2_options, write_jsonl_gz
+
+# The options of both runs: papers with abstracts and authors, filtered by DBLP
+OPTIONS = s2_options(
+    s2_use_papers=True, s2_use_abstracts=True, s2_use_authors=True, s2_filter_dblp=True
+)
+
+
+def paper(corpusid: int, dblp: object, authors: List[object], title: str = "title") -> dict:
+    """Create a paper.
+
+    Args:
+        corpusid (int): The corpus id.
+        dblp (object): The DBLP id or None.
+        authors (List[object]): The author ids.
+        title (str, optional): The title. Defaults to "title".
+
+    Returns:
+        dict: The paper.
+    """
+    return {
+        "corpusid": corpusid,
+        "externalids": {"DBLP": dblp, "ArXiv": None, "CorpusId": str(corpusid)},
+        "title": title,
+        "authors": [{"authorId": author, "name": f"name {author}"} for author in authors],
+        "updated": "2022-09-13",
+    }
+
+
+def abstract(corpusid: int, text: str, openaccess: bool = True) -> dict:
+    """Create an abstract.
+
+    Args:
+        corpusid (int): The corpus id of the paper.
+        text (str): The abstract.
+        openaccess (bool, optional): Whether it has open access info. Defaults to True.
+
+    Returns:
+        dict: The abstract.
+    """
+    return {
+        "corpusid": corpusid,
+        "openaccessinfo": {"externalids": {"DBLP": "x"}, "license": None} if openaccess else None,
+        "abstract": text,
+        "updated": "2022-09-01",
+    }
+
+
+def author(authorid: Optional[str], hindex: int = 1) -> dict:
+    """Create an author.
+
+    Args:
+        authorid (Optional[str]): The author id or None.
+        hindex (int, optional): The h-index. Defaults to 1.
+
+    Returns:
+        dict: The author.
+    """
+    return {"authorid": authorid, "url": f"https://s2/{authorid}", "name": "n", "hindex": hindex}
+
+
+def create_releases() -> Tuple[Dict[str, List[dict]], Dict[str, List[dict]], Dict[str, dict]]:
+    """Create two releases and the diff between them.
+
+    Returns:
+        Tuple[Dict[str, List[dict]], Dict[str, List[dict]], Dict[str, dict]]: The datasets of the
+        previous and the new release, and the updated and deleted records per dataset.
+    """
+    previous = {
+        "papers": [
+            paper(1, "a", ["1", None]),
+            paper(2, "b", ["2", "3"]),
+            paper(3, None, ["4"]),
+            paper(4, "d", ["1"]),
+            paper(5, "e", ["5"]),
+        ],
+        "abstracts": [
+            abstract(1, "abstract 1"),
+            abstract(2, "abstract 2", openaccess=False),
+            abstract(3, "abstract 3"),
+            abstract(4, "abstract 4"),
+            abstract(5, "abstract 5", openaccess=False),
+        ],
+        "authors": [author(str(authorid)) for authorid in range(1, 6)],
+    }
+    # Updated papers can carry their external ids in the open access info
+    updated_paper = paper(1, None, ["1", None], title="new title")
+    updated_paper["openaccessinfo"] = {"externalids": {"DBLP": "a"}, "license": None}
+    updates: Dict[str, List[dict]] = {
+        "papers": [updated_paper, paper(4, None, ["1"]), paper(6, "f", ["6", "1"])],
+        "abstracts": [abstract(5, "new abstract 5"), abstract(6, "abstract 6", openaccess=False)],
+        "authors": [author("1", hindex=2), author("6"), author(None)],
+    }
+    deletes: Dict[str, List[dict]] = {
+        "papers": [{"corpusid": 2}],
+        "abstracts": [{"corpusid": 1}, {"corpusid": 4}],
+        "authors": [{"authorid": "3"}],
+    }
+    # Apply the diff to get the new release
+    new = {}
+    for dataset, key in (
+        ("papers", "corpusid"),
+        ("abstracts", "corpusid"),
+        ("authors", "authorid"),
+    ):
+        records = {record[key]: record for record in previous[dataset]}
+        for record in updates[dataset]:
+            records[record[key]] = record
+        for record in deletes[dataset]:
+            records.pop(record[key], None)
+        new[dataset] = list(records.values())
+    return previous, new, {"update": updates, "delete": deletes}
+
+
+def process_release(datasets: Dict[str, List[dict]], cache_dir: Path, release_dir: Path) -> None:
+    """Process a full release from its shards and export it.
+
+    Args:
+        datasets (Dict[str, List[dict]]): The datasets of the release.
+        cache_dir (Path): The cache directory to write the shards to.
+        release_dir (Path): The directory to export the release to.
+    """
+    cache_dir.mkdir()
+    for dataset, records in datasets.items():
+        write_jsonl_gz(cache_dir / f"{dataset}_0.jsonl.gz", records)
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir, compression="gzip")
+    processor.process_data(**OPTIONS).to_jsonl(str(release_dir))
+
+
+def read_release(release_dir: Path) -> Dict[str, List[dict]]:
+    """Read the papers and authors of an exported release sorted by their ids.
+
+    Args:
+        release_dir (Path): The release directory.
+
+    Returns:
+        Dict[str, List[dict]]: The papers and authors.
+    """
+    return {
+        "papers": sorted(
+            read_jsonl_gz(release_dir / "papers.jsonl.gz"), key=lambda x: x["corpusid"]
+        ),
+        "authors": sorted(
+            read_jsonl_gz(release_dir / "authors.jsonl.gz"), key=lambda x: x["authorid"]
+        ),
+    }
+
+
+def test_process_diffs_matches_full_release(tmp_path: Path) -> None:
+    """Applying the diffs from the stand-in to the previous release gives the new release.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    pytest.importorskip("zstandard")
+    previous, new, diff = create_releases()
+    # The previous release was exported with another compression and split into shards
+    previous_cache_dir = tmp_path / "previous"
+    previous_cache_dir.mkdir()
+    for dataset, records in previous.items():
+        write_jsonl_gz(previous_cache_dir / f"{dataset}_0.jsonl.gz", records)
+    SemanticScholarDataProcessor(
+        cache_dir=previous_cache_dir, compression="zstd", release_shards=2
+    ).process_data(**OPTIONS).to_jsonl(str(tmp_path / "previous_release"))
+    # Serve the diff from the previous release to the latest one
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    files: Dict[str, Dict[str, List[str]]] = {"update": {}, "delete": {}}
+    for kind, datasets in diff.items():
+        for dataset, records in datasets.items():
+            write_jsonl_gz(server_dir / f"diff_{dataset}_{kind}.jsonl.gz", records)
+            files[kind][dataset] = [f"diff_{dataset}_{kind}.jsonl.gz"]
+    cache_dir = tmp_path / "cache"
+    with S2StandIn(server_dir) as server:
+        server.diffs = [{"from_release": "2022-09-13", "to_release": "2022-09-27", **files}]
+        client = SemanticScholarClient(cache_dir=cache_dir, s2_base_url=server.base_url)
+        assert client.download_diffs("2022-09-13", **OPTIONS) == "2022-09-27"
+    SemanticScholarDataProcessor(cache_dir=cache_dir).process_diffs(
+        str(tmp_path / "previous_release"), "2022-09-13", "2022-09-27", **OPTIONS
+    ).to_jsonl(str(tmp_path / "incremental_release"))
+
+    process_release(new, tmp_path / "new", tmp_path / "full_release")
+    incremental = read_release(tmp_path / "incremental_release")
+    assert incremental == read_release(tmp_path / "full_release")
+    # The deleted abstract is removed from the paper that stays in the release
+    assert [paper["corpusid"] for paper in incremental["papers"]] == [1, 5, 6]
+    assert "abstract" not in incremental["papers"][0]
+
+
+def test_process_diffs_requires_previous_release(tmp_path: Path) -> None:
+    """Diffs are not applied without a previous release.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    (tmp_path / "previous_release").mkdir()
+    processor = SemanticScholarDataProcessor(cache_dir=tmp_path)
+    with pytest.raises(FileNotFoundError):
+        processor.process_diffs(
+            str(tmp_path / "previous_release"), "2022-09-13", "2022-09-27", **OPTIONS
+        )
+
+
+def test_process_diffs_applies_only_the_diffs_between_the_releases(tmp_path: Path) -> None:
+    """Diffs of other releases in the cache directory (e.g., of an aborted run) are not applied.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    previous, new, diff = create_releases()
+    process_release(previous, tmp_path / "previous", tmp_path / "previous_release")
+    process_release(new, tmp_path / "new", tmp_path / "full_release")
+    diff_dir = tmp_path / "cache" / "diffs"
+    diff_dir.mkdir(parents=True)
+    for kind, datasets in diff.items():
+        for dataset, records in datasets.items():
+            write_jsonl_gz(diff_dir / f"{dataset}_2022-09-13_2022-09-27_{kind}_0.jsonl.gz", records)
+    # A diff before the previous release and one after the new release
+    for from_release, to_release in (("2022-08-30", "2022-09-13"), ("2022-09-27", "2022-10-11")):
+        write_jsonl_gz(
+            diff_dir / f"papers_{from_release}_{to_release}_update_0.jsonl.gz",
+            [paper(7, "g", ["1"])],
+        )
+    processor = SemanticScholarDataProcessor(cache_dir=tmp_path / "cache")
+    processor.process_diffs(
+        str(tmp_path / "previous_release"), "2022-09-13", "2022-09-27", **OPTIONS
+    ).to_jsonl(str(tmp_path / "incremental_release"))
+    assert read_release(tmp_path / "incremental_release") == read_release(tmp_path / "full_release")
+    # There are no diffs that lead to a release after the last one
+    with pytest.raises(FileNotFoundError):
+        processor.process_diffs(
+            str(tmp_path / "previous_release"), "2022-09-13", "2022-10-25", **OPTIONS
+        )
+
+
+def test_download_diffs_removes_other_diffs(tmp_path: Path) -> None:
+    """Downloading the diffs removes the diffs of other releases, and nothing is downloaded if the
+    previous release is the latest one.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    _, _, diff = create_releases()
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    write_jsonl_gz(server_dir / "diff_papers_update.jsonl.gz", diff["update"]["papers"])
+    stale_path = tmp_path / "cache" / "diffs" / "papers_2022-09-01_2022-09-27_update_0.jsonl.gz"
+    stale_path.parent.mkdir(parents=True)
+    write_jsonl_gz(stale_path, [paper(7, "g", ["1"])])
+    with S2StandIn(server_dir) as server:
+        server.diffs = [
+            {
+                "from_release": "2022-09-13",
+                "to_release": "2022-09-27",
+                "update": {"papers": ["diff_papers_update.jsonl.gz"]},
+                "delete": {},
+            }
+        ]
+        client = SemanticScholarClient(cache_dir=tmp_path / "cache", s2_base_url=server.base_url)
+        client.download_diffs("2022-09-13", **OPTIONS)
+        assert [path.name for path in stale_path.parent.iterdir()] == [
+            "papers_2022-09-13_2022-09-27_update_0.jsonl.gz"
+        ]
+        server.requests.clear()
+        assert client.download_diffs("2022-09-27", **OPTIONS) == "2022-09-27"
+        assert not [path for path, _ in server.requests if not path.startswith("/release/")]
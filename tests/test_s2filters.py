@@ -0,0 +1,175 @@
+"""Differential tests of the raw line screen of the S2 filters: screening the raw json lines before
+parsing them has to keep exactly the documents that parsing and filtering every line keeps.
+"""
+import json
+from typing import Callable, List
+
+import pytest
+
+from csinsights.data import jsonbackend, s2processor
+from csinsights.data.corpusids import CorpusIdSet
+from csinsights.data.s2processor import filter_authors, filter_documents
+from tests.helpers import FIXTURES
+
+FILTERS = [[], ["DBLP"], ["DBLP", "ACL"], ["ArXiv"]]
+
+
+def read_lines(dataset: str) -> List[bytes]:
+    """Read the raw lines of all sample shards of a dataset.
+
+    Args:
+        dataset (str): The name of the dataset.
+
+    Returns:
+        List[bytes]: The json lines.
+    """
+    return [
+        line
+        for path in sorted(FIXTURES.glob(f"{dataset}_*.jsonl"))
+        for line in path.read_bytes().splitlines(keepends=True)
+    ]
+
+
+def parse_and_filter(
+    lines: List[bytes], dataset: str, filters: List[str], filtered_corpusids: set
+) -> List[dict]:
+    """Parse and filter every line like the processor did before lines were screened.
+
+    Args:
+        lines (List[bytes]): The json lines.
+        dataset (str): The name of the dataset.
+        filters (List[str]): The names of the external ids papers are filtered by.
+        filtered_corpusids (set): A set of corpus ids. The rest can be filtered.
+
+    Returns:
+        List[dict]: The filtered documents.
+    """
+
+    def check_condition(paper: dict) -> bool:
+        return any(
+            paper["externalids"][f] is not None
+            if "externalids" in paper
+            and paper["externalids"] is not None
+            and f in paper["externalids"]
+            else False
+            for f in filters
+        )
+
+    docs = []
+    for line in lines:
+        doc = json.loads(line)
+        if (
+            "openaccessinfo" in doc
+            and doc["openaccessinfo"] is not None
+            and "externalids" in doc["openaccessinfo"]
+        ):
+            doc["externalids"] = doc["openaccessinfo"]["externalids"]
+            del doc["openaccessinfo"]
+        if (
+            (dataset == "papers" and check_condition(doc))
+            or dataset == "authors"
+            or (not filtered_corpusids and dataset != "papers")
+            or doc["corpusid"] in filtered_corpusids
+        ):
+            docs.append(doc)
+    return docs
+
+
+def allowlist(kind: str) -> set:
+    """Create the corpus ids documents are filtered by.
+
+    Args:
+        kind (str): `empty`, or `papers` for the ids of the first papers shard with a few ids
+        that only occur in nested records or in other shards.
+
+    Returns:
+        set: The corpus ids.
+    """
+    if kind == "empty":
+        return set()
+    corpusids = {
+        json.loads(line)["corpusid"]
+        for line in (FIXTURES / "papers_0.jsonl").read_bytes().splitlines()
+    }
+    return (corpusids - {None}) | {5101, 9002}
+
+
+@pytest.fixture(params=[7, s2processor.MEMBERSHIP_BATCH_SIZE], ids=["small", "default"])
+def batch_size(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> int:
+    """Test the membership batches with a batch size that splits the shards and with the default.
+
+    Args:
+        request (pytest.FixtureRequest): The request with the batch size.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+
+    Returns:
+        int: The batch size.
+    """
+    monkeypatch.setattr(s2processor, "MEMBERSHIP_BATCH_SIZE", request.param)
+    return int(request.param)
+
+
+@pytest.mark.parametrize("dataset", ["papers", "abstracts"])
+@pytest.mark.parametrize("filters", FILTERS, ids=lambda filters: "+".join(filters) or "none")
+@pytest.mark.parametrize("corpusids", ["empty", "papers"])
+def test_screened_lines_match_full_parse(
+    dataset: str, filters: List[str], corpusids: str, batch_size: int
+) -> None:
+    """The screened and the fully parsed lines give the same documents in the same order.
+
+    Args:
+        dataset (str): The name of the dataset.
+        filters (List[str]): The names of the external ids papers are filtered by.
+        corpusids (str): The kind of allowlist.
+        batch_size (int): The membership batch size.
+    """
+    lines = read_lines(dataset)
+    expected = parse_and_filter(lines, dataset, filters, allowlist(corpusids))
+    assert list(filter_documents(lines, dataset, filters, CorpusIdSet(allowlist(corpusids)))) == (
+        expected
+    )
+
+
+def test_screened_authors_match_full_parse(batch_size: int) -> None:
+    """The screened and the fully parsed authors are the same, including authors without an id.
+
+    Args:
+        batch_size (int): The membership batch size.
+    """
+    lines = read_lines("authors")
+    # The authors of the papers and a few ids that only occur in nested records
+    author_ids = {
+        int(author["authorId"])
+        for line in read_lines("papers")
+        for author in json.loads(line)["authors"]
+        if author["authorId"] is not None
+    } | {23, 42, 43, 999999}
+    expected = [
+        author
+        for author in map(json.loads, lines)
+        if author["authorid"] is not None and int(author["authorid"]) in author_ids
+    ]
+    assert list(filter_authors(lines, CorpusIdSet(author_ids))) == expected
+    assert {author["name"] for author in expected} >= {"Spaces", "Unquoted", "Padded"}
+
+
+def test_screen_skips_lines(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Lines that can't pass the filters are not parsed, but the ambiguous ones are.
+
+    Args:
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    parsed: List[bytes] = []
+    loads: Callable[[bytes], dict] = jsonbackend.loads
+
+    def counting_loads(line: bytes) -> dict:
+        parsed.append(line)
+        return loads(line)
+
+    monkeypatch.setattr(jsonbackend, "loads", counting_loads)
+    lines = read_lines("abstracts")
+    docs = list(filter_documents(lines, "abstracts", ["DBLP"], CorpusIdSet(allowlist("papers"))))
+    assert docs == parse_and_filter(lines, "abstracts", ["DBLP"], allowlist("papers"))
+    assert len(docs) < len(parsed) < len(lines)
+    # The lines without a single corpus id can't be screened and are always parsed
+    assert all(line in parsed for line in lines if line.count(b'"corpusid"') != 1)
@@ -0,0 +1,170 @@
+"""Regression tests of the S2 processing modes: loading all datasets into memory, streaming them,
+and joining them out of core have to export the same release from the sample shards.
+"""
+import csv
+import gzip
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from csinsights.data import SemanticScholarDataProcessor, jsonbackend
+from csinsights.data.release import ReleaseManifest
+from csinsights.data.schema import SCHEMAS, flatten_record, flatten_schema
+from tests.helpers import read_jsonl_gz, s2_options, write_sample_shards
+
+# The options of all runs: papers with abstracts and authors, filtered by DBLP
+OPTIONS = s2_options(
+    s2_use_papers=True, s2_use_abstracts=True, s2_use_authors=True, s2_filter_dblp=True
+)
+
+MODES: Dict[str, Dict[str, Any]] = {
+    "in-memory": {},
+    "streaming": {"s2_streaming": True},
+    "out-of-core": {"max_memory": 1},
+    "workers": {"workers": 2},
+    "sharded": {"release_shards": 3},
+}
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path) -> Path:
+    """Copy the sample shards into a cache directory as gzip shards like the downloaded ones.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+
+    Returns:
+        Path: The cache directory.
+    """
+    return write_sample_shards(tmp_path / "cache")
+
+
+def export_release(
+    cache_dir: Path, release_dir: Path, **kwargs: Any  # noqa: ANN401
+) -> Dict[str, List[dict]]:
+    """Process the sample shards and read the exported papers and authors.
+
+    Args:
+        cache_dir (Path): The cache directory with the shards.
+        release_dir (Path): The directory to export the release to.
+        **kwargs (Any): The options of the processing mode.
+
+    Returns:
+        Dict[str, List[dict]]: The papers and authors.
+    """
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir, **kwargs)
+    processor.process_data(**OPTIONS).to_jsonl(str(release_dir))
+    return read_release(release_dir)
+
+
+def read_dataset(release_dir: Path, dataset: str) -> List[dict]:
+    """Read the records of all jsonl shards of a dataset listed in the manifest.
+
+    Args:
+        release_dir (Path): The release directory.
+        dataset (str): The name of the dataset (e.g., papers).
+
+    Returns:
+        List[dict]: The records.
+    """
+    manifest = ReleaseManifest(release_dir)
+    return [
+        record
+        for name, entry in sorted(manifest.files.items())
+        if entry["dataset"] == dataset and entry["format"] == "jsonl"
+        for record in read_jsonl_gz(release_dir / name)
+    ]
+
+
+def read_release(release_dir: Path) -> Dict[str, List[dict]]:
+    """Read the exported papers and authors of a release sorted by their ids.
+
+    Args:
+        release_dir (Path): The release directory.
+
+    Returns:
+        Dict[str, List[dict]]: The papers and authors.
+    """
+    return {
+        "papers": sorted(read_dataset(release_dir, "papers"), key=lambda x: x["corpusid"]),
+        "authors": sorted(read_dataset(release_dir, "authors"), key=lambda x: int(x["authorid"])),
+    }
+
+
+def test_processing_modes_export_the_same_release(cache_dir: Path, tmp_path: Path) -> None:
+    """All processing modes keep the same papers and authors, skipping authors without an id.
+
+    Args:
+        cache_dir (Path): The cache directory with the sample shards.
+        tmp_path (Path): A temporary directory.
+    """
+    releases = {
+        mode: export_release(cache_dir, tmp_path / mode, **kwargs) for mode, kwargs in MODES.items()
+    }
+    assert releases["streaming"] == releases["in-memory"]
+    assert releases["out-of-core"] == releases["in-memory"]
+    assert releases["workers"] == releases["in-memory"]
+    assert releases["sharded"] == releases["in-memory"]
+    release = releases["in-memory"]
+    assert release["papers"] and release["authors"]
+    assert all(paper["externalids"]["DBLP"] is not None for paper in release["papers"])
+    assert all(author["authorid"] is not None for author in release["authors"])
+    # Authors whose raw line can't be screened are parsed and kept
+    assert {"Spaces", "Unquoted", "Padded", "Nested after"} <= {
+        author["name"] for author in release["authors"]
+    }
+
+
+def test_checkpoint_is_reused_by_the_export(
+    cache_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The processed records are serialized once into the checkpoint, whose lines the jsonl export
+    of the same run reuses.
+
+    Args:
+        cache_dir (Path): The cache directory with the sample shards.
+        tmp_path (Path): A temporary directory.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    expected = export_release(cache_dir, tmp_path / "in-memory")
+    dumped: List[dict] = []
+    dumps: Callable[[dict], bytes] = jsonbackend.dumps
+
+    def counting_dumps(record: dict) -> bytes:
+        dumped.append(record)
+        return dumps(record)
+
+    monkeypatch.setattr(jsonbackend, "dumps", counting_dumps)
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir, s2_streaming=True)
+    processor.process_data(**OPTIONS).save_checkpoint(tmp_path / "checkpoint")
+    processor.to_jsonl(str(tmp_path / "streaming"))
+    assert len(dumped) == len(expected["papers"]) + len(expected["authors"])
+    for dataset in ("papers", "authors"):
+        with gzip.open(tmp_path / "checkpoint" / f"{dataset}.jsonl.gz", "rb") as checkpoint:
+            with gzip.open(tmp_path / "streaming" / f"{dataset}.jsonl.gz", "rb") as export:
+                assert export.read() == checkpoint.read()
+    assert read_release(tmp_path / "streaming") == expected
+
+
+def test_csv_export_has_the_columns_of_the_schema(cache_dir: Path, tmp_path: Path) -> None:
+    """The csv export has the flat columns of the schemas and a row per exported record.
+
+    Args:
+        cache_dir (Path): The cache directory with the sample shards.
+        tmp_path (Path): A temporary directory.
+    """
+    processor = SemanticScholarDataProcessor(cache_dir=cache_dir).process_data(**OPTIONS)
+    processor.to_jsonl(str(tmp_path / "release"))
+    processor.to_csv(str(tmp_path / "release"))
+    for dataset, schema in SCHEMAS.items():
+        columns = flatten_schema(schema)
+        with gzip.open(tmp_path / "release" / f"{dataset}.csv.gz", "rt", newline="") as f:
+            rows = list(csv.reader(f, delimiter="\t"))
+        records = read_jsonl_gz(tmp_path / "release" / f"{dataset}.jsonl.gz")
+        assert rows[0] == [name for name, _ in columns]
+        # Missing values are written as empty fields and all values as text
+        assert rows[1:] == [
+            ["" if value is None else str(value) for value in flatten_record(record, columns)]
+            for record in records
+        ]
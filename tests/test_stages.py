@@ -0,0 +1,146 @@
+"""Tests of the stage checkpoints: which stages a run selects from the completion markers of the
+release it runs for.
+"""
+from pathlib import Path
+from typing import List
+
+import pytest
+from click.testing import CliRunner
+
+from csinsights.cli import cli
+from csinsights.stages import StageCheckpoints
+from tests.helpers import S2StandIn, s2_options, write_sample_shards
+
+OPTIONS = s2_options(s2_use_papers=True, s2_filter_dblp=True, parquet=False)
+
+
+def test_select_stages_from_and_to_stage(tmp_path: Path) -> None:
+    """The selected stages run from the first to the last one, if the stage before completed.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-13")
+    assert checkpoints.select_stages() == ["download", "process", "export", "clean"]
+    assert checkpoints.select_stages(to_stage="process") == ["download", "process"]
+    with pytest.raises(ValueError):
+        checkpoints.select_stages(from_stage="process")
+    checkpoints.complete("download")
+    assert checkpoints.select_stages(from_stage="process", to_stage="export") == [
+        "process",
+        "export",
+    ]
+    # Rerunning a stage removes the markers of the later stages
+    checkpoints.complete("process")
+    checkpoints.complete("download")
+    with pytest.raises(ValueError):
+        checkpoints.select_stages(from_stage="export")
+
+
+def test_select_stages_resumes_after_the_last_completed_stage(tmp_path: Path) -> None:
+    """A resumed run continues after the last completed stage of the same release and options.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-13")
+    assert checkpoints.select_stages(resume=True) == ["download", "process", "export", "clean"]
+    checkpoints.complete("download")
+    checkpoints.complete("process")
+    assert checkpoints.select_stages(resume=True) == ["export", "clean"]
+    assert checkpoints.select_stages(to_stage="process", resume=True) == []
+    # Other export options only rerun the export
+    export_options = {**OPTIONS, "parquet": True}
+    assert StageCheckpoints(tmp_path, export_options, "2022-09-13").select_stages(resume=True) == [
+        "export",
+        "clean",
+    ]
+    # Other data options rerun all stages
+    data_options = {**OPTIONS, "s2_filter_acl": True}
+    assert StageCheckpoints(tmp_path, data_options, "2022-09-13").select_stages(resume=True) == [
+        "download",
+        "process",
+        "export",
+        "clean",
+    ]
+
+
+def test_select_stages_resumes_a_new_release(tmp_path: Path) -> None:
+    """After a completed run, a resumed run selects all stages of a new release.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-13")
+    for stage in ("download", "process", "export", "clean"):
+        checkpoints.complete(stage)
+    assert checkpoints.select_stages(resume=True) == []
+    new_checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-27")
+    assert new_checkpoints.select_stages(resume=True) == ["download", "process", "export", "clean"]
+    with pytest.raises(ValueError):
+        new_checkpoints.select_stages(from_stage="process")
+
+
+def test_clean_removes_the_checkpoints(tmp_path: Path) -> None:
+    """Cleaning removes the output of the process stage and the checkpoints of previous releases,
+    but keeps the markers of the other stages.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+    """
+    previous_checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-13")
+    previous_checkpoints.complete("download")
+    checkpoints = StageCheckpoints(tmp_path, OPTIONS, "2022-09-27")
+    checkpoints.complete("download")
+    release_dir = checkpoints.get_release_dir()
+    release_dir.mkdir()
+    (release_dir / "papers.jsonl.gz").touch()
+    checkpoints.complete("process")
+    checkpoints.complete("export")
+    checkpoints.clean()
+    assert not release_dir.exists()
+    assert not previous_checkpoints.checkpoint_dir.exists()
+    assert checkpoints.get_marker("process") is None
+    assert checkpoints.get_marker("export") is not None
+    with pytest.raises(ValueError):
+        checkpoints.select_stages(from_stage="export")
+
+
+def test_resumed_run_processes_a_new_release(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A resumed run of the command line does nothing after a completed run of the latest release,
+    but runs all stages once there is a new release.
+
+    Args:
+        tmp_path (Path): A temporary directory.
+        monkeypatch (pytest.MonkeyPatch): The monkeypatch fixture.
+    """
+    # The releases are exported to the home directory
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    with S2StandIn(write_sample_shards(tmp_path / "server")) as server:
+        args = [
+            "main",
+            "--cache_dir",
+            str(tmp_path / "cache"),
+            "--s2_base_url",
+            server.base_url,
+            "--s2_use_papers",
+            "--s2_filter_dblp",
+            "--resume",
+        ]
+
+        def run() -> List[str]:
+            # The key is removed from the environment by every run
+            monkeypatch.setenv("S2_API_KEY", "key")
+            server.requests.clear()
+            result = CliRunner().invoke(cli, args, catch_exceptions=False)
+            assert result.exit_code == 0
+            return [path for path, _ in server.requests if path.startswith("/files/")]
+
+        assert run()
+        assert (tmp_path / "home" / "d3-releases" / "2022-09-27" / "papers.jsonl.gz").is_file()
+        assert not run()
+        server.releases = ["2022-11-08", "2022-10-25", *server.releases]
+        assert run()
+        assert (tmp_path / "home" / "d3-releases" / "2022-10-25" / "papers.jsonl.gz").is_file()